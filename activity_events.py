@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Activity events for Digital Death Switch AI
+Publishes every committed activity so schedulers re-arm immediately instead
+of at their next tick. In-process subscribers are called right after the
+activity writer commits; other processes (web workers, device monitor,
+daemon) learn about it through the activity_events table, which each
+process's listener checks cheaply with PRAGMA data_version
+"""
+
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from database import DEFAULT_DB_PATH, get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.02     # Seconds between data_version checks
+EVENT_RETENTION_SECONDS = 600    # Listeners that fall further behind than this miss events
+PRUNE_INTERVAL = 60
+
+
+@dataclass
+class ActivityEvent:
+    user_id: int
+    activity_type: str
+    device_id: Optional[str]
+    timestamp: str                       # UTC, like last_seen
+    cancelled_verification: bool = False  # The activity moved a verifying switch back to armed
+
+
+def process_origin() -> str:
+    """Identifies this process's rows so its listener skips events already published locally"""
+    return str(os.getpid())
+
+
+class EventBus:
+    """In-process publish/subscribe for activity events"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, callback: Callable[[ActivityEvent], None],
+                  user_id: Optional[int] = None) -> Callable[[], None]:
+        """Call callback for every event (or only user_id's); returns an unsubscribe function"""
+        with self._lock:
+            token = self._next_id
+            self._next_id += 1
+            self._subscribers[token] = (user_id, callback)
+        return lambda: self._subscribers.pop(token, None)
+
+    def publish(self, events: Iterable[ActivityEvent]):
+        """Deliver events to matching subscribers on the calling thread"""
+        subscribers = list(self._subscribers.values())
+        for event in events:
+            self.published += 1
+            for user_id, callback in subscribers:
+                if user_id is not None and user_id != event.user_id:
+                    continue
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Activity event subscriber failed: {str(e)}")
+
+
+_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    return _bus
+
+
+def record_events(conn, events: List[ActivityEvent]):
+    """Write events for other processes (call in the activity's transaction)"""
+    origin = process_origin()
+    conn.executemany('''
+        INSERT INTO activity_events
+            (user_id, activity_type, device_id, timestamp, cancelled_verification, origin)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(e.user_id, e.activity_type, e.device_id, e.timestamp, int(e.cancelled_verification), origin)
+          for e in events])
+
+
+def prune_events(conn, keep_seconds: float = EVENT_RETENTION_SECONDS) -> int:
+    cursor = conn.execute(
+        "DELETE FROM activity_events WHERE timestamp < datetime('now', ?)",
+        (f"-{int(keep_seconds)} seconds",)
+    )
+    return cursor.rowcount
+
+
+class EventListener:
+    """Background thread relaying other processes' activity events to the local bus"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, bus: EventBus = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.db_path = db_path
+        self.bus = bus or _bus
+        self.poll_interval = poll_interval
+        self.relayed = 0
+        self._last_id = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> 'EventListener':
+        """Start (or, after a fork, restart) the listener thread"""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return self
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="activity-events", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self, conn) -> List[ActivityEvent]:
+        """Read events committed since the last poll by other processes"""
+        rows = conn.execute('''
+            SELECT id, user_id, activity_type, device_id, timestamp, cancelled_verification, origin
+            FROM activity_events WHERE id > ? ORDER BY id
+        ''', (self._last_id,)).fetchall()
+        if rows:
+            self._last_id = rows[-1][0]
+        origin = process_origin()
+        return [ActivityEvent(user_id, activity_type, device_id, timestamp, bool(cancelled))
+                for _, user_id, activity_type, device_id, timestamp, cancelled, row_origin in rows
+                if row_origin != origin]
+
+    def _run(self):
+        conn = get_connection(self.db_path)
+        self._last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM activity_events").fetchone()[0]
+        data_version = None
+        pruned_at = time.monotonic()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                # Changes only when another connection commits, so idle polls read no table
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if version != data_version:
+                    data_version = version
+                    events = self.poll(conn)
+                    if events:
+                        self.relayed += len(events)
+                        self.bus.publish(events)
+                if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                    pruned_at = time.monotonic()
+                    with transaction(self.db_path) as write_conn:
+                        prune_events(write_conn)
+            except Exception as e:
+                logger.error(f"Activity event listener error: {str(e)}")
+
+
+_listeners: Dict[str, EventListener] = {}
+_listeners_lock = threading.Lock()
+
+
+def get_event_listener(db_path: str = DEFAULT_DB_PATH) -> EventListener:
+    """Get the process-wide listener for a database file (call start() to run it)"""
+    key = os.path.abspath(db_path)
+    listener = _listeners.get(key)
+    if listener is None:
+        with _listeners_lock:
+            listener = _listeners.get(key)
+            if listener is None:
+                listener = EventListener(db_path)
+                _listeners[key] = listener
+    return listener
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Activity log queries for Digital Death Switch AI
+Keyset (cursor) pagination over activity_log and its daily rollups, plus
+chunked chronological iteration for streaming audit exports
+"""
+
+import json
+import base64
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from activity_store import OWNER_USER_ID, TIMESTAMP_FORMAT
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[str]:
+    """Normalize an ISO date/datetime to activity_log's timestamp format"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '')).strftime(TIMESTAMP_FORMAT)
+
+
+def encode_cursor(position: Dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict]:
+    """Decode a cursor token; raises ValueError if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, dict) or position.get('phase') not in ('raw', 'rollup'):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+@dataclass
+class ActivityFilter:
+    """Optional filters shared by pagination and export (always scoped to one user)"""
+    activity_type: Optional[str] = None
+    device_id: Optional[str] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+    user_id: int = OWNER_USER_ID
+
+    def raw_clauses(self) -> Tuple[List[str], List]:
+        clauses, params = ["user_id = ?"], [self.user_id]
+        if self.activity_type:
+            clauses.append("activity_type = ?")
+            params.append(self.activity_type)
+        if self.device_id:
+            clauses.append("device_id = ?")
+            params.append(self.device_id)
+        if self.since:
+            clauses.append("timestamp >= ?")
+            params.append(self.since)
+        if self.until:
+            clauses.append("timestamp < ?")
+            params.append(self.until)
+        return clauses, params
+
+    def rollup_clauses(self) -> Tuple[List[str], List]:
+        clauses, params = ["user_id = ?"], [self.user_id]
+        if self.activity_type:
+            clauses.append("activity_type = ?")
+            params.append(self.activity_type)
+        if self.device_id:
+            clauses.append("device_id = ?")
+            params.append(self.device_id)
+        if self.since:
+            clauses.append("last_seen >= ?")
+            params.append(self.since)
+        if self.until:
+            clauses.append("first_seen < ?")
+            params.append(self.until)
+        return clauses, params
+
+
+def _raw_entry(row) -> Dict:
+    return {
+        "id": row[0],
+        "timestamp": row[1],
+        "type": row[2],
+        "device": row[3] or "Unknown",
+        "notes": row[4] or ""
+    }
+
+
+def _rollup_entry(row) -> Dict:
+    return {
+        "timestamp": row[5],
+        "type": row[1],
+        "device": row[2] or "Unknown",
+        "notes": f"{row[3]} events on {row[0]} (daily summary)",
+        "count": row[3],
+        "summary": True
+    }
+
+
+def _where(clauses: List[str]) -> str:
+    return f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+def _raw_rows(conn: sqlite3.Connection, filters: ActivityFilter, limit: int,
+              after: Optional[Tuple[str, int]] = None, descending: bool = True) -> List:
+    clauses, params = filters.raw_clauses()
+    if after:
+        clauses.append("(timestamp, id) < (?, ?)" if descending else "(timestamp, id) > (?, ?)")
+        params.extend(after)
+    order = "DESC" if descending else "ASC"
+    return conn.execute(f'''
+        SELECT id, timestamp, activity_type, device_id, notes
+        FROM activity_log
+        {_where(clauses)}
+        ORDER BY timestamp {order}, id {order}
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+
+
+def _rollup_rows(conn: sqlite3.Connection, filters: ActivityFilter, limit: int,
+                 after: Optional[Tuple[str, str, str]] = None, descending: bool = True) -> List:
+    clauses, params = filters.rollup_clauses()
+    if after:
+        clauses.append(
+            "(day, device_id, activity_type) < (?, ?, ?)" if descending
+            else "(day, device_id, activity_type) > (?, ?, ?)"
+        )
+        params.extend(after)
+    order = "DESC" if descending else "ASC"
+    return conn.execute(f'''
+        SELECT day, activity_type, device_id, activity_count, first_seen, last_seen
+        FROM activity_rollup
+        {_where(clauses)}
+        ORDER BY day {order}, device_id {order}, activity_type {order}
+        LIMIT ?
+    ''', params + [limit]).fetchall()
+
+
+def get_activity_page(conn: sqlite3.Connection, filters: ActivityFilter = None,
+                      limit: int = DEFAULT_PAGE_SIZE,
+                      cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """One page of activity newest-first, and the cursor for the next page.
+
+    Raw rows are paged on (timestamp, id); once they run out the page
+    continues into the daily rollups of compacted history, paged on
+    (day, device_id, activity_type).
+    """
+    filters = filters or ActivityFilter()
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    position = decode_cursor(cursor)
+    entries = []
+
+    if position is None or position['phase'] == 'raw':
+        after = (position['ts'], position['id']) if position else None
+        rows = _raw_rows(conn, filters, limit + 1, after)
+        entries = [_raw_entry(row) for row in rows[:limit]]
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            return entries, encode_cursor({'phase': 'raw', 'ts': last[1], 'id': last[0]})
+        position = None
+
+    remaining = limit - len(entries)
+    after = (position['day'], position['device'], position['type']) if position and 'day' in position else None
+    rows = _rollup_rows(conn, filters, remaining + 1, after)
+    entries.extend(_rollup_entry(row) for row in rows[:remaining])
+    if len(rows) > remaining:
+        if remaining == 0:
+            # Raw rows filled the page exactly: the next page starts at the first rollup
+            return entries, encode_cursor({'phase': 'rollup'})
+        last = rows[remaining - 1]
+        return entries, encode_cursor(
+            {'phase': 'rollup', 'day': last[0], 'device': last[2], 'type': last[1]}
+        )
+    return entries, None
+
+
+def iter_activity(conn: sqlite3.Connection, filters: ActivityFilter = None,
+                  chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[Dict]:
+    """Yield every matching entry oldest-first, one keyset chunk at a time.
+
+    Only chunk_size rows are in memory at once, and no read transaction is
+    held open between chunks.
+    """
+    filters = filters or ActivityFilter()
+
+    after = None
+    while True:
+        rows = _rollup_rows(conn, filters, chunk_size, after, descending=False)
+        for row in rows:
+            yield _rollup_entry(row)
+        if len(rows) < chunk_size:
+            break
+        after = (rows[-1][0], rows[-1][2], rows[-1][1])
+
+    after = None
+    while True:
+        rows = _raw_rows(conn, filters, chunk_size, after, descending=False)
+        for row in rows:
+            yield _raw_entry(row)
+        if len(rows) < chunk_size:
+            break
+        after = (rows[-1][1], rows[-1][0])
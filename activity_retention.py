@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Activity log retention for Digital Death Switch AI
+Rolls old activity_log rows into daily per-type, per-device summaries,
+deletes the raw rows in bounded chunks and reclaims the freed pages
+"""
+
+import sys
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from database import DEFAULT_DB_PATH, get_connection, transaction
+from activity_store import OWNER_USER_ID
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_VACUUM_PAGES = 2000
+
+ROLLUP_CHUNK_SQL = '''
+    INSERT INTO activity_rollup
+        (day, user_id, device_id, activity_type, activity_count, first_seen, last_seen)
+    SELECT date(a.timestamp), a.user_id, COALESCE(a.device_id, ''), a.activity_type,
+           COUNT(*), MIN(a.timestamp), MAX(a.timestamp)
+    FROM activity_log a JOIN temp.compact_batch b ON b.id = a.id
+    WHERE 1
+    GROUP BY date(a.timestamp), a.user_id, COALESCE(a.device_id, ''), a.activity_type
+    ON CONFLICT(day, user_id, device_id, activity_type) DO UPDATE SET
+        activity_count = activity_count + excluded.activity_count,
+        first_seen = MIN(first_seen, excluded.first_seen),
+        last_seen = MAX(last_seen, excluded.last_seen)
+'''
+
+
+def retention_cutoff(retention_days: int) -> str:
+    """Start of the oldest day that is kept raw (UTC, CURRENT_TIMESTAMP format)"""
+    cutoff = datetime.utcnow().date() - timedelta(days=retention_days)
+    return f"{cutoff.isoformat()} 00:00:00"
+
+
+def ensure_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """Switch an existing database to incremental auto-vacuum (one-off full VACUUM)"""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+
+    logger.info("Converting database to incremental auto-vacuum (one-time VACUUM)")
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def compact_activity_log(db_path: str = DEFAULT_DB_PATH,
+                         retention_days: int = DEFAULT_RETENTION_DAYS,
+                         chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         vacuum_pages: int = DEFAULT_VACUUM_PAGES) -> Dict:
+    """Roll up and delete raw activity older than retention_days, for every user.
+
+    Each chunk is rolled up and deleted in its own short transaction so the
+    activity writer is never blocked for long. last_seen is not touched.
+    """
+    cutoff = retention_cutoff(retention_days)
+    conn = get_connection(db_path)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS compact_batch (id INTEGER PRIMARY KEY)")
+
+    compacted = 0
+    chunks = 0
+    while True:
+        with transaction(db_path) as conn:
+            conn.execute("DELETE FROM temp.compact_batch")
+            conn.execute('''
+                INSERT INTO temp.compact_batch (id)
+                SELECT id FROM activity_log
+                WHERE timestamp < ?
+                ORDER BY timestamp
+                LIMIT ?
+            ''', (cutoff, chunk_size))
+            count = conn.execute("SELECT COUNT(*) FROM temp.compact_batch").fetchone()[0]
+            if not count:
+                break
+
+            conn.execute(ROLLUP_CHUNK_SQL)
+            conn.execute("DELETE FROM activity_log WHERE id IN (SELECT id FROM temp.compact_batch)")
+
+        compacted += count
+        chunks += 1
+
+    freed_pages = 0
+    if compacted:
+        ensure_incremental_vacuum(conn)
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+        freed_pages = before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    logger.info(f"Activity retention: compacted {compacted} rows older than {cutoff} "
+                f"in {chunks} chunks, freed {freed_pages} pages")
+    return {
+        "cutoff": cutoff,
+        "compacted_rows": compacted,
+        "chunks": chunks,
+        "freed_pages": freed_pages
+    }
+
+
+def count_activities(conn: sqlite3.Connection, since: Optional[str] = None,
+                     user_id: int = OWNER_USER_ID) -> int:
+    """Count a user's activities, including those that now only exist as rollups"""
+    raw = conn.execute(
+        "SELECT COUNT(*) FROM activity_log WHERE user_id = ? AND timestamp >= ?",
+        (user_id, since or '')
+    ).fetchone()[0]
+    rolled = conn.execute(
+        "SELECT COALESCE(SUM(activity_count), 0) FROM activity_rollup WHERE user_id = ? AND last_seen >= ?",
+        (user_id, since or '')
+    ).fetchone()[0]
+    return raw + rolled
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RETENTION_DAYS
+    result = compact_activity_log(retention_days=days)
+    print(f"✅ Compacted {result['compacted_rows']} activity rows older than {result['cutoff']}")
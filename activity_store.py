@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Activity storage for Digital Death Switch AI
+Writes activity rows and keeps the materialized last_seen table in step,
+so inactivity checks never have to scan activity_log
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+# user_id of the single-user owner switch (no users.db account)
+OWNER_USER_ID = 0
+
+# device_id of the per-user "any device" row in last_seen
+ANY_DEVICE = ''
+
+# Same format SQLite uses for CURRENT_TIMESTAMP (UTC)
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+INSERT_ACTIVITY_SQL = '''
+    INSERT INTO activity_log (user_id, timestamp, activity_type, device_id, notes)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+UPSERT_LAST_SEEN_SQL = '''
+    INSERT INTO last_seen (user_id, device_id, last_activity, activity_type)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(user_id, device_id) DO UPDATE SET
+        last_activity = excluded.last_activity,
+        activity_type = excluded.activity_type
+    WHERE excluded.last_activity >= last_seen.last_activity
+'''
+
+
+def utc_timestamp() -> str:
+    """Current time formatted like SQLite's CURRENT_TIMESTAMP"""
+    return datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+
+
+def record_activities(conn: sqlite3.Connection,
+                      activities: Iterable[Tuple],
+                      user_id: int = OWNER_USER_ID) -> int:
+    """Insert activity rows and update last_seen on the caller's transaction.
+
+    Each activity is (activity_type, device_id, notes) with an optional
+    fourth timestamp element; missing timestamps default to now.
+    """
+    rows = []
+    seen = {}
+    for activity in activities:
+        activity_type, device_id, notes = activity[:3]
+        timestamp = activity[3] if len(activity) > 3 and activity[3] else utc_timestamp()
+        rows.append((user_id, timestamp, activity_type, device_id, notes))
+
+        # Only the newest timestamp per last_seen key needs to be written
+        keys = [ANY_DEVICE] if not device_id else [ANY_DEVICE, device_id]
+        for key in keys:
+            if key not in seen or timestamp >= seen[key][0]:
+                seen[key] = (timestamp, activity_type)
+
+    if not rows:
+        return 0
+
+    conn.executemany(INSERT_ACTIVITY_SQL, rows)
+    conn.executemany(UPSERT_LAST_SEEN_SQL, [
+        (user_id, key, timestamp, activity_type)
+        for key, (timestamp, activity_type) in seen.items()
+    ])
+    return len(rows)
+
+
+def get_last_seen(conn: sqlite3.Connection, device_id: str = None,
+                  user_id: int = OWNER_USER_ID) -> Optional[datetime]:
+    """Get the last activity time for a user (or one of their devices)"""
+    row = conn.execute(
+        "SELECT last_activity FROM last_seen WHERE user_id = ? AND device_id = ?",
+        (user_id, device_id or ANY_DEVICE)
+    ).fetchone()
+
+    if row and row[0]:
+        return datetime.fromisoformat(row[0])
+    return None
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Group-commit activity writer for Digital Death Switch AI
+Queues activity rows from the web backend, the core system and the device
+monitor, and commits them in batches from a single writer thread. Each
+commit also cancels pending life verifications of the users involved and
+publishes activity events so schedulers re-arm straight away
+"""
+
+import os
+import queue
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database import DEFAULT_DB_PATH, transaction
+from activity_store import (OWNER_USER_ID, TIMESTAMP_FORMAT, get_last_seen, record_activities,
+                            utc_timestamp)
+from status_cache import bump_generation
+from switch_state import cancel_verifications, refresh_due_at
+from activity_events import ActivityEvent, get_event_bus, record_events
+
+logger = logging.getLogger(__name__)
+
+# Queue markers
+_FLUSH = object()
+_STOP = object()
+
+
+def _checked_timestamp(value: str) -> str:
+    """A caller-supplied timestamp, which must be exactly TIMESTAMP_FORMAT (rows are ordered as strings)"""
+    try:
+        valid = datetime.strptime(value, TIMESTAMP_FORMAT).strftime(TIMESTAMP_FORMAT) == value
+    except (TypeError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError(f"Activity timestamp {value!r} is not in the format {TIMESTAMP_FORMAT}")
+    return value
+
+
+class ActivityWriter:
+    """Single background thread that group-commits queued activity rows"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_batch: int = 500,
+                 max_delay: float = 0.02, max_queue: int = 10000,
+                 put_timeout: float = 5.0):
+        self.db_path = db_path
+        self.max_batch = max_batch        # Commit once this many rows are queued
+        self.max_delay = max_delay        # ...or this many seconds after the first one
+        self.max_queue = max_queue        # Producers block when the queue is full
+        self.put_timeout = put_timeout    # ...and give up (queue.Full) after this long
+        self.rows_written = 0
+        self.batches_written = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._queue = None
+
+    def _ensure_started(self):
+        """Start the writer thread (again, after a fork)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._thread = threading.Thread(
+                target=self._run, name="activity-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _put(self, item):
+        """Enqueue with backpressure; raises queue.Full after put_timeout"""
+        self._ensure_started()
+        self._queue.put(item, timeout=self.put_timeout)
+
+    def submit(self, activity_type: str, device_id: str = None, notes: str = None,
+               user_id: int = OWNER_USER_ID, urgent: bool = False) -> Future:
+        """Queue one activity row; the future resolves once it is committed"""
+        return self.submit_many([(activity_type, device_id, notes)], user_id, urgent)
+
+    def submit_many(self, activities: Iterable[Tuple], user_id: int = OWNER_USER_ID,
+                    urgent: bool = False) -> Future:
+        """Queue several activity rows that commit together.
+
+        Each row is (activity_type, device_id, notes) with an optional fourth
+        timestamp element (UTC, TIMESTAMP_FORMAT; ValueError otherwise); missing
+        ones default to now. Rows older than the user's last activity are
+        stored but do not cancel a pending life verification. Urgent rows have a caller blocked on them, so their batch commits as
+        soon as the queue runs dry instead of waiting out the time window.
+        """
+        # Stamp rows now so batching delay never shifts the recorded time;
+        # a caller-supplied timestamp (backfill, replay) is kept as is
+        now = utc_timestamp()
+        rows = [tuple(activity[:3]) + ((_checked_timestamp(activity[3])
+                                        if len(activity) > 3 and activity[3] else now),)
+                for activity in activities]
+        future = Future()
+        self._put((user_id, rows, future, urgent))
+        return future
+
+    def log(self, activity_type: str, device_id: str = None, notes: str = None,
+            user_id: int = OWNER_USER_ID, wait: bool = True,
+            timeout: Optional[float] = None):
+        """Queue one activity row, optionally blocking until it is durable"""
+        future = self.submit(activity_type, device_id, notes, user_id, urgent=wait)
+        if wait:
+            future.result(timeout)
+        return future
+
+    def flush(self, timeout: Optional[float] = None):
+        """Block until everything queued so far has been committed"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        future = Future()
+        self._queue.put((None, _FLUSH, future, True))
+        future.result(timeout)
+
+    def close(self, timeout: Optional[float] = 10):
+        """Flush outstanding rows and stop the writer thread"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put((None, _STOP, None, True))
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _next_batch(self) -> Tuple[List, Optional[object]]:
+        """Collect items until the batch is full, the window closes or a marker arrives"""
+        batch = []
+        rows = 0
+        urgent = False
+        item = self._queue.get()
+        deadline = time.monotonic() + self.max_delay
+
+        while True:
+            if item[1] is _FLUSH or item[1] is _STOP:
+                return batch, item
+            batch.append(item)
+            rows += len(item[1])
+            urgent = urgent or item[3]
+            if rows >= self.max_batch:
+                return batch, None
+
+            # Waiting callers only get what is already queued; everything that
+            # arrives during this commit forms the next group
+            remaining = 0 if urgent else deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return batch, None
+
+    def _commit(self, batch: List):
+        """Write one batch in a single transaction and resolve its futures"""
+        by_user: Dict[int, List] = {}
+        for user_id, rows, _, _ in batch:
+            by_user.setdefault(user_id, []).extend(rows)
+
+        # One event per user, for their newest row
+        events = []
+        for user_id, rows in by_user.items():
+            activity_type, device_id, _, timestamp = max(rows, key=lambda row: row[3])
+            events.append(ActivityEvent(user_id, activity_type, device_id, timestamp))
+
+        try:
+            with transaction(self.db_path) as conn:
+                # Only rows newer than the last activity already stored prove
+                # life; backfilled or replayed history leaves verifications alone
+                fresh = [event.user_id for event in events
+                         if _is_newer(conn, event.user_id, event.timestamp)]
+                for user_id, rows in by_user.items():
+                    record_activities(conn, rows, user_id=user_id)
+                    # New activity changes last_activity on every worker's /status
+                    bump_generation(conn, user_id)
+                # ...cancels pending life verifications and pushes out each
+                # armed switch's inactivity due_at
+                cancelled = set(cancel_verifications(conn, fresh))
+                refresh_due_at(conn, by_user)
+                for event in events:
+                    event.cancelled_verification = event.user_id in cancelled
+                record_events(conn, events)
+        except Exception as e:
+            logger.error(f"Failed to commit {len(batch)} activity entries: {e}")
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        self.rows_written += sum(len(rows) for rows in by_user.values())
+        self.batches_written += 1
+        for _, _, future, _ in batch:
+            future.set_result(True)
+        # Other processes see the activity_events rows through their listeners
+        get_event_bus().publish(events)
+
+    def _run(self):
+        """Writer thread main loop"""
+        while True:
+            batch, marker = self._next_batch()
+            if batch:
+                self._commit(batch)
+            if marker is None:
+                continue
+            if marker[2] is not None:
+                marker[2].set_result(True)
+            if marker[1] is _STOP:
+                return
+
+
+def _is_newer(conn, user_id: int, timestamp: str) -> bool:
+    """Whether timestamp is later than the user's stored last activity"""
+    last_seen = get_last_seen(conn, user_id=user_id)
+    return last_seen is None or datetime.strptime(timestamp, TIMESTAMP_FORMAT) > last_seen
+
+
+_writers: Dict[str, ActivityWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_activity_writer(db_path: str = DEFAULT_DB_PATH) -> ActivityWriter:
+    """Get (or create) the process-wide writer for a database file"""
+    key = os.path.abspath(db_path)
+    writer = _writers.get(key)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(key)
+            if writer is None:
+                writer = ActivityWriter(db_path)
+                _writers[key] = writer
+    return writer
+
+
+@atexit.register
+def close_all():
+    """Flush every writer on interpreter shutdown"""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close()
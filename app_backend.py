@@ -1,39 +1,51 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, session, jsonify, redirect, send_from_directory, stream_with_context
 from flask_cors import CORS
 import os
+import io
+import csv
 import json
+import math
 import threading
 import secrets
 import sqlite3
 from datetime import datetime
 from dotenv import load_dotenv
+from database import DEFAULT_DB_PATH, get_connection, transaction
+from activity_store import OWNER_USER_ID, get_last_seen
+from activity_writer import get_activity_writer
+from activity_retention import count_activities
+from activity_query import (ActivityFilter, DEFAULT_PAGE_SIZE, get_activity_page,
+                            iter_activity, parse_timestamp)
+from config_store import (add_recipient as store_recipient, add_document, list_recipients,
+                          list_documents, count_recipients, count_documents, migrate_json_config)
+from status_cache import StatusCache
+from switch_state import get_switch_state, transition, ARMED, VERIFYING, EXECUTING, DISABLED, DONE
+from rate_limiter import bucket_stats
+from leader_lease import LeaderLease, monitor_lease_name
+from auth import auth_bp
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
+app = Flask(__name__, template_folder='.')  # login.html / register.html live next to this file
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', secrets.token_hex(16))
 CORS(app)
 
-# Simple database initialization
+# /login, /register and /logout; login stores the users.db id in the session
+app.register_blueprint(auth_bp)
+
+DB_PATH = DEFAULT_DB_PATH
+
+# Column order of /activity-log/export?format=csv
+EXPORT_CSV_COLUMNS = ['timestamp', 'type', 'device', 'notes', 'count', 'summary']
+
+# Database initialization (schema is created once per process by the pool)
 def init_db():
     """Initialize SQLite database"""
-    conn = sqlite3.connect('death_switch.db')
-    cursor = conn.cursor()
+    get_connection(DB_PATH)
     
-    # Activity log table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS activity_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            activity_type TEXT NOT NULL,
-            device_id TEXT,
-            notes TEXT
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    # One-shot import of the old config/*.json recipient and document files
+    migrate_json_config(DB_PATH)
 
 # Initialize database on startup
 init_db()
@@ -42,15 +54,68 @@ init_db()
 os.makedirs("secure_docs", exist_ok=True)
 os.makedirs("config", exist_ok=True)
 
-# Global system state
+# Global system state; per-user switch state starts from these defaults
 system_state = {
     'initialized': True,
-    'is_running': True,
-    'last_activity': datetime.now(),
+    'last_activity': datetime.utcnow(),
     'inactivity_days': 10,
     'verification_hours': 48
 }
 
+TENANT_STATE_KEYS = ('last_activity', 'inactivity_days', 'verification_hours')
+
+# Per-user switch state and cached /status payloads, keyed by users.db id
+tenant_states = {}
+status_caches = {}
+tenants_lock = threading.Lock()
+
+# Endpoints served without a login: the auth pages, health checks and the
+# document links mailed to recipients
+PUBLIC_ENDPOINTS = {'auth.login', 'auth.register', 'auth.logout', 'health_check', 'serve_document', 'static'}
+
+def current_user_id():
+    """users.db id of the logged-in user (set by the auth blueprint)"""
+    return session['user_id']
+
+@app.before_request
+def require_login():
+    """Every other endpoint acts on the logged-in user's switch"""
+    if request.method == "OPTIONS" or request.endpoint is None or request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    if 'user_id' in session:
+        return None
+    if request.endpoint == 'index':
+        return redirect('/login')
+    return jsonify({"error": "Login required"}), 401
+
+def get_tenant_state(user_id):
+    """Switch state of one user, created from the global defaults"""
+    state = tenant_states.get(user_id)
+    if state is None:
+        with tenants_lock:
+            state = tenant_states.setdefault(
+                user_id, {key: system_state[key] for key in TENANT_STATE_KEYS}
+            )
+    return state
+
+def get_status_cache(user_id):
+    """Cached /status payload of one user, invalidated by that user's write paths"""
+    # Shared mode lets writes in one gunicorn worker (or the device monitor)
+    # reach the others
+    cache = status_caches.get(user_id)
+    if cache is None:
+        with tenants_lock:
+            cache = status_caches.get(user_id)
+            if cache is None:
+                cache = StatusCache(
+                    ttl=float(os.getenv('STATUS_CACHE_TTL', 30)),
+                    shared=os.getenv('STATUS_CACHE_SHARED', '1') == '1',
+                    db_path=DB_PATH,
+                    user_id=user_id
+                )
+                status_caches[user_id] = cache
+    return cache
+
 @app.route("/")
 def index():
     """Serve the main web interface"""
@@ -76,67 +141,80 @@ def health_check():
 def get_status():
     """Get system status"""
     try:
-        # Get recipients count
-        recipients_count = 0
-        recipients_path = os.path.join("config", "recipients.json")
-        if os.path.exists(recipients_path):
-            with open(recipients_path, "r") as f:
-                recipients = json.load(f)
-                recipients_count = len(recipients)
-        
-        # Get documents count
-        documents_count = 0
-        documents_path = os.path.join("config", "documents.json")
-        if os.path.exists(documents_path):
-            with open(documents_path, "r") as f:
-                documents = json.load(f)
-                documents_count = len(documents)
-        
-        # Calculate days remaining
-        last_activity = get_last_activity()
-        days_remaining = system_state['inactivity_days']
-        if last_activity:
-            days_since = (datetime.now() - last_activity).days
-            days_remaining = max(0, system_state['inactivity_days'] - days_since)
-        
-        return jsonify({
-            "system": "active" if system_state['is_running'] else "inactive",
-            "last_activity": str(last_activity) if last_activity else "Never",
-            "days_remaining": days_remaining,
-            "initialized": system_state['initialized'],
-            "recipients_count": recipients_count,
-            "documents_count": documents_count
-        })
+        user_id = current_user_id()
+        return jsonify(get_status_cache(user_id).get(lambda: compute_status(user_id)))
     except Exception as e:
         return jsonify({"error": f"Status check failed: {str(e)}"}), 500
 
-def get_last_activity():
+@app.route("/status/cache-stats", methods=["GET"])
+def get_status_cache_stats():
+    """Hit/miss counters of the current user's /status cache"""
+    return jsonify(get_status_cache(current_user_id()).stats())
+
+@app.route("/status/rate-limits", methods=["GET"])
+def get_rate_limit_stats():
+    """Send-rate limiter wait times per provider account (all workers)"""
+    return jsonify(bucket_stats(get_connection(DB_PATH)))
+
+@app.route("/status/leader", methods=["GET"])
+def get_monitor_leader():
+    """Which process holds the current user's monitor lease"""
+    lease = LeaderLease(monitor_lease_name(current_user_id()), DB_PATH).current()
+    return jsonify(lease or {"holder": None})
+
+def compute_status(user_id):
+    """Build a user's /status payload (called on cache misses)"""
+    conn = get_connection(DB_PATH)
+    # Persisted, so every worker and the monitor daemon agree on it
+    switch = get_switch_state(conn, user_id)
+    
+    # Get recipients and documents counts
+    recipients_count = count_recipients(conn, user_id)
+    documents_count = count_documents(conn, user_id)
+    
+    # Counted down to the due_at the monitor and the sweep act on (UTC)
+    last_activity = get_last_activity(user_id)
+    days_remaining = switch.inactivity_days
+    if switch.state == ARMED and switch.due_at:
+        seconds_left = (switch.due_at - datetime.utcnow()).total_seconds()
+        days_remaining = max(0, math.ceil(seconds_left / 86400))
+    elif switch.state in (VERIFYING, EXECUTING, DONE):
+        days_remaining = 0
+    
+    # Includes activity that has been compacted into daily rollups
+    activity_log_count = count_activities(conn, user_id=user_id)
+    
+    return {
+        "system": "active" if switch.is_running else "inactive",
+        "switch_state": switch.state,
+        "verification_deadline": str(switch.verification_deadline) if switch.verification_deadline else None,
+        "last_activity": str(last_activity) if last_activity else "Never",
+        "days_remaining": days_remaining,
+        "initialized": system_state['initialized'],
+        "recipients_count": recipients_count,
+        "documents_count": documents_count,
+        "activity_log_count": activity_log_count
+    }
+
+def get_last_activity(user_id=OWNER_USER_ID):
     """Get last activity from database"""
     try:
-        conn = sqlite3.connect('death_switch.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT MAX(timestamp) FROM activity_log")
-        result = cursor.fetchone()[0]
-        conn.close()
-        
-        if result:
-            return datetime.fromisoformat(result)
-        return None
+        return get_last_seen(get_connection(DB_PATH), user_id=user_id)
     except Exception:
-        return system_state['last_activity']
+        return get_tenant_state(user_id)['last_activity']
 
-def log_activity(activity_type, device_id=None, notes=None):
-    """Log activity to database"""
+def log_activity(activity_type, device_id=None, notes=None, user_id=None):
+    """Log activity to database (for the current user unless user_id is given)"""
     try:
-        conn = sqlite3.connect('death_switch.db')
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO activity_log (activity_type, device_id, notes) VALUES (?, ?, ?)",
-            (activity_type, device_id, notes)
-        )
-        conn.commit()
-        conn.close()
-        system_state['last_activity'] = datetime.now()
+        if user_id is None:
+            user_id = current_user_id()
+        
+        # Group-committed with concurrent requests; returns once durable
+        get_activity_writer(DB_PATH).log(activity_type, device_id, notes, user_id=user_id)
+        get_tenant_state(user_id)['last_activity'] = datetime.utcnow()
+        
+        # The writer already bumped the shared generation in its commit
+        get_status_cache(user_id).invalidate(propagate=False)
         return True
     except Exception as e:
         print(f"Failed to log activity: {e}")
@@ -177,7 +255,17 @@ def kill_switch():
         # For demo purposes, accept any non-empty code
         # In production, you'd verify against a hashed code
         if len(user_code) >= 4:
-            system_state['is_running'] = False
+            user_id = current_user_id()
+            with transaction(DB_PATH) as conn:
+                disabled = transition(conn, DISABLED, user_id)
+                state = get_switch_state(conn, user_id).state
+            if not disabled:
+                # Already disabled, or the protocol is running or has run
+                return jsonify({
+                    "error": f"Kill switch cannot disable a switch in state {state}",
+                    "switch_state": state
+                }), 409
+            get_status_cache(user_id).invalidate(propagate=False)
             log_activity("kill_switch_activated", notes="System disabled via kill switch")
             return jsonify({
                 "status": "success",
@@ -208,25 +296,14 @@ def add_recipient():
         data.setdefault('whatsapp', data['phone'])
         data.setdefault('preferred_language', 'english')
         
-        recipients_path = os.path.join("config", "recipients.json")
-        
-        # Load existing recipients
-        recipients = []
-        if os.path.exists(recipients_path):
-            with open(recipients_path, "r") as f:
-                recipients = json.load(f)
-        
-        # Check for duplicates
-        for recipient in recipients:
-            if recipient.get('email') == data['email']:
-                return jsonify({"error": "Recipient with this email already exists"}), 400
-        
-        # Add new recipient
-        recipients.append(data)
-        
-        # Save updated recipients
-        with open(recipients_path, "w") as f:
-            json.dump(recipients, f, indent=4)
+        # Add new recipient (the unique email index rejects duplicates)
+        user_id = current_user_id()
+        try:
+            with transaction(DB_PATH) as conn:
+                store_recipient(conn, data, user_id)
+                get_status_cache(user_id).invalidate(conn=conn)
+        except sqlite3.IntegrityError:
+            return jsonify({"error": "Recipient with this email already exists"}), 400
         
         log_activity("recipient_added", notes=f"Added recipient: {data['name']}")
         
@@ -243,13 +320,7 @@ def add_recipient():
 def get_recipients():
     """Get all recipients"""
     try:
-        recipients_path = os.path.join("config", "recipients.json")
-        if os.path.exists(recipients_path):
-            with open(recipients_path, "r") as f:
-                recipients = json.load(f)
-            return jsonify({"recipients": recipients})
-        else:
-            return jsonify({"recipients": []})
+        return jsonify({"recipients": list_recipients(get_connection(DB_PATH), current_user_id())})
     except Exception as e:
         return jsonify({"error": f"Failed to get recipients: {str(e)}"}), 500
 
@@ -283,12 +354,6 @@ def upload_document():
         description = request.form.get('description', 'No description provided')
         
         # Save document info
-        documents_path = os.path.join("config", "documents.json")
-        documents = []
-        if os.path.exists(documents_path):
-            with open(documents_path, "r") as f:
-                documents = json.load(f)
-        
         document_info = {
             "name": file.filename,
             "file_path": save_path,
@@ -296,10 +361,10 @@ def upload_document():
             "description": description,
             "uploaded_at": timestamp
         }
-        documents.append(document_info)
-        
-        with open(documents_path, "w") as f:
-            json.dump(documents, f, indent=4)
+        user_id = current_user_id()
+        with transaction(DB_PATH) as conn:
+            add_document(conn, document_info, user_id)
+            get_status_cache(user_id).invalidate(conn=conn)
         
         log_activity("document_uploaded", notes=f"Uploaded: {file.filename}")
         
@@ -331,13 +396,7 @@ def serve_document(filename):
 def get_documents():
     """Get all uploaded documents"""
     try:
-        documents_path = os.path.join("config", "documents.json")
-        if os.path.exists(documents_path):
-            with open(documents_path, "r") as f:
-                documents = json.load(f)
-            return jsonify({"documents": documents})
-        else:
-            return jsonify({"documents": []})
+        return jsonify({"documents": list_documents(get_connection(DB_PATH), current_user_id())})
     except Exception as e:
         return jsonify({"error": f"Failed to get documents: {str(e)}"}), 500
 
@@ -345,7 +404,10 @@ def get_documents():
 def start_trigger():
     """Start the death switch monitoring trigger"""
     try:
-        system_state['is_running'] = True
+        user_id = current_user_id()
+        with transaction(DB_PATH) as conn:
+            transition(conn, ARMED, user_id, from_states=(DISABLED, DONE))
+        get_status_cache(user_id).invalidate(propagate=False)
         log_activity("monitoring_started", notes="Death switch monitoring activated")
         
         return jsonify({
@@ -361,12 +423,14 @@ def test_system():
     """Test the system functionality"""
     try:
         # Test basic functionality
+        conn = get_connection(DB_PATH)
+        user_id = current_user_id()
         test_results = {
             "database_accessible": True,
             "config_directory": os.path.exists("config"),
             "secure_docs_directory": os.path.exists("secure_docs"),
-            "recipients_configured": os.path.exists(os.path.join("config", "recipients.json")),
-            "documents_available": os.path.exists(os.path.join("config", "documents.json"))
+            "recipients_configured": count_recipients(conn, user_id) > 0,
+            "documents_available": count_documents(conn, user_id) > 0
         }
         
         # Test database
@@ -385,41 +449,76 @@ def test_system():
     except Exception as e:
         return jsonify({"error": f"System test failed: {str(e)}"}), 500
 
+def activity_filter_from_request():
+    """Build the current user's ActivityFilter from ?type=&device=&since=&until= (ValueError if invalid)"""
+    return ActivityFilter(
+        activity_type=request.args.get('type') or None,
+        device_id=request.args.get('device') or None,
+        since=parse_timestamp(request.args.get('since')),
+        until=parse_timestamp(request.args.get('until')),
+        user_id=current_user_id()
+    )
+
 @app.route("/activity-log", methods=["GET"])
 def get_activity_log():
-    """Get recent activity log"""
+    """Get activity log, newest first, one keyset page at a time"""
     try:
-        conn = sqlite3.connect('death_switch.db')
-        cursor = conn.cursor()
-        
-        # Get last 50 activities
-        cursor.execute('''
-            SELECT timestamp, activity_type, device_id, notes 
-            FROM activity_log 
-            ORDER BY timestamp DESC 
-            LIMIT 50
-        ''')
-        
-        activities = []
-        for row in cursor.fetchall():
-            activities.append({
-                "timestamp": row[0],
-                "type": row[1],
-                "device": row[2] or "Unknown",
-                "notes": row[3] or ""
-            })
-        
-        conn.close()
+        try:
+            filters = activity_filter_from_request()
+            limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+            activities, next_cursor = get_activity_page(
+                get_connection(DB_PATH), filters, limit, request.args.get('cursor')
+            )
+        except ValueError as e:
+            return jsonify({"error": f"Invalid activity log query: {str(e)}"}), 400
         
         return jsonify({
             "status": "success",
             "activities": activities,
-            "count": len(activities)
+            "count": len(activities),
+            "next_cursor": next_cursor
         })
         
     except Exception as e:
         return jsonify({"error": f"Failed to get activity log: {str(e)}"}), 500
 
+@app.route("/activity-log/export", methods=["GET"])
+def export_activity_log():
+    """Stream the full activity log (oldest first) as NDJSON or CSV"""
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    try:
+        filters = activity_filter_from_request()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid activity log query: {str(e)}"}), 400
+    
+    def generate():
+        entries = iter_activity(get_connection(DB_PATH), filters)
+        if export_format == 'ndjson':
+            for entry in entries:
+                yield json.dumps(entry) + "\n"
+            return
+        
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_CSV_COLUMNS)
+        for i, entry in enumerate(entries, 1):
+            writer.writerow([entry.get(column, "") for column in EXPORT_CSV_COLUMNS])
+            if i % 500 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    mimetype = "application/x-ndjson" if export_format == 'ndjson' else "text/csv"
+    filename = f"activity_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint not found"}), 404
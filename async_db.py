@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Async database facade for Digital Death Switch AI
+Lets asyncio request handlers, the scheduler and delivery workers await
+activity logging, last-seen lookups, OTPs and delivery logging without
+blocking the event loop or spawning a thread per call
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from database import DEFAULT_DB_PATH, get_connection, transaction
+from activity_store import OWNER_USER_ID, get_last_seen
+from activity_writer import get_activity_writer
+from otp_store import store_otp, consume_otp
+from delivery_store import record_delivery
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_PENDING = 256
+
+
+class AsyncDatabase:
+    """Runs storage calls on a small dedicated executor behind a bounded queue.
+
+    At most max_pending calls are admitted at once; further callers wait on
+    the event loop (not on a thread) until a slot frees up. Each executor
+    thread uses its own pooled connection. Activity rows skip the executor
+    entirely and await the group-commit writer's future.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING,
+                 otp_hash_key: Optional[str] = None):
+        self.db_path = db_path
+        self.max_workers = max_workers    # Threads touching SQLite
+        self.max_pending = max_pending    # Queued + running calls before callers wait
+        self.otp_hash_key = otp_hash_key or os.getenv('OTP_HASH_KEY')
+        self.calls = 0
+        self.max_queue_wait = 0.0
+        self._queue_wait_total = 0.0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._slots_loop = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the executor (again, after a fork)"""
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="async-db"
+                    )
+        return self._executor
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        """Admission semaphore of the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        return self._slots
+
+    def _call(self, func: Callable, args: tuple, write: bool, queued_at: float):
+        """Executor side: run func(conn, *args) on this thread's pooled connection"""
+        waited = time.perf_counter() - queued_at
+        with self._lock:
+            self.calls += 1
+            self._queue_wait_total += waited
+            self.max_queue_wait = max(self.max_queue_wait, waited)
+
+        if write:
+            with transaction(self.db_path) as conn:
+                return func(conn, *args)
+        return func(get_connection(self.db_path), *args)
+
+    async def run(self, func: Callable, *args, write: bool = False):
+        """Await func(conn, *args); write=True wraps it in an IMMEDIATE transaction"""
+        async with self._get_slots():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), self._call, func, args, write, time.perf_counter()
+            )
+
+    async def log_activity(self, activity_type: str, device_id: str = None,
+                           notes: str = None, user_id: int = OWNER_USER_ID):
+        """Log activity; resolves once the writer has committed it"""
+        future = get_activity_writer(self.db_path).submit(
+            activity_type, device_id, notes, user_id, urgent=True
+        )
+        await asyncio.wrap_future(future)
+
+    async def get_last_activity(self, device_id: str = None,
+                                user_id: int = OWNER_USER_ID) -> Optional[datetime]:
+        """Last activity time of a user (or one of their devices)"""
+        return await self.run(get_last_seen, device_id, user_id)
+
+    async def store_otp(self, otp: str, purpose: str, expiry_minutes: int = 30,
+                        user_id: int = OWNER_USER_ID):
+        """Store OTP with expiration"""
+        await self.run(store_otp, otp, purpose, expiry_minutes, self.otp_hash_key,
+                       user_id, write=True)
+
+    async def verify_otp(self, otp: str, purpose: str,
+                         user_id: int = OWNER_USER_ID) -> bool:
+        """Verify OTP and mark as used"""
+        return await self.run(consume_otp, otp, purpose, self.otp_hash_key,
+                              user_id, write=True)
+
+    async def log_delivery(self, recipient_name: str, delivery_method: str, status: str,
+                           message_id: str = None, error_details: str = None,
+                           user_id: int = OWNER_USER_ID) -> int:
+        """Record a delivery attempt"""
+        return await self.run(record_delivery, recipient_name, delivery_method, status,
+                              message_id, error_details, user_id, write=True)
+
+    def stats(self) -> Dict:
+        """Executor usage counters for monitoring"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "avg_queue_wait_ms": round(self._queue_wait_total / self.calls * 1000, 3)
+                if self.calls else 0.0,
+                "max_queue_wait_ms": round(self.max_queue_wait * 1000, 3),
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending
+            }
+
+    def close(self):
+        """Wait for running calls and stop the executor threads"""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+        self._executor = None
+
+
+_databases: Dict[str, AsyncDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_async_database(db_path: str = DEFAULT_DB_PATH) -> AsyncDatabase:
+    """Get (or create) the process-wide async facade for a database file"""
+    key = os.path.abspath(db_path)
+    database = _databases.get(key)
+    if database is None:
+        with _databases_lock:
+            database = _databases.get(key)
+            if database is None:
+                database = AsyncDatabase(db_path)
+                _databases[key] = database
+    return database
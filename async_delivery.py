@@ -0,0 +1,557 @@
+#!/usr/bin/env python3
+"""
+Asyncio delivery pipeline for Digital Death Switch AI
+Keeps hundreds of email/SMS/WhatsApp sends in flight from one process on a
+shared event loop: a native asyncio ESMTP session pool that streams MIME
+straight to the socket, aiohttp for Twilio and WhatsApp (threads without it)
+and an executor that is a drop-in for DeliveryExecutor, so the existing
+synchronous callers keep working
+"""
+
+import os
+import ssl
+import time
+import base64
+import socket
+import asyncio
+import smtplib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import aiohttp
+except ImportError:
+    # SMS and WhatsApp sends fall back to the synchronous transports on a thread pool
+    aiohttp = None
+
+from mime_stream import StreamingMessage, link_attachments, CRLF
+from smtp_pool import DEFAULT_MAX_SESSIONS, DEFAULT_IDLE_TIMEOUT, DEFAULT_NOOP_AFTER, DEFAULT_MAX_MESSAGES
+from sms_transport import SMSResult, sms_result_from_response
+from rate_limiter import RateLimitTimeout
+from delivery_executor import (DeliveryTask, DeliveryResult, DeliveryReport, DEFAULT_CHANNEL_LIMIT)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 500       # Sends awaiting a provider at once, all channels
+DEFAULT_FALLBACK_WORKERS = 16     # Threads for sends without an async transport
+DEFAULT_TIMEOUT = 30
+
+# In-flight sends per channel; far above the threaded limits because a
+# waiting send costs a coroutine, not a thread
+DEFAULT_ASYNC_CHANNEL_LIMITS = {
+    'email': 100,
+    'sms': 200,
+    'whatsapp': 200,
+}
+
+
+class DeliveryLoop:
+    """One event loop on a daemon thread, shared by every async sender.
+
+    run() is the sync shim: it submits a coroutine from any other thread
+    and blocks until it finishes.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread (again, after a fork)"""
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="delivery-loop",
+                                                daemon=True)
+                self._thread.start()
+                self._loop = loop
+                self._pid = os.getpid()
+        return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop())
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the loop and wait for its result"""
+        loop = self.loop()
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("DeliveryLoop.run() called on the delivery loop; await instead")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    def stop(self):
+        if self._loop is not None and self._pid == os.getpid():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+        self._loop = None
+
+
+_delivery_loop = DeliveryLoop()
+
+
+def get_delivery_loop() -> DeliveryLoop:
+    return _delivery_loop
+
+
+def run_sync(coro, timeout: Optional[float] = None):
+    """Run a delivery coroutine from synchronous code"""
+    return _delivery_loop.run(coro, timeout)
+
+
+def _basic_auth(username: str, password: str) -> str:
+    """HTTP basic Authorization header value"""
+    return "Basic " + base64.b64encode(f"{username}:{password}".encode()).decode()
+
+
+def _is_reconnect_error(error: Exception) -> bool:
+    if isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421
+
+
+class _AsyncSMTPSession:
+    """One authenticated ESMTP connection on asyncio streams"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.messages = 0
+        self.last_used = time.monotonic()
+        self.in_data = False              # A failure mid-DATA leaves the session unusable
+
+    async def reply(self) -> Tuple[int, bytes]:
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not line:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            lines.append(line[4:].strip())
+            if line[3:4] != b"-":
+                return int(line[:3]), b"\n".join(lines)
+
+    async def command(self, line: str) -> Tuple[int, bytes]:
+        self.writer.write(line.encode() + CRLF)
+        await self.writer.drain()
+        return await self.reply()
+
+    @property
+    def closed(self) -> bool:
+        return self.writer.is_closing() or self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncSMTPPool:
+    """Pool of at most max_sessions authenticated ESMTP sessions for one event loop.
+
+    Same behaviour as SMTPPool (session reuse, NOOP probes, recycling and
+    one retry on a fresh session after 421s and drops), but a send waiting
+    for the server costs a coroutine instead of a thread.
+    """
+
+    def __init__(self, host: str, port: int = 587, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = True,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 noop_after: float = DEFAULT_NOOP_AFTER,
+                 max_messages: int = DEFAULT_MAX_MESSAGES,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.noop_after = noop_after
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.local_hostname = socket.getfqdn()
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.reconnects = 0
+        self._idle: List[_AsyncSMTPSession] = []
+        self._slots = None
+        self._slots_loop = None
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            # Sessions belong to the loop that opened them
+            for session in self._idle:
+                session.close()
+            self._idle = []
+            self._slots = asyncio.Semaphore(self.max_sessions)
+            self._slots_loop = loop
+        return self._slots
+
+    async def _ehlo(self, session: _AsyncSMTPSession):
+        code, resp = await session.command(f"EHLO {self.local_hostname}")
+        if code != 250:
+            code, resp = await session.command(f"HELO {self.local_hostname}")
+            if code != 250:
+                raise smtplib.SMTPHeloError(code, resp)
+
+    async def _connect(self) -> _AsyncSMTPSession:
+        """Open, secure and authenticate a new session"""
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                self.timeout)
+        session = _AsyncSMTPSession(reader, writer, self.timeout)
+        try:
+            code, resp = await session.reply()
+            if code != 220:
+                raise smtplib.SMTPConnectError(code, resp)
+            await self._ehlo(session)
+            if self.use_tls:
+                code, resp = await session.command("STARTTLS")
+                if code != 220:
+                    raise smtplib.SMTPResponseException(code, resp)
+                await writer.start_tls(ssl.create_default_context(), server_hostname=self.host)
+                await self._ehlo(session)
+            if self.username:
+                token = base64.b64encode(f"\0{self.username}\0{self.password}".encode()).decode()
+                code, resp = await session.command(f"AUTH PLAIN {token}")
+                if code != 235:
+                    raise smtplib.SMTPAuthenticationError(code, resp)
+        except BaseException:
+            session.close()
+            raise
+        self.connections_opened += 1
+        return session
+
+    async def _usable(self, session: _AsyncSMTPSession) -> bool:
+        idle = time.monotonic() - session.last_used
+        if session.closed or idle > self.idle_timeout or session.messages >= self.max_messages:
+            return False
+        if idle > self.noop_after:
+            try:
+                return (await session.command("NOOP"))[0] == 250
+            except Exception:
+                return False
+        return True
+
+    async def _checkout(self, fresh: bool = False) -> _AsyncSMTPSession:
+        while self._idle and not fresh:
+            session = self._idle.pop()
+            if await self._usable(session):
+                return session
+            session.close()
+        return await self._connect()
+
+    def _checkin(self, session: _AsyncSMTPSession):
+        session.last_used = time.monotonic()
+        self._idle.append(session)
+        while len(self._idle) > self.max_sessions:
+            self._idle.pop(0).close()
+
+    async def _transaction(self, session: _AsyncSMTPSession, msg: StreamingMessage) -> Dict:
+        code, resp = await session.command(f"MAIL FROM:<{msg.from_addr}>")
+        if code != 250:
+            raise smtplib.SMTPSenderRefused(code, resp, msg.from_addr)
+
+        refused = {}
+        for address in msg.to_addrs:
+            code, resp = await session.command(f"RCPT TO:<{address}>")
+            if code == 421:
+                raise smtplib.SMTPResponseException(code, resp)
+            if code not in (250, 251):
+                refused[address] = (code, resp)
+        if len(refused) == len(msg.to_addrs):
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        code, resp = await session.command("DATA")
+        if code != 354:
+            raise smtplib.SMTPDataError(code, resp)
+        session.in_data = True
+        for chunk in msg.chunks():
+            session.writer.write(chunk)
+            await session.writer.drain()      # Backpressure: never buffers more than the socket takes
+        session.writer.write(b"." + CRLF)
+        await session.writer.drain()
+        code, resp = await session.reply()
+        session.in_data = False
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+        return refused
+
+    async def _send_once(self, msg: StreamingMessage, fresh: bool = False) -> Dict:
+        async with self._get_slots():
+            session = await self._checkout(fresh)
+            try:
+                refused = await self._transaction(session, msg)
+            except Exception as e:
+                if session.in_data or _is_reconnect_error(e):
+                    session.close()
+                else:
+                    try:
+                        reusable = (await session.command("RSET"))[0] == 250
+                    except Exception:
+                        reusable = False
+                    if reusable:
+                        self._checkin(session)
+                    else:
+                        session.close()
+                raise
+            session.messages += 1
+            self._checkin(session)
+        self.messages_sent += 1
+        return refused
+
+    async def send(self, msg: StreamingMessage, retries: int = 1) -> Dict:
+        """Send a message; returns the dict of refused recipients"""
+        attempt = 0
+        while True:
+            try:
+                # Retries use a new connection; idle ones may be just as stale
+                return await self._send_once(msg, fresh=attempt > 0)
+            except Exception as e:
+                if not _is_reconnect_error(e) or attempt >= retries:
+                    raise
+                attempt += 1
+                self.reconnects += 1
+                logger.warning(f"SMTP session to {self.host} lost ({e}), reconnecting")
+
+    def stats(self) -> Dict:
+        return {
+            "connections_opened": self.connections_opened,
+            "messages_sent": self.messages_sent,
+            "reconnects": self.reconnects,
+            "idle_sessions": len(self._idle),
+            "max_sessions": self.max_sessions
+        }
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for session in idle:
+            try:
+                await session.command("QUIT")
+            except Exception:
+                pass
+            session.close()
+
+
+class AsyncNotifier:
+    """Async counterparts of NotificationManager's sends (and WhatsAppManager's).
+
+    Uses the NotificationManager's accounts, rate limiters and link settings.
+    Without aiohttp, SMS and WhatsApp sends run the synchronous transports on
+    a bounded thread pool.
+    """
+
+    def __init__(self, notifications, whatsapp=None,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 fallback_workers: int = DEFAULT_FALLBACK_WORKERS):
+        self.notifications = notifications
+        self.whatsapp = whatsapp
+        self.max_in_flight = max_in_flight
+        self.fallback_workers = fallback_workers
+        self.smtp = AsyncSMTPPool(
+            notifications.smtp_server, notifications.smtp_port, notifications.email,
+            notifications.email_password, notifications.smtp_use_tls,
+            max_sessions=notifications.smtp_max_sessions
+        )
+        self._http = None
+        self._http_loop = None
+        self._fallback = None
+        self._lock = threading.Lock()
+        if aiohttp is None:
+            logger.warning("aiohttp is not installed; async SMS and WhatsApp sends fall back to "
+                           f"{fallback_workers} threads")
+
+    def _fallback_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._fallback is None:
+                self._fallback = ThreadPoolExecutor(max_workers=self.fallback_workers,
+                                                    thread_name_prefix="delivery-fallback")
+            return self._fallback
+
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._fallback_executor(), func, *args)
+
+    def _http_session(self) -> 'aiohttp.ClientSession':
+        """Keep-alive HTTP client of the running loop, shared by Twilio and WhatsApp"""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http.closed or self._http_loop is not loop:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_in_flight)
+            )
+            self._http_loop = loop
+        return self._http
+
+    async def send_email(self, to_email: str, subject: str, body: str,
+                         attachments: List[str] = None, message_id: str = None) -> bool:
+        """Send email with optional attachments (streamed, large ones as links)"""
+        n = self.notifications
+        try:
+            attachments = attachments or []
+            links = link_attachments(attachments, n.link_threshold, n.download_url)
+            msg = StreamingMessage(n.email, [to_email], subject, body, attachments,
+                                   message_id=message_id, links=links)
+            await n.email_limiter.acquire_async()
+            await self.smtp.send(msg)
+            logger.info(f"Email sent successfully to {to_email}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send email to {to_email}: {str(e)}")
+            return False
+
+    async def send_sms_result(self, phone_number: str, message: str) -> SMSResult:
+        """Send SMS using Twilio and return its SID / error code"""
+        transport = self.notifications.sms_transport
+        if transport is None:
+            logger.warning("Twilio credentials not configured, skipping SMS")
+            return SMSResult(phone_number, False, error_message="Twilio credentials not configured",
+                             permanent=True)
+        if aiohttp is None:
+            return await self._run_blocking(transport.send, phone_number, message)
+
+        try:
+            if transport.limiter is not None:
+                await transport.limiter.acquire_async()
+            async with self._http_session().post(
+                transport.messages_url,
+                data={"From": transport.from_number, "To": phone_number, "Body": message},
+                headers={"Authorization": _basic_auth(transport.account_sid, transport.auth_token)},
+                timeout=aiohttp.ClientTimeout(total=transport.timeout)
+            ) as response:
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError:
+                    data = {}
+                result = sms_result_from_response(phone_number, response.status, data or {},
+                                                  response.reason)
+        except (aiohttp.ClientError, asyncio.TimeoutError, RateLimitTimeout) as e:
+            result = SMSResult(phone_number, False, error_message=str(e))
+        transport.record_result(result)
+        return result
+
+    async def _post_whatsapp(self, provider, request: Dict) -> Tuple[bool, Optional[str]]:
+        """One WhatsApp provider call over aiohttp; returns (success, error)"""
+        headers = {k: v for k, v in provider.session.headers.items() if k == 'Authorization'}
+        if provider.session.auth:
+            headers['Authorization'] = _basic_auth(*provider.session.auth)
+        async with self._http_session().post(
+            request['url'], json=request.get('json'), data=request.get('data'),
+            headers=headers, timeout=aiohttp.ClientTimeout(total=provider.timeout)
+        ) as response:
+            if response.status < 400:
+                return True, None
+            return False, f"HTTP {response.status}: {(await response.text())[:200]}"
+
+    async def send_whatsapp(self, phone_number: str, message: str,
+                            attachments: List[str] = None) -> bool:
+        """Send a WhatsApp message through WhatsAppManager's routing and breakers"""
+        if self.whatsapp is None:
+            logger.warning("WhatsApp is not configured, skipping message")
+            return False
+        if aiohttp is None or attachments:
+            return await self._run_blocking(self.whatsapp.send_message, phone_number, message, attachments)
+        return await self.whatsapp.send_message_async(phone_number, message, self._post_whatsapp)
+
+    def stats(self) -> Dict:
+        return {"smtp": self.smtp.stats(), "aiohttp": aiohttp is not None,
+                "max_in_flight": self.max_in_flight}
+
+    async def close(self):
+        await self.smtp.close()
+        if self._http is not None:
+            await self._http.close()
+        with self._lock:
+            fallback, self._fallback = self._fallback, None
+        if fallback is not None:
+            fallback.shutdown(wait=False)
+
+
+class AsyncDeliveryExecutor:
+    """Drop-in replacement for DeliveryExecutor that runs tasks on the delivery loop.
+
+    Tasks with send_async are awaited; others run on a small thread pool.
+    Lanes (recipient, channel) still run in order, channels are bounded by
+    channel_limits and all channels together by max_in_flight. run() blocks
+    the calling thread, so existing synchronous callers are unchanged.
+    """
+
+    def __init__(self, channel_limits: Optional[Dict[str, int]] = None,
+                 default_limit: int = DEFAULT_CHANNEL_LIMIT,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 fallback_workers: int = DEFAULT_FALLBACK_WORKERS,
+                 loop: Optional[DeliveryLoop] = None):
+        self.channel_limits = {**DEFAULT_ASYNC_CHANNEL_LIMITS, **(channel_limits or {})}
+        self.default_limit = default_limit
+        self.max_in_flight = max_in_flight
+        self.fallback_workers = fallback_workers
+        self.loop = loop or get_delivery_loop()
+        self._fallback = None
+        self._lock = threading.Lock()
+
+    def _fallback_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._fallback is None:
+                self._fallback = ThreadPoolExecutor(max_workers=self.fallback_workers,
+                                                    thread_name_prefix="delivery-sync")
+            return self._fallback
+
+    async def _run_lane(self, lane: List[DeliveryTask], channel_slots: asyncio.Semaphore,
+                        total_slots: asyncio.Semaphore) -> List[DeliveryResult]:
+        loop = asyncio.get_running_loop()
+        results = []
+        for task in lane:
+            async with channel_slots, total_slots:
+                start = time.perf_counter()
+                try:
+                    if task.send_async is not None:
+                        success = await task.send_async()
+                    else:
+                        success = await loop.run_in_executor(self._fallback_executor(), task.send)
+                    success, error = bool(success), None
+                except Exception as e:
+                    success, error = False, str(e)
+                    logger.error(f"{task.channel} delivery to {task.recipient} failed: {error}")
+                results.append(DeliveryResult(
+                    task.recipient, task.channel, task.description, success,
+                    error, time.perf_counter() - start
+                ))
+        return results
+
+    async def run_async(self, tasks: List[DeliveryTask]) -> DeliveryReport:
+        """Run every task concurrently on the running loop"""
+        start = time.perf_counter()
+        lanes: Dict[Tuple[str, str], List[DeliveryTask]] = OrderedDict()
+        for task in tasks:
+            lanes.setdefault((task.recipient, task.channel), []).append(task)
+
+        total_slots = asyncio.Semaphore(self.max_in_flight)
+        channel_slots = {
+            channel: asyncio.Semaphore(self.channel_limits.get(channel, self.default_limit))
+            for _, channel in lanes
+        }
+        lane_results = await asyncio.gather(*(
+            self._run_lane(lane, channel_slots[channel], total_slots)
+            for (_, channel), lane in lanes.items()
+        ))
+
+        report = DeliveryReport()
+        for results in lane_results:
+            report.results.extend(results)
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def run(self, tasks: List[DeliveryTask]) -> DeliveryReport:
+        """Run every task and block until all have finished (sync shim)"""
+        return self.loop.run(self.run_async(tasks))
+
+    def shutdown(self):
+        with self._lock:
+            fallback, self._fallback = self._fallback, None
+        if fallback is not None:
+            fallback.shutdown(wait=True)
@@ -2,13 +2,13 @@
 from flask import Blueprint, render_template, request, redirect, session, url_for, flash
 import sqlite3
 import hashlib
+from database import USERS_DB_PATH, get_connection
 
 auth_bp = Blueprint('auth', __name__)
 
 def get_db_connection():
-    conn = sqlite3.connect('users.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled per-thread connection (rows come back as sqlite3.Row); do not close it
+    return get_connection(USERS_DB_PATH)
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
@@ -16,18 +16,19 @@ def register():
         username = request.form['username']
         password = request.form['password']
         confirm = request.form['confirm']
+        email = request.form.get('email', '').strip() or None
         if password != confirm:
             flash("Passwords do not match")
             return redirect('/register')
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         conn = get_db_connection()
         try:
-            conn.execute('INSERT INTO users (username, password_hash) VALUES (?, ?)', (username, password_hash))
+            conn.execute('INSERT INTO users (username, password_hash, email) VALUES (?, ?, ?)',
+                         (username, password_hash, email))
             conn.commit()
         except sqlite3.IntegrityError:
             flash("Username already exists")
             return redirect('/register')
-        conn.close()
         flash("Registered successfully")
         return redirect('/login')
     return render_template('register.html')
@@ -40,11 +41,10 @@ def login():
         password_hash = hashlib.sha256(password.encode()).hexdigest()
         conn = get_db_connection()
         user = conn.execute('SELECT * FROM users WHERE username = ? AND password_hash = ?', (username, password_hash)).fetchone()
-        conn.close()
         if user:
             session['user_id'] = user['id']
             session['username'] = user['username']
-            return redirect('/dashboard')
+            return redirect('/')
         else:
             flash("Invalid credentials")
     return render_template('login.html')
@@ -9,10 +9,14 @@ import os
 import time
 import signal
 import logging
+import threading
 from pathlib import Path
 import subprocess
 import json
 
+# Seconds between outbox passes of the daemon's drainer thread
+OUTBOX_DISPATCH_INTERVAL = 60
+
 class DeathSwitchDaemon:
     """Background daemon service for Digital Death Switch"""
     
@@ -142,6 +146,35 @@ class DeathSwitchDaemon:
             os.remove(self.pidfile)
             return False
     
+    def sweep(self):
+        """Send due verifications and run expired protocols for every tenant in one pass"""
+        from switch_sweep import sweep_all
+        
+        result = sweep_all(self.config_file)
+        print(f"🔎 Sweep: {len(result.verifying)} life verifications sent, "
+              f"{len(result.executing)} death protocols run ({result.elapsed:.2f}s)")
+    
+    def import_config(self):
+        """Re-import config.json's recipients, documents and thresholds into the owner's switch"""
+        from death_switch_system import DeathSwitchAI
+        
+        DeathSwitchAI(self.config_file).seed_from_config(force=True)
+        print(f"📥 Imported {self.config_file} into the switch")
+    
+    def drain_outbox(self, death_switch, monitoring_stopped: threading.Event):
+        """Dispatch due outbox jobs every minute, next to the monitor's scheduler.
+        
+        Resumes runs interrupted by a restart and retries backed-off or
+        expired-lease jobs whether or not this process is the monitor leader.
+        Once monitoring has stopped (protocol done, kill switch) it returns
+        as soon as no job is pending or leased.
+        """
+        while True:
+            death_switch.dispatch_outbox()
+            if monitoring_stopped.is_set() and not death_switch.unfinished_run():
+                return
+            time.sleep(OUTBOX_DISPATCH_INTERVAL)
+    
     def run_daemon(self):
         """Main daemon loop"""
         from death_switch_system import DeathSwitchAI
@@ -159,13 +192,22 @@ class DeathSwitchDaemon:
             death_switch = DeathSwitchAI(self.config_file)
             logging.info("Digital Death Switch daemon started successfully")
             
-            while True:
-                try:
-                    death_switch.run_monitoring_cycle()
-                    time.sleep(3600)  # Check every hour
-                except Exception as e:
-                    logging.error(f"Error in monitoring cycle: {e}")
-                    time.sleep(300)  # Wait 5 minutes before retry
+            monitoring_stopped = threading.Event()
+            drainer = threading.Thread(target=self.drain_outbox, args=(death_switch, monitoring_stopped),
+                                       name="outbox-drainer", daemon=True)
+            drainer.start()
+            
+            # Sleeps until the next inactivity/verification deadline or
+            # maintenance job; failed cycles are retried after 5 minutes
+            try:
+                death_switch.start_monitoring()
+            finally:
+                monitoring_stopped.set()
+            logging.info("Digital Death Switch monitoring stopped")
+            
+            # Deliveries still being retried outlive the monitor
+            drainer.join()
+            logging.info("Delivery outbox drained")
                     
         except Exception as e:
             logging.error(f"Failed to start daemon: {e}")
@@ -304,6 +346,10 @@ if __name__ == "__main__":
             daemon.restart()
         elif command == 'status':
             daemon.status()
+        elif command == 'sweep':
+            daemon.sweep()
+        elif command == 'import-config':
+            daemon.import_config()
         elif command == 'install-systemd':
             install_systemd_service()
         elif command == 'install-windows':
@@ -311,10 +357,12 @@ if __name__ == "__main__":
         elif command == 'install-macos':
             install_launchd_service()
         else:
-            print("Usage: python daemon_service.py {start|stop|restart|status|install-systemd|install-windows|install-macos}")
+            print("Usage: python daemon_service.py {start|stop|restart|status|sweep|import-config|install-systemd|install-windows|install-macos}")
     else:
         print("Digital Death Switch AI - Background Service")
         print("Usage: python daemon_service.py {start|stop|restart|status}")
+        print("  sweep            - Check every tenant's switch once (multi-user deployments)")
+        print("  import-config    - Re-apply config.json recipients, documents and thresholds")
         print("\nInstallation commands:")
         print("  install-systemd  - Install as Linux systemd service")
         print("  install-windows  - Install as Windows service")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Activity ingestion benchmark - rows/sec before and after group commit
+
+Compares three ways of writing activity rows from concurrent producers:
+  legacy   - sqlite3.connect() + INSERT + commit per row (pre-pool behaviour)
+  pooled   - one pooled WAL transaction per row
+  grouped  - ActivityWriter group commit (producers wait for durability)
+
+Usage: python benchmarks/bench_activity_writer.py [rows] [threads]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection, transaction
+from activity_store import record_activities
+from activity_writer import ActivityWriter
+
+
+def run_threads(threads: int, rows_per_thread: int, write_one):
+    """Run write_one() rows_per_thread times on each thread; return elapsed seconds"""
+    def worker():
+        for i in range(rows_per_thread):
+            write_one(i)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start
+
+
+def bench_legacy(db_path: str, threads: int, rows: int) -> float:
+    get_connection(db_path)  # Create the schema
+
+    def write_one(i):
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.execute(
+            "INSERT INTO activity_log (activity_type, device_id, notes) VALUES (?, ?, ?)",
+            ("bench", "legacy", str(i))
+        )
+        conn.commit()
+        conn.close()
+
+    return run_threads(threads, rows // threads, write_one)
+
+
+def bench_pooled(db_path: str, threads: int, rows: int) -> float:
+    def write_one(i):
+        with transaction(db_path) as conn:
+            record_activities(conn, [("bench", "pooled", str(i))])
+
+    return run_threads(threads, rows // threads, write_one)
+
+
+def bench_grouped(db_path: str, threads: int, rows: int) -> float:
+    writer = ActivityWriter(db_path)
+
+    def write_one(i):
+        writer.log("bench", "grouped", str(i))
+
+    elapsed = run_threads(threads, rows // threads, write_one)
+    writer.close()
+    print(f"  grouped: {writer.rows_written} rows in {writer.batches_written} commits")
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    print(f"📊 Activity ingestion: {rows} rows from {threads} threads")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bench in [("legacy", bench_legacy),
+                            ("pooled", bench_pooled),
+                            ("grouped", bench_grouped)]:
+            db_path = os.path.join(tmp, f"{name}.db")
+            elapsed = bench(db_path, threads, rows)
+            print(f"{name:>8}: {rows / elapsed:10.0f} rows/sec ({elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
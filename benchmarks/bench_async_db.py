@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Async storage benchmark - concurrent coroutines against the database
+
+Each task runs a mixed request: log activity, read last-seen, issue and
+verify an OTP, log a delivery. Compared ways of calling the storage layer:
+  blocking  - sync calls straight from the coroutine (stalls the event loop)
+  to_thread - asyncio.to_thread() per call on the default executor
+  facade    - AsyncDatabase (bounded dedicated executor + writer futures)
+
+Reports requests/sec, per-request p50/p99 and the worst event-loop stall
+seen by a 1 ms ticker task.
+
+Usage: python benchmarks/bench_async_db.py [tasks] [concurrency]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection, transaction
+from activity_store import get_last_seen
+from activity_writer import get_activity_writer
+from otp_store import store_otp, consume_otp
+from delivery_store import record_delivery
+from async_db import AsyncDatabase
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def sync_request(db_path, i):
+    """One mixed request through the synchronous storage API"""
+    user_id = i % 50
+    get_activity_writer(db_path).log("bench", "async", str(i), user_id=user_id)
+    get_last_seen(get_connection(db_path), user_id=user_id)
+    with transaction(db_path) as conn:
+        store_otp(conn, f"{i:06d}", "bench", user_id=user_id)
+    with transaction(db_path) as conn:
+        consume_otp(conn, f"{i:06d}", "bench", user_id=user_id)
+    with transaction(db_path) as conn:
+        record_delivery(conn, f"recipient {i}", "email", "success", user_id=user_id)
+
+
+async def blocking_request(db_path, i):
+    sync_request(db_path, i)
+
+
+async def to_thread_request(db_path, i):
+    user_id = i % 50
+    await asyncio.to_thread(get_activity_writer(db_path).log, "bench", "async", str(i), user_id)
+
+    def last_seen():
+        return get_last_seen(get_connection(db_path), user_id=user_id)
+
+    def otp_store():
+        with transaction(db_path) as conn:
+            store_otp(conn, f"{i:06d}", "bench", user_id=user_id)
+
+    def otp_verify():
+        with transaction(db_path) as conn:
+            return consume_otp(conn, f"{i:06d}", "bench", user_id=user_id)
+
+    def delivery():
+        with transaction(db_path) as conn:
+            record_delivery(conn, f"recipient {i}", "email", "success", user_id=user_id)
+
+    for call in (last_seen, otp_store, otp_verify, delivery):
+        await asyncio.to_thread(call)
+
+
+def facade_request_factory(database):
+    async def facade_request(db_path, i):
+        user_id = i % 50
+        await database.log_activity("bench", "async", str(i), user_id=user_id)
+        await database.get_last_activity(user_id=user_id)
+        await database.store_otp(f"{i:06d}", "bench", user_id=user_id)
+        await database.verify_otp(f"{i:06d}", "bench", user_id=user_id)
+        await database.log_delivery(f"recipient {i}", "email", "success", user_id=user_id)
+    return facade_request
+
+
+async def run_scenario(db_path, request, tasks, concurrency):
+    """Run tasks requests, concurrency at a time; returns (elapsed, latencies, max_lag)"""
+    latencies = []
+    max_lag = 0.0
+    done = asyncio.Event()
+
+    async def ticker():
+        nonlocal max_lag
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, time.perf_counter() - start - 0.001)
+
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with limit:
+            start = time.perf_counter()
+            await request(db_path, i)
+            latencies.append(time.perf_counter() - start)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(tasks)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    return elapsed, latencies, max_lag
+
+
+def main():
+    tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    print(f"📊 Async storage: {tasks} requests, {concurrency} concurrent")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("blocking", "to_thread", "facade"):
+            db_path = os.path.join(tmp, f"{name}.db")
+            get_connection(db_path)  # Create the schema
+            database = AsyncDatabase(db_path)
+            request = {
+                "blocking": blocking_request,
+                "to_thread": to_thread_request,
+                "facade": facade_request_factory(database),
+            }[name]
+
+            elapsed, latencies, max_lag = asyncio.run(
+                run_scenario(db_path, request, tasks, concurrency)
+            )
+            database.close()
+            get_activity_writer(db_path).close()
+            print(f"{name:>10}: {tasks / elapsed:8.0f} req/sec  "
+                  f"p50 {percentile(latencies, 50) * 1000:7.2f} ms  "
+                  f"p99 {percentile(latencies, 99) * 1000:7.2f} ms  "
+                  f"max loop stall {max_lag * 1000:7.2f} ms")
+            if name == "facade":
+                print(f"            {database.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Delivery throughput benchmark - the real notification code paths against local stand-ins
+
+Starts an SMTP sink, a fake Twilio and a fake WhatsApp endpoint (all with
+injectable latency and error rates), writes a config pointing at them and
+drives:
+  life_verification - DeathSwitchAI.send_life_verification(), one at a time
+  death_protocol    - DeathSwitchAI.execute_death_protocol() for N recipients x M documents
+                      (outbox, fan-out, bundling, SMTP pool and Twilio transport)
+  whatsapp          - WhatsAppManager.send_message() per recipient and document,
+                      fanned out through the DeliveryExecutor
+
+Reports messages/sec and p50/p99 latency per channel. Send-rate limits
+are raised out of the way unless --rate-limited is given; --async runs the
+protocol on the asyncio pipeline (delivery_async) instead of threads.
+
+Usage: python benchmarks/bench_delivery.py [--recipients N] [--documents M]
+           [--latency-ms 20] [--error-rate 0.0] [--verifications 20] [--rate-limited] [--async]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_sink import SMTPSink
+from fake_twilio import FakeTwilio
+from fake_whatsapp import FakeWhatsApp
+
+UNLIMITED = {"rate": 1e6, "burst": 1e6}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def report(name: str, latencies: List[float], elapsed: float, failed: int = 0):
+    count = len(latencies)
+    print(f"{name:>18}: {count:5d} msgs {count / elapsed if elapsed else 0:8.1f} msgs/sec   "
+          f"p50 {percentile(latencies, 50) * 1000:7.1f} ms   p99 {percentile(latencies, 99) * 1000:7.1f} ms"
+          + (f"   {failed} failed" if failed else ""))
+
+
+def write_config(path: str, args, sink: SMTPSink, twilio: FakeTwilio, whatsapp: FakeWhatsApp) -> Dict:
+    documents = []
+    for d in range(args.documents):
+        file_path = os.path.join(os.path.dirname(path), f"document_{d}.pdf")
+        with open(file_path, "wb") as f:
+            f.write(os.urandom(args.document_kb * 1024))
+        documents.append({"name": f"Document {d}", "file_path": file_path,
+                          "cloud_url": f"https://example.com/documents/{d}",
+                          "description": f"Benchmark document {d}"})
+
+    config = {
+        "email": "owner@example.com",
+        "email_password": "app-password",
+        "smtp_server": "127.0.0.1",
+        "smtp_port": sink.port,
+        "smtp_use_tls": False,
+        "twilio_sid": twilio.account_sid,
+        "twilio_token": twilio.auth_token,
+        "twilio_phone": "+15550000000",
+        "twilio_api_base": twilio.base_url,
+        "whatsapp_business_token": whatsapp.token,
+        "whatsapp_phone_number_id": whatsapp.phone_number_id,
+        "whatsapp_business_api_base": whatsapp.cloud_api_base,
+        "delivery_max_attempts": 1,
+        "delivery_async": args.use_async,
+        "recipients": [
+            {"name": f"Recipient {r}", "phone": f"+1555{r:07d}", "whatsapp": f"+1555{r:07d}",
+             "email": f"recipient{r}@example.com", "preferred_language": "english"}
+            for r in range(args.recipients)
+        ],
+        "documents": documents
+    }
+    if not args.rate_limited:
+        config["rate_limits"] = {provider: UNLIMITED for provider in
+                                 ("smtp", "twilio", "whatsapp_business_api")}
+    with open(path, "w") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+def bench_life_verification(ai, count: int):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        t = time.perf_counter()
+        ai.send_life_verification()
+        latencies.append(time.perf_counter() - t)
+    report("life_verification", latencies, time.perf_counter() - start)
+
+
+def bench_death_protocol(ai):
+    report_ = ai.execute_death_protocol(resume=False)
+    for channel in sorted({r.channel for r in report_.results}):
+        results = [r for r in report_.results if r.channel == channel]
+        report(f"protocol {channel}", [r.elapsed for r in results], report_.elapsed,
+               sum(1 for r in results if not r.success))
+
+
+def bench_whatsapp(config: Dict, executor, documents: int):
+    from whatsapp_integration import WhatsAppManager
+    from delivery_executor import DeliveryTask
+
+    manager = WhatsAppManager(config)
+    tasks = [
+        DeliveryTask(r["name"], "whatsapp",
+                     lambda r=r, d=d: manager.send_message(r["whatsapp"], f"💙 Document {d} is ready"),
+                     f"Document {d}")
+        for r in config["recipients"] for d in range(documents)
+    ]
+    result = executor.run(tasks)
+    report("whatsapp", [r.elapsed for r in result.results], result.elapsed, result.failed)
+    manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delivery throughput against local provider stand-ins")
+    parser.add_argument("--recipients", type=int, default=50)
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--document-kb", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--verifications", type=int, default=20)
+    parser.add_argument("--rate-limited", action="store_true",
+                        help="keep the default per-provider send-rate limits")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="send protocol deliveries on the asyncio pipeline")
+    args = parser.parse_args()
+    latency = args.latency_ms / 1000
+
+    sink = SMTPSink(latency=latency / 4, error_rate=args.error_rate).start()  # Per reply, ~4 per message
+    twilio = FakeTwilio(latency=latency, error_rate=args.error_rate).start()
+    whatsapp = FakeWhatsApp(latency=latency, error_rate=args.error_rate).start()
+
+    # The system writes its database, log and viewer files to the working directory
+    workdir = tempfile.mkdtemp(prefix="bench_delivery_")
+    os.chdir(workdir)
+    config = write_config(os.path.join(workdir, "config.json"), args, sink, twilio, whatsapp)
+
+    from death_switch_system import DeathSwitchAI
+    logging.getLogger().setLevel(logging.CRITICAL)  # Expected failures would flood the output
+
+    ai = DeathSwitchAI(os.path.join(workdir, "config.json"))
+    print(f"📊 Delivery: {args.recipients} recipients x {args.documents} documents, "
+          f"{args.latency_ms:.0f} ms provider latency, {args.error_rate:.0%} errors, "
+          f"rate limits {'on' if args.rate_limited else 'off'}, "
+          f"{'asyncio' if args.use_async else 'threaded'} delivery (workdir {workdir})")
+
+    bench_life_verification(ai, args.verifications)
+    bench_death_protocol(ai)
+    bench_whatsapp(config, ai.delivery_executor, args.documents)
+
+    print(f"   SMTP sink: {sink.messages} accepted, {sink.rejected} rejected, "
+          f"{sink.connections} connections")
+    print(f"   Twilio:    {len(twilio.messages)} accepted, {twilio.rejected} rejected, "
+          f"{twilio.connections} connections")
+    print(f"   WhatsApp:  {whatsapp.messages} accepted, {whatsapp.rejected} rejected, "
+          f"{whatsapp.connections} connections")
+
+    ai.delivery_executor.shutdown()
+    for server in (sink, twilio, whatsapp):
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Email construction benchmark - peak memory and time per send of a large attachment
+
+  legacy    - MIMEMultipart + encode_base64 + as_string(), then sendmail
+  streaming - StreamingMessage encoded chunk by chunk onto the SMTP socket
+
+Both send to a local SMTP sink; peak memory is measured with tracemalloc.
+
+Usage: python benchmarks/bench_mime_stream.py [attachment_mb]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mime_stream import StreamingMessage
+from smtp_pool import SMTPPool
+from smtp_sink import SMTPSink
+
+SENDER = "switch@example.com"
+RECIPIENT = "recipient@example.com"
+
+
+def send_legacy(pool: SMTPPool, path: str):
+    msg = MIMEMultipart()
+    msg['From'] = SENDER
+    msg['To'] = RECIPIENT
+    msg['Subject'] = "Important Documents"
+    msg.attach(MIMEText("Please find the documents attached.", 'plain'))
+    with open(path, "rb") as attachment:
+        part = MIMEBase('application', 'octet-stream')
+        part.set_payload(attachment.read())
+    encoders.encode_base64(part)
+    part.add_header('Content-Disposition', f'attachment; filename= {os.path.basename(path)}')
+    msg.attach(part)
+    with pool.session() as smtp:
+        smtp.sendmail(SENDER, [RECIPIENT], msg.as_string())
+
+
+def send_streaming(pool: SMTPPool, path: str):
+    pool.send_streaming(StreamingMessage(SENDER, [RECIPIENT], "Important Documents",
+                                         "Please find the documents attached.", [path]))
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 25
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(os.urandom(int(size_mb * 1024 * 1024)))
+        path = f.name
+
+    print(f"📊 Email construction: one {size_mb:.0f} MB attachment")
+    try:
+        for name, send in [("legacy", send_legacy), ("streaming", send_streaming)]:
+            sink = SMTPSink().start()
+            pool = SMTPPool("127.0.0.1", sink.port, use_tls=False)
+            tracemalloc.start()
+            start = time.perf_counter()
+            send(pool, path)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            pool.close()
+            sink.stop()
+            print(f"{name:>10}: peak {peak / 1024 / 1024:7.1f} MB "
+                  f"({peak / os.path.getsize(path):.1f}x file size), {elapsed:.2f}s, "
+                  f"{sink.bytes_received / 1024 / 1024:.1f} MB on the wire")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
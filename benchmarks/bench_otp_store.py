@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+OTP store microbenchmarks - verify and purge at 1M rows
+
+Seeds otp_log with a mix of live, used and expired codes, then measures:
+  legacy   - SELECT + UPDATE verify on the unindexed pre-pool table
+  indexed  - otp_store.consume_otp() on the pooled, indexed table
+  purge    - otp_store.purge_expired_otps() over the expired rows
+
+Usage: python benchmarks/bench_otp_store.py [rows] [verifications]
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection
+from activity_store import TIMESTAMP_FORMAT
+from otp_store import consume_otp, purge_expired_otps
+
+LEGACY_OTP_TABLE = '''
+    CREATE TABLE otp_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        otp_code TEXT NOT NULL,
+        generated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        expires_at DATETIME NOT NULL,
+        used BOOLEAN DEFAULT FALSE,
+        purpose TEXT
+    )
+'''
+
+
+def seed(conn: sqlite3.Connection, rows: int):
+    """Fill otp_log: 1/3 expired, 1/3 used, 1/3 live; returns the live codes"""
+    now = datetime.utcnow()
+    expired = (now - timedelta(hours=1)).strftime(TIMESTAMP_FORMAT)
+    live = (now + timedelta(hours=1)).strftime(TIMESTAMP_FORMAT)
+    live_codes = []
+
+    def generate():
+        for i in range(rows):
+            code = f"{i:07d}"
+            kind = i % 3
+            if kind == 2:
+                live_codes.append(code)
+            yield (code, expired if kind == 0 else live, 1 if kind == 1 else 0, "life_verification")
+
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO otp_log (otp_code, expires_at, used, purpose) VALUES (?, ?, ?, ?)",
+        generate()
+    )
+    conn.execute("COMMIT")
+    return live_codes
+
+
+def bench_legacy(db_path: str, rows: int, verifications: int) -> float:
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute(LEGACY_OTP_TABLE)
+    codes = random.sample(seed(conn, rows), verifications)
+
+    start = time.perf_counter()
+    for code in codes:
+        row = conn.execute('''
+            SELECT id FROM otp_log
+            WHERE otp_code = ? AND purpose = ? AND used = FALSE AND expires_at > ?
+        ''', (code, "life_verification", datetime.utcnow().strftime(TIMESTAMP_FORMAT))).fetchone()
+        if row:
+            conn.execute("UPDATE otp_log SET used = TRUE WHERE id = ?", (row[0],))
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def bench_indexed(db_path: str, rows: int, verifications: int) -> float:
+    conn = get_connection(db_path)
+    codes = random.sample(seed(conn, rows), verifications)
+
+    start = time.perf_counter()
+    for code in codes:
+        if not consume_otp(conn, code, "life_verification"):
+            raise RuntimeError(f"Live code {code} was not consumed")
+    return time.perf_counter() - start
+
+
+def bench_purge(db_path: str) -> float:
+    conn = get_connection(db_path)
+    start = time.perf_counter()
+    purged = purge_expired_otps(conn)
+    elapsed = time.perf_counter() - start
+    remaining = conn.execute("SELECT COUNT(*) FROM otp_log").fetchone()[0]
+    print(f"   purge: {purged} rows in {elapsed:.2f}s ({remaining} live rows left)")
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    verifications = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print(f"📊 OTP store: {rows} rows, {verifications} verifications")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = bench_legacy(os.path.join(tmp, "legacy.db"), rows, verifications)
+        print(f"  legacy: {verifications / legacy:10.0f} verifies/sec "
+              f"({legacy / verifications * 1000:.3f} ms each)")
+
+        db_path = os.path.join(tmp, "indexed.db")
+        indexed = bench_indexed(db_path, rows, verifications)
+        print(f" indexed: {verifications / indexed:10.0f} verifies/sec "
+              f"({indexed / verifications * 1000:.3f} ms each)")
+
+        bench_purge(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+SMS transport benchmark - messages/sec against a local fake Twilio
+
+  legacy  - new HTTP session per message (what a new twilio Client per call costs)
+  pooled  - TwilioSMSTransport.send() one by one over the keep-alive session
+  batch   - TwilioSMSTransport.send_batch() with bounded concurrency
+
+Numbers ending in 000 are rejected as invalid, so the run also checks that
+error codes are captured per message.
+
+Usage: python benchmarks/bench_sms_transport.py [messages] [latency_ms]
+"""
+
+import os
+import sys
+import time
+import logging
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sms_transport import TwilioSMSTransport
+from fake_twilio import FakeTwilio
+
+INVALID_SUFFIX = "000"
+
+
+def build_messages(count: int):
+    return [(f"+1555{i:07d}", f"💙 Access code {i:06d}") for i in range(1, count + 1)]
+
+
+def bench_legacy(fake: FakeTwilio, messages) -> float:
+    url = f"{fake.base_url}/2010-04-01/Accounts/{fake.account_sid}/Messages.json"
+    start = time.perf_counter()
+    for to, body in messages:
+        with requests.Session() as session:
+            session.post(url, data={"From": "+15550000000", "To": to, "Body": body},
+                         auth=(fake.account_sid, fake.auth_token), timeout=15)
+    return time.perf_counter() - start
+
+
+def bench_pooled(fake: FakeTwilio, messages) -> float:
+    transport = TwilioSMSTransport(fake.account_sid, fake.auth_token, "+15550000000", fake.base_url)
+    start = time.perf_counter()
+    results = [transport.send(to, body) for to, body in messages]
+    elapsed = time.perf_counter() - start
+    transport.close()
+    report(results)
+    return elapsed
+
+
+def bench_batch(fake: FakeTwilio, messages) -> float:
+    transport = TwilioSMSTransport(fake.account_sid, fake.auth_token, "+15550000000", fake.base_url)
+    start = time.perf_counter()
+    results = transport.send_batch(messages)
+    elapsed = time.perf_counter() - start
+    transport.close()
+    report(results)
+    return elapsed
+
+
+def report(results):
+    failed = [r for r in results if not r.success]
+    codes = sorted({r.error_code for r in failed})
+    print(f"   {len(results) - len(failed)} SIDs captured, {len(failed)} failed with codes {codes}")
+
+
+def main():
+    logging.getLogger("sms_transport").setLevel(logging.CRITICAL)  # Expected rejections
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+    messages = build_messages(count)
+
+    print(f"📊 SMS transport: {count} messages, {latency * 1000:.0f} ms API latency")
+    for name, bench in [("legacy", bench_legacy), ("pooled", bench_pooled), ("batch", bench_batch)]:
+        fake = FakeTwilio(latency=latency, invalid_suffix=INVALID_SUFFIX).start()
+        elapsed = bench(fake, messages)
+        fake.stop()
+        print(f"{name:>8}: {count / elapsed:8.0f} msgs/sec ({elapsed:.2f}s, "
+              f"{fake.connections} connections)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+SMTP transport benchmark - messages/sec with and without session pooling
+
+Sends the same message through a local SMTP stand-in (benchmarks/smtp_sink.py):
+  legacy  - connect, EHLO, login, send, QUIT per message (old send_email)
+  pooled  - SMTPPool reusing authenticated sessions
+
+The sink adds a per-reply delay to model the network round trip and
+answers 421 after a fixed number of messages per connection, so the
+pooled run also exercises reconnects. STARTTLS is skipped on both sides.
+
+Usage: python benchmarks/bench_smtp_pool.py [messages] [threads] [latency_ms]
+"""
+
+import os
+import sys
+import time
+import logging
+import smtplib
+import threading
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_pool import SMTPPool
+from smtp_sink import SMTPSink
+
+SENDER = "owner@example.com"
+PASSWORD = "app-password"
+
+
+def build_message(i: int) -> MIMEText:
+    msg = MIMEText("Please verify you are alive.\n" * 20, "plain")
+    msg['From'] = SENDER
+    msg['To'] = f"recipient{i}@example.com"
+    msg['Subject'] = f"Verification {i}"
+    return msg
+
+
+def run_threads(threads: int, messages: int, send_one) -> float:
+    """Split messages over threads calling send_one(i); return elapsed seconds"""
+    def worker(offset):
+        for i in range(offset, messages, threads):
+            send_one(i)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - start
+
+
+def bench_legacy(port: int, messages: int, threads: int) -> float:
+    def send_one(i):
+        server = smtplib.SMTP("127.0.0.1", port)
+        server.login(SENDER, PASSWORD)
+        server.sendmail(SENDER, f"recipient{i}@example.com", build_message(i).as_string())
+        server.quit()
+
+    return run_threads(threads, messages, send_one)
+
+
+def bench_pooled(port: int, messages: int, threads: int) -> float:
+    pool = SMTPPool("127.0.0.1", port, SENDER, PASSWORD, use_tls=False, max_sessions=threads)
+
+    def send_one(i):
+        pool.send_message(build_message(i), SENDER, [f"recipient{i}@example.com"])
+
+    elapsed = run_threads(threads, messages, send_one)
+    pool.close()
+    print(f"   pooled: {pool.stats()}")
+    return elapsed
+
+
+def main():
+    logging.getLogger("smtp_pool").setLevel(logging.ERROR)  # Expected 421 reconnects
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.002
+
+    print(f"📊 SMTP transport: {messages} messages from {threads} threads, "
+          f"{latency * 1000:.1f} ms per reply")
+    for name, bench in [("legacy", bench_legacy), ("pooled", bench_pooled)]:
+        sink = SMTPSink(latency=latency, max_per_connection=50).start()
+        elapsed = bench(sink.port, messages, threads)
+        sink.stop()
+        print(f"{name:>8}: {messages / elapsed:8.0f} msgs/sec ({elapsed:.2f}s, "
+              f"{sink.connections} connections, {sink.messages} delivered)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Inactivity sweep benchmark - per-user checks vs the set-based due_at sweep
+
+Builds a database with N switches (default 100k) whose last activity is
+spread over the past weeks, a share of them already verifying, then finds
+and claims every due switch two ways:
+  per_user - one last_seen lookup per switch and a threshold check in Python
+             (what looping check_inactivity() over every tenant costs,
+             without the per-user DeathSwitchAI construction and config load)
+  sweep    - SwitchSweeper: indexed due_at range scans that claim and advance
+             due switches in batches (no-op stages)
+
+Usage: python benchmarks/bench_switch_sweep.py [switches] [batch_size]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection, transaction
+from activity_store import ANY_DEVICE, TIMESTAMP_FORMAT, get_last_seen
+from switch_state import ARMED_DUE_AT_SQL, VERIFYING, due_switches
+from switch_sweep import SwitchSweeper
+
+INACTIVITY_DAYS = 10
+VERIFYING_SHARE = 0.01
+
+
+def populate(db_path: str, switches: int) -> int:
+    """Create the switches; returns how many of them are due"""
+    now = datetime.utcnow()
+    last_seen = [
+        (user_id, ANY_DEVICE, (now - timedelta(seconds=random.uniform(0, 12 * 86400))).strftime(TIMESTAMP_FORMAT))
+        for user_id in range(1, switches + 1)
+    ]
+    with transaction(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO last_seen (user_id, device_id, last_activity, activity_type) VALUES (?, ?, ?, 'bench')",
+            last_seen
+        )
+        conn.execute('''
+            INSERT INTO switch_state (user_id, state, inactivity_days, armed_at)
+            SELECT user_id, 'armed', ?, CURRENT_TIMESTAMP FROM last_seen WHERE device_id = ?
+        ''', (INACTIVITY_DAYS, ANY_DEVICE))
+        conn.execute(f"UPDATE switch_state SET due_at = {ARMED_DUE_AT_SQL}")
+
+        # Some switches are mid-verification; half of their deadlines have passed
+        verifying = random.sample(range(1, switches + 1), int(switches * VERIFYING_SHARE))
+        conn.executemany(
+            "UPDATE switch_state SET state = ?, verification_deadline = ?, due_at = ? WHERE user_id = ?",
+            [(VERIFYING, deadline, deadline, user_id) for user_id, deadline in (
+                (user_id, (now + timedelta(hours=random.uniform(-24, 24))).strftime(TIMESTAMP_FORMAT))
+                for user_id in verifying
+            )]
+        )
+    return len(due_switches(get_connection(db_path)))
+
+
+def bench_per_user(db_path: str, switches: int) -> tuple:
+    conn = get_connection(db_path)
+    threshold = timedelta(days=INACTIVITY_DAYS)
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    due = 0
+    for user_id in range(1, switches + 1):
+        last_activity = get_last_seen(conn, user_id=user_id)
+        if last_activity and now - last_activity >= threshold:
+            due += 1
+    return due, time.perf_counter() - start
+
+
+def bench_sweep(db_path: str, batch_size: int) -> tuple:
+    sweeper = SwitchSweeper(lambda batch: None, lambda batch: None, db_path, batch_size)
+    result = sweeper.sweep()
+    return result, result.elapsed
+
+
+def main():
+    switches = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench_sweep_"), "sweep.db")
+
+    start = time.perf_counter()
+    due = populate(db_path, switches)
+    print(f"📊 {switches} switches ({due} due), populated in {time.perf_counter() - start:.1f}s")
+
+    conn = get_connection(db_path)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT user_id FROM switch_state "
+                        "WHERE state = 'armed' AND due_at <= ? ORDER BY due_at", ("now",)).fetchall()
+    print(f"   due_at scan plan: {plan[0][-1]}")
+
+    start = time.perf_counter()
+    found = len(due_switches(conn))
+    print(f"{'find_due':>14}: {found:6d} due in {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    inactive, elapsed = bench_per_user(db_path, switches)
+    print(f"{'per_user':>14}: {inactive:6d} inactive in {elapsed * 1000:8.1f} ms "
+          f"({switches} queries, verification deadlines not checked)")
+
+    result, elapsed = bench_sweep(db_path, batch_size)
+    print(f"{'sweep':>14}: {len(result.verifying):6d} to verify, {len(result.executing)} to execute "
+          f"in {elapsed * 1000:8.1f} ms ({result.batches} batches of up to {batch_size})")
+    print(f"   left due after sweep: {len(due_switches(conn))}")
+
+
+if __name__ == "__main__":
+    main()
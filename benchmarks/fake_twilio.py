@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Local fake of the Twilio Messages API for SMS transport tests and benchmarks
+
+Accepts POST /2010-04-01/Accounts/<sid>/Messages.json with HTTP basic auth
+and answers like Twilio: 201 with an SM... SID, or a 4xx/5xx JSON error
+(code, message). HTTP/1.1 keep-alive, so connection reuse is visible in
+the connection counter. Latency and errors can be injected:
+  latency       - seconds before every response
+  error_rate    - fraction of messages answered with 500 (code 20500)
+  invalid_suffix- To numbers ending with this get 400 (code 21211)
+"""
+
+import json
+import time
+import base64
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import parse_qs
+
+
+class _TwilioHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def respond(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        fake = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 4 or parts[2] != fake.account_sid or parts[3] != "Messages.json":
+            return self.respond(404, {"code": 20404, "message": "The requested resource was not found",
+                                      "status": 404})
+
+        expected = "Basic " + base64.b64encode(
+            f"{fake.account_sid}:{fake.auth_token}".encode()).decode()
+        if self.headers.get("Authorization") != expected:
+            return self.respond(401, {"code": 20003, "message": "Authenticate", "status": 401})
+
+        to = form.get("To", "")
+        if fake.invalid_suffix and to.endswith(fake.invalid_suffix):
+            with fake.lock:
+                fake.rejected += 1
+            return self.respond(400, {"code": 21211, "status": 400,
+                                      "message": f"The 'To' number {to} is not a valid phone number."})
+        if fake.error_rate and random.random() < fake.error_rate:
+            with fake.lock:
+                fake.rejected += 1
+            return self.respond(500, {"code": 20500, "message": "Internal Server Error", "status": 500})
+
+        with fake.lock:
+            fake.messages.append(form)
+            sid = f"SM{len(fake.messages):032x}"
+        self.respond(201, {"sid": sid, "status": "queued", "to": to, "from": form.get("From"),
+                           "body": form.get("Body"), "error_code": None, "error_message": None})
+
+
+class FakeTwilio(ThreadingHTTPServer):
+    """Threaded fake Twilio REST endpoint on localhost"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0),
+                 account_sid: str = "ACfake", auth_token: str = "token",
+                 latency: float = 0.0, error_rate: float = 0.0, invalid_suffix: str = ""):
+        super().__init__(address, _TwilioHandler)
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.latency = latency
+        self.error_rate = error_rate
+        self.invalid_suffix = invalid_suffix
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.rejected = 0
+        self.messages = []
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self) -> 'FakeTwilio':
+        threading.Thread(target=self.serve_forever, name="fake-twilio", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    fake = FakeTwilio(("127.0.0.1", 8089)).start()
+    print(f"📱 Fake Twilio at {fake.base_url} (account {fake.account_sid}, token {fake.auth_token})")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   {len(fake.messages)} messages over {fake.connections} connections")
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Local fake WhatsApp endpoints for delivery tests and benchmarks
+
+Answers the Cloud API paths WhatsAppBusinessAPI uses
+(POST /v18.0/<phone_number_id>/messages and /media, Bearer token) and the
+gateway paths of WhatsAppWebAPI (/send-message, /send-file) and BaileysAPI
+(/send, /send-media). HTTP/1.1 keep-alive, with injectable faults:
+  latency    - seconds before every response
+  error_rate - fraction of requests answered with 503 (Meta code 131000)
+"""
+
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+API_VERSION = "v18.0"
+
+
+class _WhatsAppHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def respond(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        fake = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        parts = self.path.strip("/").split("/")
+        cloud_api = len(parts) == 3 and parts[0] == API_VERSION
+        if cloud_api:
+            if parts[1] != fake.phone_number_id or parts[2] not in ("messages", "media"):
+                return self.respond(404, {"error": {"message": "Unsupported post request", "code": 100}})
+            if self.headers.get("Authorization") != f"Bearer {fake.token}":
+                return self.respond(401, {"error": {"message": "Invalid OAuth access token", "code": 190}})
+        elif self.path not in ("/send-message", "/send-file", "/send", "/send-media"):
+            return self.respond(404, {"error": "not found"})
+
+        if fake.error_rate and random.random() < fake.error_rate:
+            with fake.lock:
+                fake.rejected += 1
+            return self.respond(503, {"error": {"message": "Service temporarily unavailable",
+                                                "code": 131000}})
+
+        with fake.lock:
+            fake.messages += 1
+            message_id = f"wamid.{fake.messages:024x}"
+        if cloud_api and parts[2] == "media":
+            return self.respond(200, {"id": f"media.{fake.messages}"})
+        self.respond(200, {"messaging_product": "whatsapp", "messages": [{"id": message_id}]})
+
+
+class FakeWhatsApp(ThreadingHTTPServer):
+    """Threaded fake WhatsApp Cloud API / gateway on localhost"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0),
+                 phone_number_id: str = "100200300", token: str = "token",
+                 latency: float = 0.0, error_rate: float = 0.0):
+        super().__init__(address, _WhatsAppHandler)
+        self.phone_number_id = phone_number_id
+        self.token = token
+        self.latency = latency
+        self.error_rate = error_rate
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.rejected = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    @property
+    def cloud_api_base(self) -> str:
+        """Value for the whatsapp_business_api_base config key"""
+        return f"{self.base_url}/{API_VERSION}"
+
+    def start(self) -> 'FakeWhatsApp':
+        threading.Thread(target=self.serve_forever, name="fake-whatsapp", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    fake = FakeWhatsApp(("127.0.0.1", 8090)).start()
+    print(f"💬 Fake WhatsApp at {fake.cloud_api_base} (phone number id {fake.phone_number_id}, "
+          f"token {fake.token})")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   {fake.messages} messages over {fake.connections} connections")
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Local SMTP stand-in for delivery benchmarks
+
+Speaks just enough ESMTP (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET,
+NOOP, QUIT) for smtplib, discards every message and counts it. Optional
+per-reply latency models the network round trip, and max_per_connection
+makes the server answer 421 and hang up like a provider enforcing a
+per-session message limit. error_rate rejects that fraction of messages
+with a 451 temporary failure after DATA.
+"""
+
+import time
+import random
+import threading
+import socketserver
+from typing import Optional, Tuple
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line: str):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        sink = self.server
+        with sink.lock:
+            sink.connections += 1
+        delivered = 0
+        self.reply("220 smtp-sink ESMTP ready")
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self.reply("250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SMTPUTF8")
+            elif verb == "HELO":
+                self.reply("250 smtp-sink")
+            elif verb == "AUTH":
+                parts = command.split()
+                if len(parts) == 2 and parts[1].upper() == "LOGIN":
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                if sink.max_per_connection and delivered >= sink.max_per_connection:
+                    self.reply("421 4.7.0 Too many messages, closing connection")
+                    return
+                self.reply("250 2.1.0 OK")
+            elif verb == "RCPT":
+                self.reply("250 2.1.5 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b".\r\n", b".\n"):
+                        break
+                    size += len(chunk)
+                if sink.error_rate and random.random() < sink.error_rate:
+                    with sink.lock:
+                        sink.rejected += 1
+                    self.reply("451 4.3.0 Temporary failure, try again later")
+                    continue
+                delivered += 1
+                with sink.lock:
+                    sink.messages += 1
+                    sink.bytes_received += size
+                self.reply("250 2.0.0 Queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 2.0.0 OK")
+            elif verb == "QUIT":
+                self.reply("221 2.0.0 Bye")
+                return
+            else:
+                self.reply("502 5.5.2 Command not implemented")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Threaded SMTP server on localhost that swallows mail"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int] = ("127.0.0.1", 0), latency: float = 0.0,
+                 max_per_connection: Optional[int] = None, error_rate: float = 0.0):
+        super().__init__(address, _SinkHandler)
+        self.latency = latency                        # Seconds before every reply
+        self.max_per_connection = max_per_connection  # 421 after this many messages
+        self.error_rate = error_rate                  # Fraction of messages answered 451
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        self.rejected = 0
+        self.bytes_received = 0
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> 'SMTPSink':
+        self._thread = threading.Thread(target=self.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    sink = SMTPSink(("127.0.0.1", 2525)).start()
+    print(f"📮 SMTP sink listening on 127.0.0.1:{sink.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   {sink.messages} messages over {sink.connections} connections")
+    except KeyboardInterrupt:
+        sink.stop()
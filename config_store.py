@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Recipient and document storage for Digital Death Switch AI
+Replaces config/recipients.json and config/documents.json with indexed
+SQLite tables, and migrates the old JSON files (and config.json) once
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import logging
+from typing import Dict, List, Optional
+
+from database import DEFAULT_DB_PATH, USERS_DB_PATH, get_connection, transaction
+from activity_store import OWNER_USER_ID
+
+logger = logging.getLogger(__name__)
+
+CONFIG_DIR = "config"
+CONFIG_FILE = "config.json"
+
+# Fields understood by death_switch_system.Recipient / Document
+RECIPIENT_FIELDS = ('name', 'phone', 'whatsapp', 'email', 'preferred_language')
+DOCUMENT_FIELDS = ('name', 'file_path', 'cloud_url', 'description')
+
+
+def _recipient_row(data: Dict, user_id: int) -> tuple:
+    return (
+        user_id,
+        data['name'],
+        data['email'],
+        data['phone'],
+        data.get('whatsapp') or data['phone'],
+        data.get('preferred_language') or 'english'
+    )
+
+
+def add_recipient(conn: sqlite3.Connection, data: Dict,
+                  user_id: int = OWNER_USER_ID) -> int:
+    """Insert a recipient; raises sqlite3.IntegrityError if the email exists"""
+    cursor = conn.execute('''
+        INSERT INTO recipients (user_id, name, email, phone, whatsapp, preferred_language)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', _recipient_row(data, user_id))
+    return cursor.lastrowid
+
+
+def upsert_recipient(conn: sqlite3.Connection, data: Dict,
+                     user_id: int = OWNER_USER_ID):
+    """Insert a recipient or update the one with the same email"""
+    conn.execute('''
+        INSERT INTO recipients (user_id, name, email, phone, whatsapp, preferred_language)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, email) DO UPDATE SET
+            name = excluded.name,
+            phone = excluded.phone,
+            whatsapp = excluded.whatsapp,
+            preferred_language = excluded.preferred_language
+    ''', _recipient_row(data, user_id))
+
+
+def list_recipients(conn: sqlite3.Connection,
+                    user_id: int = OWNER_USER_ID) -> List[Dict]:
+    """All recipients in insertion order"""
+    cursor = conn.execute('''
+        SELECT id, name, email, phone, whatsapp, preferred_language, created_at
+        FROM recipients WHERE user_id = ? ORDER BY id
+    ''', (user_id,))
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def count_recipients(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID) -> int:
+    return conn.execute(
+        "SELECT COUNT(*) FROM recipients WHERE user_id = ?", (user_id,)
+    ).fetchone()[0]
+
+
+def add_document(conn: sqlite3.Connection, data: Dict,
+                 user_id: int = OWNER_USER_ID, ignore_existing: bool = False) -> Optional[int]:
+    """Insert a document record (unique per file_path)"""
+    verb = "INSERT OR IGNORE" if ignore_existing else "INSERT"
+    cursor = conn.execute(f'''
+        {verb} INTO documents (user_id, name, file_path, cloud_url, description, uploaded_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (
+        user_id,
+        data['name'],
+        data['file_path'],
+        data.get('cloud_url'),
+        data.get('description'),
+        data.get('uploaded_at')
+    ))
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+def list_documents(conn: sqlite3.Connection,
+                   user_id: int = OWNER_USER_ID) -> List[Dict]:
+    """All documents in upload order"""
+    cursor = conn.execute('''
+        SELECT id, name, file_path, cloud_url, description, uploaded_at
+        FROM documents WHERE user_id = ? ORDER BY id
+    ''', (user_id,))
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def count_documents(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID) -> int:
+    return conn.execute(
+        "SELECT COUNT(*) FROM documents WHERE user_id = ?", (user_id,)
+    ).fetchone()[0]
+
+
+def get_account_email(user_id: int, users_db_path: str = USERS_DB_PATH) -> Optional[str]:
+    """Email a users.db account registered with (None if unknown)"""
+    row = get_connection(users_db_path).execute(
+        "SELECT email FROM users WHERE id = ?", (user_id,)
+    ).fetchone()
+    return row[0] if row and row[0] else None
+
+
+def import_entries(conn: sqlite3.Connection, recipients: List[Dict],
+                   documents: List[Dict], user_id: int = OWNER_USER_ID) -> Dict:
+    """Import recipient/document dicts, skipping ones that already exist"""
+    imported = {"recipients": 0, "documents": 0}
+    for recipient in recipients or []:
+        if not all(recipient.get(field) for field in ('name', 'email', 'phone')):
+            logger.warning(f"Skipping incomplete recipient entry: {recipient}")
+            continue
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO recipients
+                (user_id, name, email, phone, whatsapp, preferred_language)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', _recipient_row(recipient, user_id))
+        imported["recipients"] += cursor.rowcount
+
+    for document in documents or []:
+        if not document.get('name') or not document.get('file_path'):
+            logger.warning(f"Skipping incomplete document entry: {document}")
+            continue
+        if add_document(conn, document, user_id, ignore_existing=True):
+            imported["documents"] += 1
+
+    return imported
+
+
+def import_config(config: Dict, db_path: str = DEFAULT_DB_PATH,
+                  user_id: int = OWNER_USER_ID) -> Dict:
+    """Import the recipients/documents of a loaded config.json"""
+    with transaction(db_path) as conn:
+        return import_entries(conn, config.get('recipients', []),
+                              config.get('documents', []), user_id)
+
+
+def migrate_json_config(db_path: str = DEFAULT_DB_PATH, config_dir: str = CONFIG_DIR,
+                        config_file: str = CONFIG_FILE,
+                        user_id: int = OWNER_USER_ID) -> Dict:
+    """One-shot migration of config/*.json and config.json into the database.
+
+    The web UI JSON files are renamed to *.migrated afterwards so they are
+    never imported twice; config.json is left in place (it holds credentials)
+    and its entries are only imported while the switch has no recipients or
+    documents stored, de-duplicated by email / file path.
+    """
+    totals = {"recipients": 0, "documents": 0}
+    json_files = {
+        "recipients": os.path.join(config_dir, "recipients.json"),
+        "documents": os.path.join(config_dir, "documents.json"),
+    }
+
+    loaded = {}
+    for kind, path in json_files.items():
+        try:
+            with open(path, "r") as f:
+                loaded[kind] = json.load(f)
+        except FileNotFoundError:
+            continue  # Never created, or already migrated by another worker
+
+    config = {}
+    if config_file and os.path.exists(config_file):
+        try:
+            with open(config_file, "r") as f:
+                config = json.load(f)
+        except ValueError as e:
+            logger.warning(f"Skipping unreadable {config_file}: {e}")
+    if not isinstance(config, dict):
+        config = {}
+
+    if not loaded and not config:
+        return totals
+
+    with transaction(db_path) as conn:
+        # config.json only seeds a switch that has nothing stored yet
+        sources = [loaded]
+        if not (count_recipients(conn, user_id) or count_documents(conn, user_id)):
+            sources.append(config)
+        for source in sources:
+            imported = import_entries(conn, source.get('recipients', []),
+                                      source.get('documents', []), user_id)
+            totals["recipients"] += imported["recipients"]
+            totals["documents"] += imported["documents"]
+
+    for kind in loaded:
+        try:
+            os.replace(json_files[kind], json_files[kind] + ".migrated")
+        except FileNotFoundError:
+            pass
+
+    if totals["recipients"] or totals["documents"]:
+        logger.info(f"Migrated {totals['recipients']} recipients and "
+                    f"{totals['documents']} documents into {db_path}")
+    return totals
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "migrate":
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        result = migrate_json_config()
+        print(f"✅ Migrated {result['recipients']} recipients and {result['documents']} documents")
+    else:
+        print("Usage: python config_store.py migrate")
@@ -1,12 +1,5 @@
+from database import USERS_DB_PATH, get_connection
 
-import sqlite3
-
-conn = sqlite3.connect('users.db')
-conn.execute('''CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE NOT NULL,
-    password_hash TEXT NOT NULL
-)''')
-conn.commit()
-conn.close()
+# The pool creates the users table the first time it connects
+get_connection(USERS_DB_PATH)
 print("users.db initialized.")
@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+Shared SQLite connection layer for Digital Death Switch AI
+Hands out pooled, per-thread WAL-mode connections so every component
+(web backend, death switch core, device monitor, auth) shares one tuned setup
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "death_switch.db"
+USERS_DB_PATH = "users.db"
+
+# Pragmas applied to every pooled connection
+DEFAULT_PRAGMAS = {
+    'auto_vacuum': 'INCREMENTAL',  # New databases only; see activity_retention
+    'journal_mode': 'WAL',       # Readers never block on the writer
+    'synchronous': 'NORMAL',     # Safe with WAL, avoids an fsync per commit
+    'busy_timeout': 5000,        # Wait up to 5s for a competing writer
+    'mmap_size': 268435456,      # 256 MB memory-mapped reads
+    'cache_size': -16000,        # ~16 MB page cache (negative = KiB)
+    'temp_store': 'MEMORY',
+}
+
+# Per-connection prepared statement cache size (sqlite3 default is 128)
+CACHED_STATEMENTS = 256
+
+# Idle connections kept around for threads that come and go
+MAX_IDLE_CONNECTIONS = 8
+
+
+def _ensure_column(cursor: sqlite3.Cursor, table: str, column: str, definition: str):
+    """Add a column to a table created by an older version of the schema"""
+    columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def init_schema(conn: sqlite3.Connection):
+    """Create the death switch tables.
+
+    Every per-switch table carries a user_id (users.db id, 0 for the
+    single-user owner) and is indexed with user_id leading, so one tenant's
+    rows never have to be scanned to answer another tenant's queries.
+    """
+    cursor = conn.cursor()
+
+    # Activity tracking table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            activity_type TEXT NOT NULL,
+            device_id TEXT,
+            notes TEXT,
+            user_id INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    _ensure_column(cursor, 'activity_log', 'user_id', 'INTEGER NOT NULL DEFAULT 0')
+
+    # Activity is read newest-first per user, and per device or type;
+    # the global timestamp index serves retention across all tenants
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_activity_log_timestamp
+        ON activity_log (timestamp)
+    ''')
+    cursor.execute("DROP INDEX IF EXISTS idx_activity_log_device_timestamp")
+    cursor.execute("DROP INDEX IF EXISTS idx_activity_log_type_timestamp")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_activity_log_user_timestamp
+        ON activity_log (user_id, timestamp)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_activity_log_user_device_timestamp
+        ON activity_log (user_id, device_id, timestamp)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_activity_log_user_type_timestamp
+        ON activity_log (user_id, activity_type, timestamp)
+    ''')
+
+    # Materialized last activity per user and per device ('' = any device),
+    # updated in the same transaction as each activity insert
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS last_seen (
+            user_id INTEGER NOT NULL DEFAULT 0,
+            device_id TEXT NOT NULL DEFAULT '',
+            last_activity DATETIME NOT NULL,
+            activity_type TEXT,
+            PRIMARY KEY (user_id, device_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Backfill last_seen once for databases created before it existed
+    if cursor.execute("SELECT 1 FROM last_seen LIMIT 1").fetchone() is None:
+        cursor.execute('''
+            INSERT OR IGNORE INTO last_seen (user_id, device_id, last_activity)
+            SELECT 0, '', MAX(timestamp) FROM activity_log
+            HAVING MAX(timestamp) IS NOT NULL
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO last_seen (user_id, device_id, last_activity)
+            SELECT 0, device_id, MAX(timestamp) FROM activity_log
+            WHERE device_id IS NOT NULL AND device_id != ''
+            GROUP BY device_id
+        ''')
+
+    # Daily per-type, per-device summaries of compacted activity_log rows
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_rollup (
+            day DATE NOT NULL,
+            user_id INTEGER NOT NULL DEFAULT 0,
+            device_id TEXT NOT NULL DEFAULT '',
+            activity_type TEXT NOT NULL,
+            activity_count INTEGER NOT NULL,
+            first_seen DATETIME NOT NULL,
+            last_seen DATETIME NOT NULL,
+            PRIMARY KEY (day, user_id, device_id, activity_type)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_activity_rollup_user_day
+        ON activity_rollup (user_id, day)
+    ''')
+
+    # Recipients (formerly config/recipients.json), one per email
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL DEFAULT 0,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL COLLATE NOCASE,
+            phone TEXT NOT NULL,
+            whatsapp TEXT,
+            preferred_language TEXT NOT NULL DEFAULT 'english',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_recipients_user_email
+        ON recipients (user_id, email)
+    ''')
+
+    # Documents (formerly config/documents.json), one per stored file
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL DEFAULT 0,
+            name TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            cloud_url TEXT,
+            description TEXT,
+            uploaded_at INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_user_path
+        ON documents (user_id, file_path)
+    ''')
+
+    # OTP tracking table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS otp_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            otp_code TEXT NOT NULL,
+            generated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            expires_at DATETIME NOT NULL,
+            used BOOLEAN DEFAULT FALSE,
+            purpose TEXT,
+            user_id INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    _ensure_column(cursor, 'otp_log', 'user_id', 'INTEGER NOT NULL DEFAULT 0')
+
+    # Verification looks codes up by (user, code, purpose) among live rows;
+    # the purge walks expires_at
+    cursor.execute("DROP INDEX IF EXISTS idx_otp_log_lookup")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_otp_log_user_lookup
+        ON otp_log (user_id, otp_code, purpose, used, expires_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_otp_log_expires_at
+        ON otp_log (expires_at)
+    ''')
+
+    # Delivery log table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient_name TEXT NOT NULL,
+            delivery_method TEXT NOT NULL,
+            status TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            message_id TEXT,
+            error_details TEXT,
+            user_id INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    _ensure_column(cursor, 'delivery_log', 'user_id', 'INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_delivery_log_user_timestamp
+        ON delivery_log (user_id, timestamp)
+    ''')
+
+    # Outbox of protocol deliveries, one job per (recipient, document, channel)
+    # of a run; workers lease due jobs and retry failures with backoff
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS delivery_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL DEFAULT 0,
+            run_id TEXT NOT NULL,
+            idempotency_key TEXT NOT NULL,
+            recipient_name TEXT NOT NULL,
+            document_name TEXT,
+            channel TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 5,
+            next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            lease_owner TEXT,
+            lease_expires_at DATETIME,
+            message_id TEXT,
+            last_error TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_delivery_outbox_user_key
+        ON delivery_outbox (user_id, idempotency_key)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_delivery_outbox_user_status_due
+        ON delivery_outbox (user_id, status, next_attempt_at)
+    ''')
+
+    # Token buckets of the send-rate limiter, one per provider and sender
+    # account, shared by every worker; updated_at is Unix time
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+            bucket TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            acquired INTEGER NOT NULL DEFAULT 0,
+            waited INTEGER NOT NULL DEFAULT 0,
+            total_wait REAL NOT NULL DEFAULT 0,
+            max_wait REAL NOT NULL DEFAULT 0
+        )
+    ''')
+
+    # Lifecycle of each switch (armed/verifying/executing/done/disabled), its
+    # verification deadline and when it entered each state; all times UTC.
+    # due_at is when the switch next needs attention (inactivity expiry,
+    # verification deadline, execution lease), kept current on every activity
+    # commit and transition so the sweep finds due switches by index
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS switch_state (
+            user_id INTEGER PRIMARY KEY,
+            state TEXT NOT NULL DEFAULT 'armed',
+            verification_deadline DATETIME,
+            due_at DATETIME,
+            inactivity_days REAL NOT NULL DEFAULT 10,
+            verification_hours REAL NOT NULL DEFAULT 48,
+            armed_at DATETIME,
+            verifying_at DATETIME,
+            executing_at DATETIME,
+            done_at DATETIME,
+            disabled_at DATETIME,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            thresholds_set_at DATETIME
+        )
+    ''')
+    _ensure_column(cursor, 'switch_state', 'due_at', 'DATETIME')
+    _ensure_column(cursor, 'switch_state', 'inactivity_days', 'REAL NOT NULL DEFAULT 10')
+    _ensure_column(cursor, 'switch_state', 'verification_hours', 'REAL NOT NULL DEFAULT 48')
+    # NULL until the switch's periods are stored (it runs on the defaults until then)
+    _ensure_column(cursor, 'switch_state', 'thresholds_set_at', 'DATETIME')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_switch_state_state_due_at
+        ON switch_state (state, due_at)
+    ''')
+
+    # Cross-process activity notifications: one row per user per activity
+    # commit, read by every process's event listener and pruned after minutes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            activity_type TEXT,
+            device_id TEXT,
+            timestamp DATETIME NOT NULL,
+            cancelled_verification INTEGER NOT NULL DEFAULT 0,
+            origin TEXT NOT NULL
+        )
+    ''')
+
+    # Leader leases: which process currently runs a singleton job (the
+    # monitor), until when (Unix time), and a fencing token that grows with
+    # every change of holder
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leader_leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            fencing_token INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            acquired_at REAL NOT NULL
+        )
+    ''')
+
+    # System settings table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # OTP expiries used to be stored as local ISO strings ("...T...") and never
+    # compared correctly with datetime('now'); convert them to UTC once
+    if cursor.execute(
+        "SELECT 1 FROM settings WHERE key = 'otp_expiry_format'"
+    ).fetchone() is None:
+        cursor.execute('''
+            UPDATE otp_log
+            SET expires_at = datetime(replace(expires_at, 'T', ' '), 'utc')
+            WHERE expires_at LIKE '____-__-__T%'
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('otp_expiry_format', 'utc')")
+
+    # Give every switch with recorded activity a state row and an inactivity
+    # due_at once, so the sweep also covers switches that predate it
+    if cursor.execute(
+        "SELECT 1 FROM settings WHERE key = 'switch_due_at'"
+    ).fetchone() is None:
+        cursor.execute('''
+            INSERT OR IGNORE INTO switch_state (user_id, state, armed_at)
+            SELECT user_id, 'armed', CURRENT_TIMESTAMP FROM last_seen WHERE device_id = ''
+        ''')
+        cursor.execute('''
+            UPDATE switch_state SET due_at = (
+                SELECT datetime(last_seen.last_activity,
+                                '+' || CAST(ROUND(switch_state.inactivity_days * 86400) AS INTEGER) || ' seconds')
+                FROM last_seen
+                WHERE last_seen.user_id = switch_state.user_id AND last_seen.device_id = ''
+            )
+            WHERE state = 'armed' AND due_at IS NULL
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('switch_due_at', '1')")
+
+
+def init_users_schema(conn: sqlite3.Connection):
+    """Create the users table used by the auth blueprint"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT
+        )
+    ''')
+    # Where the account's life verifications are sent
+    _ensure_column(conn.cursor(), 'users', 'email', 'TEXT')
+
+
+class _Lease:
+    """Ties a pooled connection to the thread-local slot of its owning thread.
+
+    When the thread exits, its thread-local storage is dropped and the
+    connection goes back to the pool instead of being closed.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', conn: sqlite3.Connection):
+        self.pool = pool
+        self.conn = conn
+
+    def __del__(self):
+        self.pool._release(self.conn)
+
+
+class ConnectionPool:
+    """Per-thread pool of tuned SQLite connections for one database file"""
+
+    def __init__(self, db_path: str, schema: Optional[Callable] = None,
+                 row_factory=None, pragmas: Optional[Dict] = None):
+        self.db_path = db_path
+        self.schema = schema
+        self.row_factory = row_factory
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open and tune a new connection"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas['busy_timeout'] / 1000,
+            isolation_level=None,  # Explicit transactions via transaction()
+            check_same_thread=False,  # Ownership is enforced by the pool
+            cached_statements=CACHED_STATEMENTS
+        )
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        if self.row_factory is not None:
+            conn.row_factory = self.row_factory
+        return conn
+
+    def _check_fork(self):
+        """Drop inherited connections after a fork (e.g. gunicorn workers)"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._local = threading.local()
+            self._lock = threading.Lock()
+            self._idle = []
+
+    def _release(self, conn: sqlite3.Connection):
+        """Return a connection from a finished thread to the idle list"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if len(self._idle) < MAX_IDLE_CONNECTIONS:
+                    self._idle.append(conn)
+                    return
+            conn.close()
+        except Exception:
+            pass
+
+    def connection(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, creating it on first use"""
+        self._check_fork()
+        lease = getattr(self._local, 'lease', None)
+        if lease is not None:
+            return lease.conn
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+
+        if not self._schema_ready and self.schema is not None:
+            with self._lock:
+                if not self._schema_ready:
+                    self.schema(conn)
+                    self._schema_ready = True
+
+        self._local.lease = _Lease(self, conn)
+        return conn
+
+    def close_all(self):
+        """Close idle connections and the calling thread's connection"""
+        lease = getattr(self._local, 'lease', None)
+        if lease is not None:
+            self._local.lease = None
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+# Schema initializers for the well-known database files
+_SCHEMAS = {
+    DEFAULT_DB_PATH: init_schema,
+    USERS_DB_PATH: init_users_schema,
+}
+
+# Row factories for the well-known database files
+_ROW_FACTORIES = {
+    USERS_DB_PATH: sqlite3.Row,
+}
+
+
+def get_pool(db_path: str = DEFAULT_DB_PATH) -> ConnectionPool:
+    """Get (or create) the process-wide pool for a database file"""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                name = os.path.basename(db_path)
+                pool = ConnectionPool(
+                    key,
+                    schema=_SCHEMAS.get(name, init_schema),
+                    row_factory=_ROW_FACTORIES.get(name)
+                )
+                _pools[key] = pool
+    return pool
+
+
+def get_connection(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """Get the calling thread's pooled connection for a database file"""
+    return get_pool(db_path).connection()
+
+
+@contextmanager
+def transaction(db_path: str = DEFAULT_DB_PATH, immediate: bool = True):
+    """Run a block inside a single transaction on the pooled connection.
+
+    Nested calls join the outer transaction instead of opening a new one.
+    """
+    conn = get_connection(db_path)
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def close_all():
+    """Close every pooled connection in this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
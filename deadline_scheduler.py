@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Deadline scheduler for Digital Death Switch AI
+Keeps keyed deadlines (inactivity expiry, verification deadline, periodic
+maintenance) in a min-heap and sleeps until the earliest one is due.
+Re-arming a key replaces its deadline and wakes the loop, so new activity
+takes effect immediately instead of at the next polling tick
+"""
+
+import time
+import heapq
+import logging
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Longest single sleep; deadlines are wall-clock times, so the loop wakes
+# periodically to notice clock changes and suspend/resume
+MAX_SLEEP = 600
+
+
+class DeadlineScheduler:
+    """Min-heap of keyed deadlines served by one thread.
+
+    Each key holds at most one pending deadline. The heap may contain stale
+    entries for keys that were re-armed or cancelled; they are skipped when
+    popped (each job remembers the sequence number of its live entry).
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time, max_sleep: float = MAX_SLEEP):
+        self.clock = clock
+        self.max_sleep = max_sleep
+        self.runs = 0
+        self._heap = []                   # (due, seq, key)
+        self._jobs = {}                   # key -> (due, seq, callback)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    def schedule(self, key: str, due: float, callback: Callable[[], None]):
+        """Set (or move) key's deadline to the epoch time due"""
+        with self._cond:
+            seq = next(self._seq)
+            self._jobs[key] = (due, seq, callback)
+            heapq.heappush(self._heap, (due, seq, key))
+            # Only a new earliest deadline changes how long the loop should sleep
+            if self._heap[0][1] == seq:
+                self._cond.notify()
+
+    def schedule_in(self, key: str, delay: float, callback: Callable[[], None]):
+        self.schedule(key, self.clock() + delay, callback)
+
+    def every(self, key: str, interval: float, callback: Callable[[], None],
+              first: Optional[float] = None):
+        """Run callback every interval seconds, starting at first (default: one interval from now)"""
+        def run_and_rearm():
+            try:
+                callback()
+            finally:
+                self.schedule_in(key, interval, run_and_rearm)
+        self.schedule(key, self.clock() + interval if first is None else first, run_and_rearm)
+
+    def cancel(self, key: str) -> bool:
+        """Drop key's pending deadline; its heap entry goes stale"""
+        with self._cond:
+            return self._jobs.pop(key, None) is not None
+
+    def next_due(self, key: str = None) -> Optional[float]:
+        """Epoch time of key's deadline, or of the earliest deadline overall"""
+        with self._cond:
+            if key is not None:
+                job = self._jobs.get(key)
+                return job[0] if job else None
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def pending(self) -> Dict[str, float]:
+        with self._cond:
+            return {key: job[0] for key, job in self._jobs.items()}
+
+    def _discard_stale(self):
+        while self._heap:
+            due, seq, key = self._heap[0]
+            job = self._jobs.get(key)
+            if job is not None and job[1] == seq:
+                return
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now: float) -> list:
+        due_jobs = []
+        self._discard_stale()
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            due_jobs.append((key, self._jobs.pop(key)[2]))
+            self._discard_stale()
+        return due_jobs
+
+    def run_pending(self) -> int:
+        """Run every job whose deadline has passed; returns how many ran"""
+        with self._cond:
+            due_jobs = self._pop_due(self.clock())
+        # Callbacks run without the lock so they can re-arm themselves or other keys
+        for key, callback in due_jobs:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Scheduled job {key} failed: {str(e)}")
+            self.runs += 1
+        return len(due_jobs)
+
+    def run(self):
+        """Serve deadlines until stop() is called (returns at once if it already was)"""
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    self._discard_stale()
+                    if self._heap and self._heap[0][0] <= self.clock():
+                        break
+                    timeout = self.max_sleep
+                    if self._heap:
+                        timeout = min(timeout, self._heap[0][0] - self.clock())
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+            self.run_pending()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+def next_time_of_day(hour: int, minute: int = 0, now: datetime = None) -> float:
+    """Epoch time of the next local hour:minute (for daily jobs)"""
+    now = now or datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return target.timestamp()
@@ -9,19 +9,38 @@ import os
 import time
 import hashlib
 import secrets
-import smtplib
 import requests
-from datetime import datetime, timedelta
-from email.mime.text import MimeText
-from email.mime.multipart import MimeMultipart
-from email.mime.base import MimeBase
-from email import encoders
-import sqlite3
+from datetime import datetime, timedelta, timezone
 import logging
 from typing import List, Dict, Optional
 from dataclasses import dataclass
-import schedule
 import threading
+from database import DEFAULT_DB_PATH, get_connection, transaction
+from deadline_scheduler import DeadlineScheduler, next_time_of_day
+from leader_lease import LeaderLease, check_fencing, monitor_lease_name, DEFAULT_LEASE_TTL
+from activity_store import OWNER_USER_ID, get_last_seen
+from activity_writer import get_activity_writer
+from activity_events import ActivityEvent, get_event_bus, get_event_listener, prune_events
+from activity_retention import compact_activity_log, DEFAULT_RETENTION_DAYS
+from otp_store import store_otp, consume_otp, purge_expired_otps
+from switch_state import (SwitchState, get_switch_state, transition, start_verification,
+                          claim_execution, postpone_execution, set_thresholds, thresholds_stored,
+                          ARMED, VERIFYING, EXECUTING, DONE, DISABLED,
+                          DEFAULT_INACTIVITY_DAYS, DEFAULT_VERIFICATION_HOURS)
+from smtp_pool import get_smtp_pool, DEFAULT_MAX_SESSIONS
+from rate_limiter import get_rate_limiter
+from mime_stream import StreamingMessage, link_attachments, DEFAULT_LINK_THRESHOLD, UPLOAD_DIR
+from sms_transport import SMSResult, get_sms_transport, TWILIO_API_BASE, DEFAULT_MAX_CONNECTIONS
+from delivery_store import record_delivery
+from delivery_executor import DeliveryExecutor, DeliveryReport
+from async_delivery import AsyncDeliveryExecutor, AsyncNotifier, DEFAULT_MAX_IN_FLIGHT
+from delivery_outbox import (OutboxDispatcher, OutboxJob, PermanentDeliveryError, enqueue_jobs,
+                             unfinished_run, latest_run, next_attempt_at, new_run_id,
+                             outbox_counts, message_id_for, DEFAULT_MAX_ATTEMPTS)
+from delivery_bundle import BundleItem, split_bundles, DEFAULT_MAX_MESSAGE_BYTES
+from config_store import (import_config, upsert_recipient, list_recipients, list_documents,
+                          count_recipients, count_documents, get_account_email,
+                          RECIPIENT_FIELDS, DOCUMENT_FIELDS)
 
 # Configure logging
 logging.basicConfig(
@@ -34,6 +53,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MONITOR_JOB = "monitor"        # Scheduler key of the switch's next inactivity/verification deadline
+MONITOR_RETRY_SECONDS = 300    # Re-check this soon when a monitoring cycle fails
+
 @dataclass
 class Recipient:
     """Data class for document recipients"""
@@ -77,163 +99,144 @@ class SecurityManager:
 class DatabaseManager:
     """Manages SQLite database operations"""
     
-    def __init__(self, db_path: str = "death_switch.db"):
+    def __init__(self, db_path: str = "death_switch.db", otp_hash_key: str = None,
+                 user_id: int = OWNER_USER_ID):
         self.db_path = db_path
+        # Every row this manager reads or writes belongs to this switch owner
+        self.user_id = user_id
+        # When set, OTPs are stored as HMAC digests instead of plaintext
+        self.otp_hash_key = otp_hash_key or os.getenv('OTP_HASH_KEY')
+        # (lease name, fencing token) once this process has been elected monitor
+        # leader; the monitor's state transitions are rejected if it goes stale
+        self.fence = None
         self.init_database()
     
     def init_database(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Activity tracking table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS activity_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                activity_type TEXT NOT NULL,
-                device_id TEXT,
-                notes TEXT
-            )
-        ''')
-        
-        # OTP tracking table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS otp_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                otp_code TEXT NOT NULL,
-                generated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                expires_at DATETIME NOT NULL,
-                used BOOLEAN DEFAULT FALSE,
-                purpose TEXT
-            )
-        ''')
-        
-        # Delivery log table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS delivery_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                recipient_name TEXT NOT NULL,
-                delivery_method TEXT NOT NULL,
-                status TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                message_id TEXT,
-                error_details TEXT
-            )
-        ''')
-        
-        # System settings table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        # Schema is created once per process when the pool opens its first connection
+        get_connection(self.db_path)
     
     def log_activity(self, activity_type: str, device_id: str = None, notes: str = None):
         """Log user activity"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO activity_log (activity_type, device_id, notes) VALUES (?, ?, ?)",
-            (activity_type, device_id, notes)
-        )
-        conn.commit()
-        conn.close()
+        # Group-committed with concurrent writers; returns once durable
+        get_activity_writer(self.db_path).log(activity_type, device_id, notes, user_id=self.user_id)
         logger.info(f"Activity logged: {activity_type}")
     
     def get_last_activity(self) -> Optional[datetime]:
         """Get the timestamp of the last recorded activity"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT MAX(timestamp) FROM activity_log")
-        result = cursor.fetchone()[0]
-        conn.close()
-        
-        if result:
-            return datetime.fromisoformat(result)
-        return None
+        return get_last_seen(get_connection(self.db_path), user_id=self.user_id)
     
     def store_otp(self, otp: str, purpose: str, expiry_minutes: int = 30):
         """Store OTP with expiration"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        expires_at = datetime.now() + timedelta(minutes=expiry_minutes)
-        cursor.execute(
-            "INSERT INTO otp_log (otp_code, expires_at, purpose) VALUES (?, ?, ?)",
-            (otp, expires_at.isoformat(), purpose)
-        )
-        conn.commit()
-        conn.close()
+        with transaction(self.db_path) as conn:
+            store_otp(conn, otp, purpose, expiry_minutes, self.otp_hash_key, self.user_id)
     
     def verify_otp(self, otp: str, purpose: str) -> bool:
-        """Verify OTP and mark as used"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id FROM otp_log 
-            WHERE otp_code = ? AND purpose = ? AND used = FALSE 
-            AND expires_at > datetime('now')
-        ''', (otp, purpose))
-        
-        result = cursor.fetchone()
-        if result:
-            cursor.execute("UPDATE otp_log SET used = TRUE WHERE id = ?", (result[0],))
-            conn.commit()
-            conn.close()
-            return True
-        
-        conn.close()
-        return False
+        """Verify OTP and mark as used (single atomic statement)"""
+        with transaction(self.db_path) as conn:
+            return consume_otp(conn, otp, purpose, self.otp_hash_key, self.user_id)
+    
+    def purge_expired_otps(self) -> int:
+        """Delete expired and already-used OTPs"""
+        return purge_expired_otps(get_connection(self.db_path))
+    
+    def get_switch_state(self) -> SwitchState:
+        """Persisted lifecycle state of this switch"""
+        return get_switch_state(get_connection(self.db_path), self.user_id)
+    
+    def _check_fence(self, conn):
+        if self.fence is not None:
+            check_fencing(conn, *self.fence)
+    
+    def transition(self, to_state: str, from_states: tuple = None) -> bool:
+        """Compare-and-set the switch state; False if it was not in from_states"""
+        with transaction(self.db_path) as conn:
+            if to_state in (EXECUTING, DONE):
+                self._check_fence(conn)
+            return transition(conn, to_state, self.user_id, from_states=from_states)
+    
+    def claim_execution(self) -> bool:
+        """Take over an executing switch whose previous run stopped (lease expired)"""
+        with transaction(self.db_path) as conn:
+            self._check_fence(conn)
+            return claim_execution(conn, self.user_id)
+    
+    def postpone_execution(self, due_at: datetime) -> bool:
+        """Keep the switch executing until due_at, when its next delivery retry is due"""
+        with transaction(self.db_path) as conn:
+            self._check_fence(conn)
+            return postpone_execution(conn, due_at, self.user_id)
+    
+    def set_thresholds(self, inactivity_days: float, verification_hours: float):
+        """Store the switch's inactivity and verification periods (used by the sweep)"""
+        with transaction(self.db_path) as conn:
+            set_thresholds(conn, inactivity_days, verification_hours, self.user_id)
+    
+    def thresholds_stored(self) -> bool:
+        """False until the switch's periods have been stored (it runs on the defaults)"""
+        return thresholds_stored(get_connection(self.db_path), self.user_id)
+    
+    def start_verification(self, verification_hours: float) -> Optional[datetime]:
+        """armed -> verifying; the stored deadline, or None if another worker got there first"""
+        with transaction(self.db_path) as conn:
+            self._check_fence(conn)
+            return start_verification(conn, verification_hours, self.user_id)
+    
+    def log_delivery(self, recipient_name: str, delivery_method: str, status: str,
+                     message_id: str = None, error_details: str = None):
+        """Record a delivery attempt"""
+        with transaction(self.db_path) as conn:
+            record_delivery(conn, recipient_name, delivery_method, status,
+                            message_id, error_details, self.user_id)
 
 class NotificationManager:
     """Handles email and SMS notifications"""
     
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, db_path: str = DEFAULT_DB_PATH):
         self.smtp_server = config.get('smtp_server', 'smtp.gmail.com')
         self.smtp_port = config.get('smtp_port', 587)
         self.email = config['email']
         self.email_password = config['email_password']
+        self.smtp_use_tls = config.get('smtp_use_tls', True)
+        self.smtp_max_sessions = config.get('smtp_max_sessions', DEFAULT_MAX_SESSIONS)
+        # Authenticated sessions are kept open and shared by every send
+        self.smtp_pool = get_smtp_pool(
+            self.smtp_server, self.smtp_port, self.email, self.email_password,
+            use_tls=self.smtp_use_tls, max_sessions=self.smtp_max_sessions
+        )
+        # Send-rate budgets are shared (through db_path) by every worker sending
+        # from the same account
+        self.email_limiter = get_rate_limiter('smtp', f"{self.smtp_server}:{self.email}",
+                                              config.get('rate_limits'), db_path)
+        # Attachments larger than this are sent as download links when one exists
+        self.link_threshold = config.get('email_link_threshold_bytes', DEFAULT_LINK_THRESHOLD)
+        self.public_base_url = (config.get('public_base_url') or '').rstrip('/')
         self.twilio_sid = config.get('twilio_sid')
         self.twilio_token = config.get('twilio_token')
         self.twilio_phone = config.get('twilio_phone')
+        # One long-lived client per account with a keep-alive connection pool
+        self.sms_transport = None
+        if all([self.twilio_sid, self.twilio_token, self.twilio_phone]):
+            self.sms_transport = get_sms_transport(
+                self.twilio_sid, self.twilio_token, self.twilio_phone,
+                config.get('twilio_api_base', TWILIO_API_BASE),
+                max_connections=config.get('sms_max_connections', DEFAULT_MAX_CONNECTIONS)
+            )
+            self.sms_transport.limiter = get_rate_limiter(
+                'twilio', f"{self.twilio_sid}:{self.twilio_phone}", config.get('rate_limits'), db_path
+            )
     
-    def send_email(self, to_email: str, subject: str, body: str, attachments: List[str] = None) -> bool:
-        """Send email with optional attachments"""
+    def send_email(self, to_email: str, subject: str, body: str, attachments: List[str] = None,
+                   message_id: str = None) -> bool:
+        """Send email with optional attachments (streamed from disk, large ones as links)"""
         try:
-            msg = MimeMultipart()
-            msg['From'] = self.email
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            
-            msg.attach(MimeText(body, 'plain'))
+            attachments = attachments or []
+            links = link_attachments(attachments, self.link_threshold, self.download_url)
+            msg = StreamingMessage(self.email, [to_email], subject, body, attachments,
+                                   message_id=message_id, links=links)
             
-            # Add attachments if provided
-            if attachments:
-                for file_path in attachments:
-                    if os.path.exists(file_path):
-                        with open(file_path, "rb") as attachment:
-                            part = MimeBase('application', 'octet-stream')
-                            part.set_payload(attachment.read())
-                        
-                        encoders.encode_base64(part)
-                        part.add_header(
-                            'Content-Disposition',
-                            f'attachment; filename= {os.path.basename(file_path)}'
-                        )
-                        msg.attach(part)
-            
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.email, self.email_password)
-            text = msg.as_string()
-            server.sendmail(self.email, to_email, text)
-            server.quit()
+            self.email_limiter.acquire()
+            self.smtp_pool.send_streaming(msg)
             
             logger.info(f"Email sent successfully to {to_email}")
             return True
@@ -242,43 +245,84 @@ class NotificationManager:
             logger.error(f"Failed to send email to {to_email}: {str(e)}")
             return False
     
+    def download_url(self, file_path: str) -> Optional[str]:
+        """Public URL of an uploaded document (served by /documents/<filename>)"""
+        if not self.public_base_url:
+            return None
+        if os.path.dirname(os.path.abspath(file_path)) != os.path.abspath(UPLOAD_DIR):
+            return None
+        return f"{self.public_base_url}/documents/{os.path.basename(file_path)}"
+    
     def send_sms(self, phone_number: str, message: str) -> bool:
         """Send SMS using Twilio"""
-        if not all([self.twilio_sid, self.twilio_token, self.twilio_phone]):
+        return self.send_sms_result(phone_number, message).success
+    
+    def send_sms_result(self, phone_number: str, message: str) -> SMSResult:
+        """Send SMS using Twilio and return its SID / error code"""
+        if self.sms_transport is None:
             logger.warning("Twilio credentials not configured, skipping SMS")
-            return False
-        
-        try:
-            from twilio.rest import Client
-            client = Client(self.twilio_sid, self.twilio_token)
-            
-            message = client.messages.create(
-                body=message,
-                from_=self.twilio_phone,
-                to=phone_number
-            )
-            
-            logger.info(f"SMS sent successfully to {phone_number}, SID: {message.sid}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send SMS to {phone_number}: {str(e)}")
-            return False
+            return SMSResult(phone_number, False, error_message="Twilio credentials not configured",
+                             permanent=True)
+        return self.sms_transport.send(phone_number, message)
+    
+    def send_sms_batch(self, messages: List[tuple]) -> List[SMSResult]:
+        """Send many (phone_number, message) SMS concurrently over the pooled session"""
+        if self.sms_transport is None:
+            logger.warning("Twilio credentials not configured, skipping SMS")
+            return [SMSResult(phone, False, error_message="Twilio credentials not configured",
+                              permanent=True)
+                    for phone, _ in messages]
+        return self.sms_transport.send_batch(messages)
 
 class DeathSwitchAI:
     """Main Death Switch AI system"""
     
-    def __init__(self, config_file: str = "config.json"):
+    def __init__(self, config_file: str = "config.json", user_id: int = None,
+                 db_path: str = DEFAULT_DB_PATH):
+        self.user_id = user_id
+        self.db_path = db_path
         self.load_config(config_file)
-        self.db = DatabaseManager()
+        self.db = DatabaseManager(db_path, otp_hash_key=self.config.get('otp_hash_key'),
+                                  user_id=self.user_id)
         self.security = SecurityManager()
-        self.notifications = NotificationManager(self.config)
-        self.is_running = True
-        self.trigger_activated = False
+        self.notifications = NotificationManager(self.config, db_path)
+        self.delivery_max_attempts = self.config.get('delivery_max_attempts', DEFAULT_MAX_ATTEMPTS)
+        # With delivery_async, protocol sends are coroutines on one shared event
+        # loop; execute_death_protocol and other callers stay synchronous
+        self.async_notifier = None
+        async_senders = None
+        if self.config.get('delivery_async'):
+            max_in_flight = self.config.get('delivery_max_in_flight', DEFAULT_MAX_IN_FLIGHT)
+            self.async_notifier = AsyncNotifier(self.notifications, max_in_flight=max_in_flight)
+            self.delivery_executor = AsyncDeliveryExecutor(
+                self.config.get('delivery_async_concurrency'), max_in_flight=max_in_flight
+            )
+            async_senders = {'email': self.send_outbox_email_async, 'sms': self.send_outbox_sms_async}
+        else:
+            self.delivery_executor = DeliveryExecutor(self.config.get('delivery_concurrency'))
+        # Documents for one recipient share an email until their attachments exceed this
+        self.max_message_bytes = self.config.get('email_max_attachment_bytes', DEFAULT_MAX_MESSAGE_BYTES)
+        # Also attach the stored document files next to their viewers (they are
+        # then readable without the access code)
+        self.attach_documents = self.config.get('email_attach_documents', False)
+        self.outbox = OutboxDispatcher(
+            {'email': self.send_outbox_email, 'sms': self.send_outbox_sms},
+            db_path=self.db.db_path,
+            executor=self.delivery_executor,
+            user_id=self.user_id,
+            async_senders=async_senders
+        )
+        self.scheduler = None               # DeadlineScheduler while start_monitoring runs
         
-        # Default settings
-        self.inactivity_days = self.config.get('inactivity_days', 10)
-        self.verification_hours = self.config.get('verification_hours', 48)
+        self.activity_retention_days = self.config.get('activity_retention_days', DEFAULT_RETENTION_DAYS)
+        
+        # config.json only seeds a switch on its first run; afterwards the stored
+        # recipients, documents and thresholds are authoritative
+        self.seed_from_config()
+        self.load_recipients_and_documents()
+        switch = self.db.get_switch_state()
+        self.inactivity_days = switch.inactivity_days
+        self.verification_hours = switch.verification_hours
     
     def load_config(self, config_file: str):
         """Load configuration from JSON file"""
@@ -292,9 +336,19 @@ class DeathSwitchAI:
                 if key not in self.config:
                     raise ValueError(f"Missing required config key: {key}")
             
-            # Load recipients
-            self.recipients = [Recipient(**r) for r in self.config['recipients']]
-            self.documents = [Document(**d) for d in self.config['documents']]
+            # users.db id of the switch owner when hosting several users. The
+            # file's recipients, documents, thresholds, email and kill switch
+            # belong to that switch only; other tenants (the sweep) use the
+            # file for the deployment's SMTP/Twilio accounts and delivery
+            # settings, and everything else from the database
+            config_owner = self.config.get('user_id', OWNER_USER_ID)
+            if self.user_id is None:
+                self.user_id = config_owner
+            self.owns_config = self.user_id == config_owner
+            if self.owns_config:
+                self.notify_email = self.config['email']
+            else:
+                self.notify_email = get_account_email(self.user_id)
             
         except FileNotFoundError:
             logger.error(f"Config file {config_file} not found")
@@ -305,6 +359,39 @@ class DeathSwitchAI:
             logger.error(f"Failed to load config: {str(e)}")
             raise
     
+    def seed_from_config(self, force: bool = False) -> bool:
+        """Import config.json's recipients, documents and thresholds into this switch.
+        
+        Without force only what the switch has nothing stored for yet is
+        imported (first run), so entries and thresholds stored since are never
+        overwritten. Only the switch the file belongs to is ever seeded.
+        Returns whether anything was written.
+        """
+        if not self.owns_config:
+            return False
+        seeded = False
+        conn = get_connection(self.db_path)
+        if force or not (count_recipients(conn, self.user_id) or count_documents(conn, self.user_id)):
+            imported = import_config(self.config, self.db_path, user_id=self.user_id)
+            seeded = bool(imported['recipients'] or imported['documents'])
+        if force or not self.db.thresholds_stored():
+            self.db.set_thresholds(self.config.get('inactivity_days', DEFAULT_INACTIVITY_DAYS),
+                                   self.config.get('verification_hours', DEFAULT_VERIFICATION_HOURS))
+            seeded = True
+        return seeded
+    
+    def load_recipients_and_documents(self):
+        """Load recipients and documents from the database"""
+        conn = get_connection(self.db_path)
+        self.recipients = [
+            Recipient(**{k: r[k] for k in RECIPIENT_FIELDS})
+            for r in list_recipients(conn, self.user_id)
+        ]
+        self.documents = [
+            Document(**{k: d[k] or '' for k in DOCUMENT_FIELDS})
+            for d in list_documents(conn, self.user_id)
+        ]
+    
     def create_sample_config(self, config_file: str):
         """Create a sample configuration file"""
         sample_config = {
@@ -349,11 +436,66 @@ class DeathSwitchAI:
         
         logger.info(f"Sample config created at {config_file}")
     
+    @property
+    def is_running(self) -> bool:
+        """False once the switch is disabled or its protocol has run"""
+        return self.db.get_switch_state().is_running
+    
     def record_activity(self, activity_type: str = "app_usage", device_id: str = None):
         """Record user activity to reset the death timer"""
+        # Any activity proves life: the commit cancels a pending verification,
+        # and the activity event re-arms the deadline of every running monitor
         self.db.log_activity(activity_type, device_id)
         logger.info("User activity recorded - death timer reset")
     
+    def next_deadline(self) -> Optional[datetime]:
+        """When the switch next needs a monitoring cycle (UTC).
+
+        While a life verification is pending this is its deadline, otherwise
+        the moment the inactivity threshold is crossed.
+        """
+        switch = self.db.get_switch_state()
+        if switch.state in (DONE, DISABLED):
+            return None
+        if switch.state == EXECUTING:
+            return switch.due_at  # Lease expiry: resume the run if it has not finished by then
+        if switch.state == VERIFYING:
+            return switch.verification_deadline
+        last_activity = self.db.get_last_activity()
+        if not last_activity:
+            return datetime.utcnow()  # First run: the cycle records a baseline
+        return last_activity + timedelta(days=self.inactivity_days)
+    
+    def arm_monitor(self):
+        """(Re)schedule the monitoring cycle at the switch's next deadline"""
+        if self.scheduler is None:
+            return
+        deadline = self.next_deadline()
+        if deadline is None:
+            self.scheduler.cancel(MONITOR_JOB)
+            return
+        due = deadline.replace(tzinfo=timezone.utc).timestamp()
+        self.scheduler.schedule(MONITOR_JOB, due, self._monitor_deadline)
+        logger.info(f"Next monitoring deadline: {deadline} UTC")
+    
+    def _on_activity(self, event: ActivityEvent):
+        """Activity from any process: move the deadline out at once"""
+        if event.cancelled_verification:
+            logger.info(f"Life verification cancelled by {event.activity_type} activity")
+        self.arm_monitor()
+    
+    def _monitor_deadline(self):
+        try:
+            self.run_monitoring_cycle()
+        except Exception as e:
+            logger.error(f"Error in monitoring cycle: {str(e)}")
+            self.scheduler.schedule_in(MONITOR_JOB, MONITOR_RETRY_SECONDS, self._monitor_deadline)
+            return
+        if self.is_running:
+            self.arm_monitor()
+        else:
+            self.scheduler.stop()
+    
     def check_inactivity(self) -> bool:
         """Check if user has been inactive for the configured period"""
         last_activity = self.db.get_last_activity()
@@ -363,10 +505,11 @@ class DeathSwitchAI:
             self.record_activity("first_run")
             return False
         
-        days_inactive = (datetime.now() - last_activity).days
-        logger.info(f"Days since last activity: {days_inactive}")
+        # last_seen timestamps are UTC; compare exactly so the cycle agrees with next_deadline()
+        inactive_for = datetime.utcnow() - last_activity
+        logger.info(f"Days since last activity: {inactive_for.days}")
         
-        return days_inactive >= self.inactivity_days
+        return inactive_for >= timedelta(days=self.inactivity_days)
     
     def send_life_verification(self) -> str:
         """Send OTP for life verification"""
@@ -388,8 +531,11 @@ If you do not respond within {self.verification_hours} hours, your emergency doc
 This is an automated message from your Digital Death Switch AI system.
         """
         
-        # Send to user's email
-        success = self.notifications.send_email(self.config['email'], subject, body)
+        # Send to the switch owner's own email (config.json, or their users.db account)
+        if not self.notify_email:
+            logger.error(f"No email address for switch {self.user_id}, life verification not sent")
+            return otp
+        success = self.notifications.send_email(self.notify_email, subject, body)
         
         if success:
             logger.info("Life verification OTP sent successfully")
@@ -406,20 +552,24 @@ This is an automated message from your Digital Death Switch AI system.
             self.record_activity("life_verified")
             return True
         
-        # Check if it's the kill switch
-        kill_switch_hash = self.config.get('kill_switch_hash', '')
+        # Check if it's the kill switch (config.json's only covers its own switch)
+        kill_switch_hash = self.config.get('kill_switch_hash', '') if self.owns_config else ''
         if kill_switch_hash and self.security.verify_kill_switch(user_input, kill_switch_hash):
             logger.info("Kill switch activated - system disabled")
-            self.is_running = False
+            self.db.transition(DISABLED)
+            if self.scheduler is not None:
+                self.scheduler.stop()
             return True
         
         logger.warning("Invalid verification code or kill switch")
         return False
     
-    def create_secure_document_viewer(self, document: Document, recipient: Recipient) -> str:
-        """Create a secure HTML viewer for document access"""
-        viewer_otp = self.security.generate_otp()
-        self.db.store_otp(viewer_otp, f"document_access_{recipient.name}", expiry_minutes=1440)  # 24 hours
+    def create_secure_document_viewer(self, document: Document, recipient: Recipient,
+                                      viewer_otp: str = None) -> str:
+        """Create a secure HTML viewer for document access (a given viewer_otp is already stored)"""
+        if viewer_otp is None:
+            viewer_otp = self.security.generate_otp()
+            self.db.store_otp(viewer_otp, f"document_access_{recipient.name}", expiry_minutes=1440)  # 24 hours
         
         html_content = f"""
 <!DOCTYPE html>
@@ -477,7 +627,8 @@ This is an automated message from your Digital Death Switch AI system.
         """
         
         # Save HTML file
-        filename = f"secure_access_{recipient.name.replace(' ', '_')}_{int(time.time())}.html"
+        # Unique per document: the file is attached when the outbox job is sent, not now
+        filename = f"secure_access_{recipient.name.replace(' ', '_')}_{int(time.time())}_{secrets.token_hex(4)}.html"
         with open(filename, 'w') as f:
             f.write(html_content)
         
@@ -554,31 +705,126 @@ This is an automated message from your Digital Death Switch AI system.
         
         return messages.get(language.lower(), messages['english'])
 
-    def execute_death_protocol(self):
-        """Execute the death protocol - send documents to recipients"""
-        logger.info("Executing death protocol - sending documents to recipients")
+    def execute_death_protocol(self, resume: bool = True) -> DeliveryReport:
+        """Execute the death protocol - send documents to recipients.
+        
+        Every delivery is written to the outbox before anything is sent, then
+        sent concurrently per channel (each recipient's messages on a channel
+        stay in order). With resume, an interrupted run is picked up where it
+        stopped instead of starting a new one; failed sends are retried with
+        backoff by dispatch_outbox().
+        """
+        conn = get_connection(self.db.db_path)
+        run_id = unfinished_run(conn, self.user_id) if resume else None
+        if run_id:
+            logger.info(f"Resuming death protocol run {run_id}: {outbox_counts(conn, self.user_id, run_id)}")
+        else:
+            run_id = new_run_id()
+            logger.info(f"Executing death protocol run {run_id} - sending documents to recipients")
+            with transaction(self.db.db_path) as conn:
+                enqueue_jobs(conn, run_id, self.build_protocol_jobs(), self.user_id,
+                             self.delivery_max_attempts)
         
+        report = self.outbox.dispatch_due()
+        
+        logger.info(f"Death protocol run {run_id}: {report.succeeded}/{len(report.results)} "
+                    f"deliveries succeeded in {report.elapsed:.1f}s, "
+                    f"outbox {self.outbox.counts(run_id)}")
+        return report
+    
+    def build_protocol_jobs(self) -> List[Dict]:
+        """Prepare one email (split only if attachments exceed the size limit) and
+        one SMS access code per recipient, covering all of their documents.
+
+        Each document contributes its secure viewer and, with
+        email_attach_documents, the stored file itself; large files go out as
+        download links when public_base_url is set.
+        """
+        jobs = []
         for recipient in self.recipients:
             logger.info(f"Processing recipient: {recipient.name} (Language: {recipient.preferred_language})")
             
             # Get personalized message in recipient's preferred language
             message_content = self.get_message_in_language(recipient.preferred_language, recipient.name)
             
-            # Create secure document package
+            # One access code unlocks every document viewer of this recipient
+            viewer_otp = self.security.generate_otp()
+            self.db.store_otp(viewer_otp, f"document_access_{recipient.name}", expiry_minutes=1440)  # 24 hours
+            
+            # Create secure document packages
+            items = []
             for document in self.documents:
                 try:
-                    # Create secure viewer
-                    secure_file = self.create_secure_document_viewer(document, recipient)
-                    
-                    # Send via email with personalized message
-                    subject = message_content['subject']
-                    body = f"""
+                    secure_file = self.create_secure_document_viewer(document, recipient, viewer_otp)
+                except Exception as e:
+                    logger.error(f"Failed to prepare document {document.name} for {recipient.name}: {str(e)}")
+                    continue
+                attachments = [secure_file]
+                if self.attach_documents:
+                    if document.file_path and os.path.isfile(document.file_path):
+                        attachments.append(document.file_path)
+                    else:
+                        logger.warning(f"Document file {document.file_path} for {document.name} not found, "
+                                       f"sending its viewer only")
+                items.append(BundleItem(document.name, document.description, attachments))
+            
+            if not items:
+                continue
+            
+            link_threshold = self.notifications.link_threshold if self.notifications.public_base_url else None
+            bundles = split_bundles(items, self.max_message_bytes, link_threshold)
+            if len(bundles) > 1:
+                logger.info(f"Attachments for {recipient.name} exceed {self.max_message_bytes} bytes, "
+                            f"splitting into {len(bundles)} emails")
+            
+            for part, bundle in enumerate(bundles, 1):
+                subject = message_content['subject']
+                if len(bundles) > 1:
+                    subject = f"{subject} ({part}/{len(bundles)})"
+                jobs.append({
+                    "recipient_name": recipient.name,
+                    "document_name": f"part {part}/{len(bundles)}" if len(bundles) > 1 else None,
+                    "channel": "email",
+                    "destination": recipient.email,
+                    "payload": {
+                        "subject": subject,
+                        "body": self.render_bundle_email(message_content, bundle),
+                        "attachments": [path for item in bundle for path in item.attachments]
+                    }
+                })
+            
+            # SMS messages in different languages
+            document_names = ", ".join(item.name for item in items)
+            sms_messages = {
+                'english': f"💙 Access code for {document_names}: {viewer_otp}. Check your email for the secure document. Thanks for your love.",
+                'hindi': f"💙 {document_names} के लिए एक्सेस कोड: {viewer_otp}. सुरक्षित दस्तावेज़ के लिए अपना ईमेल देखें। आपके प्रेम के लिए धन्यवाद।",
+                'telugu': f"💙 {document_names} కోసం యాక్సెస్ కోడ్: {viewer_otp}. భద్రమైన పత్రం కోసం మీ ఇమెయిల్ చూడండి. మీ ప్రేమకు ధన్యవాదాలు।",
+                'tamil': f"💙 {document_names} க்கான அணுகல் குறியீடு: {viewer_otp}. பாதுகாப்பான ஆவணத்திற்கு உங்கள் மின்னஞ்சலைப் பார்க்கவும். உங்கள் அன்பிற்கு நன்றி।",
+                'kannada': f"💙 {document_names} ಗಾಗಿ ಪ್ರವೇಶ ಕೋಡ್: {viewer_otp}. ಭದ್ರ ದಾಖಲೆಗಾಗಿ ನಿಮ್ಮ ಇಮೇಲ್ ಅನ್ನು ಪರಿಶೀಲಿಸಿ। ನಿಮ್ಮ ಪ್ರೀತಿಗೆ ಧನ್ಯವಾದಗಳು।",
+                'malayalam': f"💙 {document_names} നുള്ള ആക്സസ് കോഡ്: {viewer_otp}. സുരക്ഷിത രേഖയ്ക്കായി നിങ്ങളുടെ ഇമെയിൽ പരിശോധിക്കുക. നിങ്ങളുടെ സ്നേഹത്തിനു നന്ദി।",
+                'spanish': f"💙 Código de acceso para {document_names}: {viewer_otp}. Revisa tu email para el documento seguro. Gracias por tu amor.",
+                'french': f"💙 Code d'accès pour {document_names}: {viewer_otp}. Vérifiez votre email pour le document sécurisé. Merci pour votre amour."
+            }
+            jobs.append({
+                "recipient_name": recipient.name,
+                "document_name": None,
+                "channel": "sms",
+                "destination": recipient.phone,
+                "payload": {"message": sms_messages.get(recipient.preferred_language, sms_messages['english'])}
+            })
+        return jobs
+    
+    def render_bundle_email(self, message_content: dict, items: List[BundleItem]) -> str:
+        """Email body listing every document in one bundle"""
+        document_list = "\n\n".join(
+            f"📄 Document: {item.name}\n📝 Description: {item.description}" for item in items
+        )
+        return f"""
 {message_content['greeting']}
 
 {message_content['main_message']}
 
-📄 Document: {document.name}
-📝 Description: {document.description}
+{document_list}
 
 {message_content['technical_info']}
 
@@ -586,41 +832,52 @@ This is an automated message from your Digital Death Switch AI system.
 
 ---
 {message_content['generated']}
-                    """
-                    
-                    email_success = self.notifications.send_email(
-                        recipient.email, 
-                        subject, 
-                        body, 
-                        [secure_file]
-                    )
-                    
-                    # Send access code via SMS in recipient's preferred language
-                    viewer_otp = self.security.generate_otp()  # This should match the one in HTML
-                    
-                    # SMS messages in different languages
-                    sms_messages = {
-                        'english': f"💙 Access code for {document.name}: {viewer_otp}. Check your email for the secure document. Thanks for your love.",
-                        'hindi': f"💙 {document.name} के लिए एक्सेस कोड: {viewer_otp}. सुरक्षित दस्तावेज़ के लिए अपना ईमेल देखें। आपके प्रेम के लिए धन्यवाद।",
-                        'telugu': f"💙 {document.name} కోసం యాక్సెస్ కোడ్: {viewer_otp}. భద్రమైన పత్రం కోసం మీ ఇమెయిల్ చూడండి. మీ ప్రేమకు ధన్యవాదాలు।",
-                        'tamil': f"💙 {document.name} க்கான அணுகல் குறியீடு: {viewer_otp}. பாதுகாப்பான ஆவணத்திற்கு உங்கள் மின்னஞ்சலைப் பார்க்கவும். உங்கள் அன்பிற்கு நன்றி।",
-                        'kannada': f"💙 {document.name} ಗಾಗಿ ಪ್ರವೇಶ ಕೋಡ್: {viewer_otp}. ಭದ್ರ ದಾಖಲೆಗಾಗಿ ನಿಮ್ಮ ಇಮೇಲ್ ಅನ್ನು ಪರಿಶೀಲಿಸಿ। ನಿಮ್ಮ ಪ್ರೀತಿಗೆ ಧನ್ಯವಾದಗಳು।",
-                        'malayalam': f"💙 {document.name} നുള്ള ആക്സസ് കോഡ്: {viewer_otp}. സുരക്ഷിത രേഖയ്ക്കായി നിങ്ങളുടെ ഇമെയിൽ പരിശോധിക്കുക. നിങ്ങളുടെ സ്നേഹത്തിനു നന്ദി।",
-                        'spanish': f"💙 Código de acceso para {document.name}: {viewer_otp}. Revisa tu email para el documento seguro. Gracias por tu amor.",
-                        'french': f"💙 Code d'accès pour {document.name}: {viewer_otp}. Vérifiez votre email pour le document sécurisé. Merci pour votre amour."
-                    }
-                    
-                    sms_message = sms_messages.get(recipient.preferred_language, sms_messages['english'])
-                    sms_success = self.notifications.send_sms(recipient.phone, sms_message)
-                    
-                    # Log delivery attempts
-                    self.db.log_delivery(recipient.name, "email", "success" if email_success else "failed")
-                    self.db.log_delivery(recipient.name, "sms", "success" if sms_success else "failed")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process document {document.name} for {recipient.name}: {str(e)}")
-        
-        logger.info("Death protocol execution completed")
+        """
+    
+    def send_outbox_email(self, job: OutboxJob) -> Optional[str]:
+        """Send an email job; the Message-ID is derived from its idempotency key"""
+        message_id = message_id_for(job.idempotency_key)
+        if self.notifications.send_email(job.destination, job.payload['subject'], job.payload['body'],
+                                         job.payload.get('attachments'), message_id=message_id):
+            return message_id
+        return None
+    
+    def send_outbox_sms(self, job: OutboxJob):
+        """Send an SMS job; the Twilio SID (or error code) lands in the delivery records.
+
+        Errors that a retry cannot fix fail the job at once instead of using up its attempts.
+        """
+        result = self.notifications.send_sms_result(job.destination, job.payload['message'])
+        if not result.success:
+            raise (RuntimeError if result.retryable else PermanentDeliveryError)(result.error_details())
+        return result.sid or True
+    
+    async def send_outbox_email_async(self, job: OutboxJob) -> Optional[str]:
+        """send_outbox_email on the async pipeline"""
+        message_id = message_id_for(job.idempotency_key)
+        if await self.async_notifier.send_email(job.destination, job.payload['subject'],
+                                                job.payload['body'], job.payload.get('attachments'),
+                                                message_id=message_id):
+            return message_id
+        return None
+    
+    async def send_outbox_sms_async(self, job: OutboxJob):
+        """send_outbox_sms on the async pipeline"""
+        result = await self.async_notifier.send_sms_result(job.destination, job.payload['message'])
+        if not result.success:
+            raise (RuntimeError if result.retryable else PermanentDeliveryError)(result.error_details())
+        return result.sid or True
+    
+    def dispatch_outbox(self):
+        """Send outbox jobs that are due (retries and jobs of interrupted runs)"""
+        try:
+            self.outbox.dispatch_due()
+        except Exception as e:
+            logger.error(f"Outbox dispatch failed: {str(e)}")
+    
+    def unfinished_run(self) -> Optional[str]:
+        """run_id of the oldest protocol run that still has pending or leased deliveries"""
+        return unfinished_run(get_connection(self.db.db_path), self.user_id)
     
     def setup_recipients_with_languages(self):
         """Interactive setup for recipients with language preferences"""
@@ -705,8 +962,12 @@ This is an automated message from your Digital Death Switch AI system.
             with open('config.json', 'w') as f:
                 json.dump(self.config, f, indent=2)
             
+            with transaction(self.db_path) as conn:
+                for recipient_data in recipients:
+                    upsert_recipient(conn, recipient_data, self.user_id)
+            
             # Reload recipients
-            self.recipients = [Recipient(**r) for r in recipients]
+            self.load_recipients_and_documents()
             
             print(f"\n🎉 Successfully configured {len(recipients)} recipient(s)!")
             print("\n📋 SUMMARY:")
@@ -772,45 +1033,147 @@ This is an automated message from your Digital Death Switch AI system.
         print("=" * 50)
         print(sms_messages.get(language, sms_messages['english']))
         print("=" * 50)
-        """Run a single monitoring cycle"""
-        if not self.is_running:
+    
+    def run_monitoring_cycle(self):
+        """Run a single monitoring cycle.
+        
+        Advances the persisted switch state; each transition is claimed in
+        the database first, so concurrent workers never both send the
+        verification or both run the protocol.
+        """
+        switch = self.db.get_switch_state()
+        if switch.state == DISABLED:
             logger.info("System disabled by kill switch")
             return
+        if switch.state == DONE:
+            logger.info(f"Death protocol already executed at {switch.done_at} UTC")
+            return
+        if switch.state == EXECUTING:
+            # A previous run was interrupted; the outbox picks up where it stopped
+            if self.db.claim_execution():
+                logger.warning(f"Resuming death protocol started at {switch.executing_at} UTC")
+                self.run_protocol()
+            else:
+                logger.info(f"Death protocol in progress since {switch.executing_at} UTC")
+            return
         
         # Check for inactivity
-        if self.check_inactivity():
-            if not self.trigger_activated:
-                logger.warning("Inactivity threshold reached - activating trigger")
-                self.trigger_activated = True
+        if not self.check_inactivity():
+            # Activity recorded elsewhere (web backend, device monitor) since the verification went out
+            if switch.state == VERIFYING and self.db.transition(ARMED, from_states=(VERIFYING,)):
+                logger.info("Pending life verification cleared by new activity")
+            return
+        
+        if switch.state == ARMED:
+            logger.warning("Inactivity threshold reached - activating trigger")
+            deadline = self.db.start_verification(self.verification_hours)
+            if deadline:
                 self.send_life_verification()
-                
-                # Set a timer for verification period
-                verification_deadline = datetime.now() + timedelta(hours=self.verification_hours)
-                logger.info(f"Life verification deadline: {verification_deadline}")
-                
-                # This would typically be handled by a separate thread or scheduler
-                # For now, we'll check it in the next cycle
-            
-            else:
-                # Check if verification period has expired
-                # In a real implementation, this would be more sophisticated
-                logger.info("Trigger already activated - checking verification status")
-                
-                # If no verification received and deadline passed, execute death protocol
-                # This is simplified - in practice you'd track the verification deadline
-                self.execute_death_protocol()
-                self.is_running = False
+                logger.info(f"Life verification deadline: {deadline} UTC")
+        
+        elif datetime.utcnow() >= switch.verification_deadline:
+            # No verification received before the deadline
+            if self.db.transition(EXECUTING):
+                logger.warning("Life verification deadline passed - executing death protocol")
+                self.run_protocol()
+        
+        else:
+            logger.info(f"Awaiting life verification until {switch.verification_deadline} UTC")
+    
+    def run_protocol(self) -> bool:
+        """Deliver the protocol of a switch in the executing state; True once it is done.
+        
+        Starts the run, or resumes the one this execution already enqueued,
+        then hands over to finish_protocol().
+        """
+        switch = self.db.get_switch_state()
+        conn = get_connection(self.db.db_path)
+        # A run whose sends all finished before a crash is not started again
+        if (unfinished_run(conn, self.user_id) or switch.executing_at is None
+                or not latest_run(conn, self.user_id, since=switch.executing_at)):
+            self.execute_death_protocol()
+        return self.finish_protocol()
+    
+    def finish_protocol(self) -> bool:
+        """executing -> done once no delivery is pending or leased.
+        
+        Otherwise the switch stays executing with its due_at moved to the
+        next retry, when the monitor (or the sweep) resumes the run.
+        """
+        retry_at = next_attempt_at(get_connection(self.db.db_path), self.user_id)
+        if retry_at is None:
+            return self.db.transition(DONE)
+        if self.db.postpone_execution(retry_at):
+            logger.info(f"Death protocol deliveries outstanding "
+                        f"({self.outbox.counts()}), next attempt at {retry_at} UTC")
+        return False
     
     def start_monitoring(self):
-        """Start the continuous monitoring system"""
+        """Start the continuous monitoring system.
+        
+        Only the process holding this switch's monitor lease runs the
+        scheduler; any other (gunicorn worker, daemon, replica) waits as a
+        follower and takes over within seconds of the leader dying.
+        """
         logger.info("Starting Digital Death Switch AI monitoring system")
+        lease = LeaderLease(monitor_lease_name(self.user_id), self.db.db_path,
+                            ttl=self.config.get('leader_lease_ttl', DEFAULT_LEASE_TTL))
+        try:
+            while self.is_running:
+                token = lease.wait_until_leader(stop=lambda: not self.is_running)
+                if token is None:
+                    break
+                logger.info(f"Elected monitor leader {lease.holder} (fencing token {token})")
+                self.db.fence = (lease.name, token)
+                self.scheduler = DeadlineScheduler()
+                lease.keep_alive(on_lost=self.scheduler.stop)
+                self._run_scheduler()
+                if lease.is_leader:
+                    break  # Disabled by the kill switch or protocol done
+                logger.warning("Monitor leadership lost - waiting to be re-elected")
+        finally:
+            lease.release()
+    
+    def _run_scheduler(self):
+        """Serve deadlines and maintenance jobs until the scheduler is stopped"""
+        # Run the monitoring cycle exactly at the inactivity or verification
+        # deadline, re-armed as soon as activity is committed in any process
+        unsubscribe = get_event_bus().subscribe(self._on_activity, user_id=self.user_id)
+        get_event_listener(self.db.db_path).start()
+        self.arm_monitor()
         
-        # Schedule regular checks (every hour)
-        schedule.every().hour.do(self.run_monitoring_cycle)
+        # Roll up and prune old activity once a day
+        self.scheduler.every("compact_activity_log", 86400, self.compact_activity_log,
+                             first=next_time_of_day(3))
         
-        while self.is_running:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute for scheduled tasks
+        # Drop expired and used OTPs
+        self.scheduler.every("purge_expired_otps", 3600, self.purge_expired_otps)
+        
+        # Resume deliveries interrupted by a restart, then keep retrying failures
+        self.dispatch_outbox()
+        self.scheduler.every("dispatch_outbox", 60, self.dispatch_outbox)
+        
+        try:
+            if self.is_running:
+                self.scheduler.run()
+        finally:
+            unsubscribe()
+    
+    def compact_activity_log(self):
+        """Roll raw activity older than the retention window into daily summaries"""
+        try:
+            compact_activity_log(self.db.db_path, retention_days=self.activity_retention_days)
+            with transaction(self.db.db_path) as conn:
+                prune_events(conn)
+        except Exception as e:
+            logger.error(f"Activity log compaction failed: {str(e)}")
+    
+    def purge_expired_otps(self):
+        """Delete expired and already-used OTPs"""
+        try:
+            self.db.purge_expired_otps()
+        except Exception as e:
+            logger.error(f"OTP purge failed: {str(e)}")
     
     def set_kill_switch(self, kill_code: str):
         """Set or update the kill switch code"""
@@ -877,9 +1240,12 @@ def main():
                 print("✅ Activity recorded - death timer reset!")
                 
             elif choice == '4':
+                switch = death_switch.db.get_switch_state()
+                print(f"🔁 Switch state: {switch.state}"
+                      + (f" (verify by {switch.verification_deadline} UTC)" if switch.verification_deadline else ""))
                 last_activity = death_switch.db.get_last_activity()
                 if last_activity:
-                    days_since = (datetime.now() - last_activity).days
+                    days_since = (datetime.utcnow() - last_activity).days
                     print(f"📊 Last activity: {last_activity}")
                     print(f"📅 Days since last activity: {days_since}")
                     print(f"⏰ Trigger threshold: {death_switch.inactivity_days} days")
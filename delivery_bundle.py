@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Delivery bundling for Digital Death Switch AI
+Groups a recipient's documents into as few emails as possible, splitting
+only when the encoded attachments would exceed the per-message size limit
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Gmail rejects messages over 25 MB after base64 encoding (~4/3 growth);
+# this leaves room for the body and headers
+DEFAULT_MAX_MESSAGE_BYTES = 18 * 1024 * 1024
+
+
+@dataclass
+class BundleItem:
+    """One document and the files attached for it"""
+    name: str
+    description: str
+    attachments: List[str] = field(default_factory=list)
+
+    def size(self, link_threshold: Optional[int] = None) -> int:
+        """Encoded size of this item's attachments in a MIME message
+        (files over link_threshold go out as links and take no space)"""
+        sizes = [os.path.getsize(path) for path in self.attachments if os.path.exists(path)]
+        return sum(encoded_size(size) for size in sizes
+                   if not link_threshold or size <= link_threshold)
+
+
+def encoded_size(raw_bytes: int) -> int:
+    """Size after base64 encoding with 76-character lines and CRLF"""
+    encoded = 4 * ((raw_bytes + 2) // 3)
+    return encoded + 2 * ((encoded + 75) // 76)
+
+
+def split_bundles(items: List[BundleItem], max_bytes: int = DEFAULT_MAX_MESSAGE_BYTES,
+                  link_threshold: Optional[int] = None) -> List[List[BundleItem]]:
+    """Split items, in order, into messages whose attachments fit max_bytes.
+
+    Everything goes in one message when it fits. An item that is larger than
+    the limit on its own still gets a message of its own.
+    """
+    bundles, current, current_size = [], [], 0
+    for item in items:
+        size = item.size(link_threshold)
+        if current and current_size + size > max_bytes:
+            bundles.append(current)
+            current, current_size = [], 0
+        current.append(item)
+        current_size += size
+    if current:
+        bundles.append(current)
+    return bundles
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Concurrent delivery fan-out for Digital Death Switch AI
+Runs the email/SMS/WhatsApp sends of a protocol run in parallel with a
+bounded number of in-flight calls per channel, while keeping each
+recipient's messages on a channel in the order they were queued
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, asdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# In-flight calls per channel; email matches the SMTP pool's session cap
+DEFAULT_CHANNEL_LIMITS = {
+    'email': 4,
+    'sms': 4,
+    'whatsapp': 4,
+}
+DEFAULT_CHANNEL_LIMIT = 2
+
+
+@dataclass
+class DeliveryTask:
+    """One send on one channel; send() returns True on success.
+
+    send_async, when set, is the coroutine-returning equivalent used by
+    AsyncDeliveryExecutor.
+    """
+    recipient: str
+    channel: str
+    send: Callable[[], bool]
+    description: str = ""
+    send_async: Optional[Callable[[], Awaitable[bool]]] = None
+
+
+@dataclass
+class DeliveryResult:
+    recipient: str
+    channel: str
+    description: str
+    success: bool
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+
+@dataclass
+class DeliveryReport:
+    """Outcome of every task of one fan-out run"""
+    results: List[DeliveryResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for r in self.results if r.success)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.succeeded
+
+    def by_channel(self) -> Dict[str, Dict]:
+        channels: Dict[str, Dict] = {}
+        for r in self.results:
+            stats = channels.setdefault(r.channel, {"sent": 0, "failed": 0, "busy_seconds": 0.0})
+            stats["sent" if r.success else "failed"] += 1
+            stats["busy_seconds"] = round(stats["busy_seconds"] + r.elapsed, 3)
+        return channels
+
+    def by_recipient(self) -> Dict[str, Dict]:
+        recipients: Dict[str, Dict] = {}
+        for r in self.results:
+            stats = recipients.setdefault(r.recipient, {"sent": 0, "failed": 0})
+            stats["sent" if r.success else "failed"] += 1
+        return recipients
+
+    def summary(self) -> Dict:
+        return {
+            "total": len(self.results),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "channels": self.by_channel(),
+            "recipients": self.by_recipient(),
+            "failures": [asdict(r) for r in self.results if not r.success]
+        }
+
+
+class DeliveryExecutor:
+    """Fans tasks out over one bounded thread pool per channel.
+
+    Tasks for the same (recipient, channel) form a lane that runs strictly
+    in submission order on a single worker; lanes run in parallel up to
+    the channel's limit, and channels never wait on each other.
+    """
+
+    def __init__(self, channel_limits: Optional[Dict[str, int]] = None,
+                 default_limit: int = DEFAULT_CHANNEL_LIMIT):
+        self.channel_limits = {**DEFAULT_CHANNEL_LIMITS, **(channel_limits or {})}
+        self.default_limit = default_limit
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, channel: str) -> ThreadPoolExecutor:
+        with self._lock:
+            pool = self._pools.get(channel)
+            if pool is None:
+                pool = ThreadPoolExecutor(
+                    max_workers=self.channel_limits.get(channel, self.default_limit),
+                    thread_name_prefix=f"delivery-{channel}"
+                )
+                self._pools[channel] = pool
+            return pool
+
+    @staticmethod
+    def _run_lane(tasks: List[DeliveryTask]) -> List[DeliveryResult]:
+        results = []
+        for task in tasks:
+            start = time.perf_counter()
+            try:
+                success, error = bool(task.send()), None
+            except Exception as e:
+                success, error = False, str(e)
+                logger.error(f"{task.channel} delivery to {task.recipient} failed: {error}")
+            results.append(DeliveryResult(
+                task.recipient, task.channel, task.description, success,
+                error, time.perf_counter() - start
+            ))
+        return results
+
+    def run(self, tasks: List[DeliveryTask]) -> DeliveryReport:
+        """Run every task and block until all have finished"""
+        start = time.perf_counter()
+        lanes: Dict[Tuple[str, str], List[DeliveryTask]] = OrderedDict()
+        for task in tasks:
+            lanes.setdefault((task.recipient, task.channel), []).append(task)
+
+        futures = [
+            self._pool(channel).submit(self._run_lane, lane)
+            for (_, channel), lane in lanes.items()
+        ]
+        wait(futures)
+
+        report = DeliveryReport()
+        for future in futures:
+            report.results.extend(future.result())
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def shutdown(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown(wait=True)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Durable delivery outbox for Digital Death Switch AI
+Persists every protocol delivery as a job before anything is sent, leases
+due jobs to workers, retries failures with exponential backoff and jitter,
+and lets an interrupted run resume without resending finished jobs
+"""
+
+import os
+import json
+import uuid
+import random
+import socket
+import hashlib
+import logging
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from database import DEFAULT_DB_PATH, get_connection, transaction
+from activity_store import OWNER_USER_ID, TIMESTAMP_FORMAT, utc_timestamp
+from delivery_store import record_delivery
+from delivery_executor import DeliveryExecutor, DeliveryReport, DeliveryTask
+from async_db import get_async_database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BASE_DELAY = 30           # Seconds before the first retry
+DEFAULT_MAX_DELAY = 3600          # Backoff cap
+DEFAULT_LEASE_SECONDS = 300       # A crashed worker's jobs become due again after this
+DEFAULT_CLAIM_BATCH = 200
+
+# Job states; 'leased' jobs whose lease ran out are claimable again
+PENDING, LEASED, SENT, FAILED = 'pending', 'leased', 'sent', 'failed'
+
+CLAIM_SQL = '''
+    UPDATE delivery_outbox
+    SET status = 'leased', lease_owner = ?, lease_expires_at = ?,
+        next_attempt_at = ?, attempts = attempts + 1, updated_at = ?
+    WHERE id IN (
+        SELECT id FROM delivery_outbox
+        WHERE user_id = ? AND status IN ('pending', 'leased') AND next_attempt_at <= ?
+        ORDER BY next_attempt_at, id
+        LIMIT ?
+    )
+    RETURNING id, user_id, run_id, idempotency_key, recipient_name, document_name,
+              channel, destination, payload, attempts, max_attempts
+'''
+
+
+class PermanentDeliveryError(Exception):
+    """Raised by a sender when retrying cannot help (bad configuration, rejected destination)"""
+
+
+@dataclass
+class OutboxJob:
+    """One leased delivery (payload is the channel-specific message)"""
+    id: int
+    user_id: int
+    run_id: str
+    idempotency_key: str
+    recipient_name: str
+    document_name: Optional[str]
+    channel: str
+    destination: str
+    payload: Dict
+    attempts: int
+    max_attempts: int
+
+
+def idempotency_key(run_id: str, recipient_name: str, document_name: Optional[str],
+                    channel: str) -> str:
+    """Stable key of one (recipient, document, channel) delivery within a run"""
+    return f"{run_id}/{recipient_name}/{document_name or ''}/{channel}"
+
+
+def message_id_for(key: str) -> str:
+    """Deterministic RFC 5322 Message-ID, so a resent email can be deduplicated"""
+    return f"<{hashlib.sha256(key.encode()).hexdigest()[:32]}@death-switch.local>"
+
+
+def backoff_delay(attempts: int, base_delay: float = DEFAULT_BASE_DELAY,
+                  max_delay: float = DEFAULT_MAX_DELAY) -> float:
+    """Exponential backoff with jitter: between half and all of base * 2^(attempts-1)"""
+    delay = min(max_delay, base_delay * (2 ** max(0, attempts - 1)))
+    return random.uniform(delay / 2, delay)
+
+
+def _timestamp_in(seconds: float) -> str:
+    return (datetime.utcnow() + timedelta(seconds=seconds)).strftime(TIMESTAMP_FORMAT)
+
+
+def new_run_id() -> str:
+    return f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def enqueue_jobs(conn: sqlite3.Connection, run_id: str, jobs: Iterable[Dict],
+                 user_id: int = OWNER_USER_ID,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+    """Insert job dicts (recipient_name, document_name, channel, destination, payload).
+
+    Jobs whose idempotency key already exists are skipped; returns rows added.
+    """
+    added = 0
+    for job in jobs:
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO delivery_outbox
+                (user_id, run_id, idempotency_key, recipient_name, document_name,
+                 channel, destination, payload, max_attempts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            user_id, run_id,
+            idempotency_key(run_id, job['recipient_name'], job.get('document_name'), job['channel']),
+            job['recipient_name'], job.get('document_name'), job['channel'],
+            job['destination'], json.dumps(job['payload']), max_attempts
+        ))
+        added += cursor.rowcount
+    return added
+
+
+def unfinished_run(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID) -> Optional[str]:
+    """run_id of the oldest run that still has pending or leased jobs"""
+    row = conn.execute('''
+        SELECT run_id FROM delivery_outbox
+        WHERE user_id = ? AND status IN ('pending', 'leased')
+        ORDER BY id LIMIT 1
+    ''', (user_id,)).fetchone()
+    return row[0] if row else None
+
+
+def next_attempt_at(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID) -> Optional[datetime]:
+    """When the earliest pending or leased job of a user is due (None once every job is finished)"""
+    row = conn.execute('''
+        SELECT MIN(next_attempt_at) FROM delivery_outbox
+        WHERE user_id = ? AND status IN ('pending', 'leased')
+    ''', (user_id,)).fetchone()
+    return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+
+def latest_run(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID,
+               since: Optional[datetime] = None) -> Optional[str]:
+    """run_id of the newest run of a user, if one was enqueued at or after since (UTC)"""
+    query = "SELECT run_id FROM delivery_outbox WHERE user_id = ?"
+    params = [user_id]
+    if since is not None:
+        query += " AND created_at >= ?"
+        params.append(since.strftime(TIMESTAMP_FORMAT))
+    row = conn.execute(query + " ORDER BY id DESC LIMIT 1", params).fetchone()
+    return row[0] if row else None
+
+
+def claim_due_jobs(conn: sqlite3.Connection, owner: str, user_id: int = OWNER_USER_ID,
+                   limit: int = DEFAULT_CLAIM_BATCH,
+                   lease_seconds: float = DEFAULT_LEASE_SECONDS) -> List[OutboxJob]:
+    """Lease up to limit due jobs to owner (call inside an IMMEDIATE transaction)"""
+    now = utc_timestamp()
+    lease_expires_at = _timestamp_in(lease_seconds)
+    rows = conn.execute(
+        CLAIM_SQL, (owner, lease_expires_at, lease_expires_at, now, user_id, now, limit)
+    ).fetchall()
+    return sorted(
+        (OutboxJob(*row[:8], json.loads(row[8]), row[9], row[10]) for row in rows),
+        key=lambda job: job.id
+    )
+
+
+def complete_job(conn: sqlite3.Connection, job: OutboxJob, owner: str,
+                 message_id: Optional[str] = None) -> bool:
+    """Mark a leased job sent and log the delivery; False if the lease was lost"""
+    cursor = conn.execute('''
+        UPDATE delivery_outbox
+        SET status = 'sent', message_id = ?, lease_owner = NULL, lease_expires_at = NULL,
+            last_error = NULL, updated_at = ?
+        WHERE id = ? AND status = 'leased' AND lease_owner = ?
+    ''', (message_id, utc_timestamp(), job.id, owner))
+    if cursor.rowcount != 1:
+        return False
+    record_delivery(conn, job.recipient_name, job.channel, "success",
+                    message_id, None, job.user_id)
+    return True
+
+
+def fail_job(conn: sqlite3.Connection, job: OutboxJob, owner: str, error: str,
+             base_delay: float = DEFAULT_BASE_DELAY,
+             max_delay: float = DEFAULT_MAX_DELAY, permanent: bool = False) -> Optional[str]:
+    """Schedule a retry (or give up after max_attempts or a permanent error); returns the new status"""
+    if permanent or job.attempts >= job.max_attempts:
+        status, next_attempt_at = FAILED, utc_timestamp()
+    else:
+        status, next_attempt_at = PENDING, _timestamp_in(
+            backoff_delay(job.attempts, base_delay, max_delay)
+        )
+    cursor = conn.execute('''
+        UPDATE delivery_outbox
+        SET status = ?, next_attempt_at = ?, last_error = ?, lease_owner = NULL,
+            lease_expires_at = NULL, updated_at = ?
+        WHERE id = ? AND status = 'leased' AND lease_owner = ?
+    ''', (status, next_attempt_at, error, utc_timestamp(), job.id, owner))
+    if cursor.rowcount != 1:
+        return None
+    record_delivery(conn, job.recipient_name, job.channel,
+                    "failed" if status == FAILED else "retrying", None, error, job.user_id)
+    return status
+
+
+def outbox_counts(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID,
+                  run_id: Optional[str] = None) -> Dict[str, int]:
+    """Jobs per status, for one run or all of a user's runs"""
+    if run_id:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) FROM delivery_outbox WHERE user_id = ? AND run_id = ? GROUP BY status",
+            (user_id, run_id)
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) FROM delivery_outbox WHERE user_id = ? GROUP BY status",
+            (user_id,)
+        ).fetchall()
+    return {status: count for status, count in rows}
+
+
+class OutboxDispatcher:
+    """Leases due jobs and sends them through a DeliveryExecutor.
+
+    senders maps a channel to a callable taking an OutboxJob; it returns a
+    message id (or True) on success and a falsy value or raises on failure;
+    PermanentDeliveryError fails the job at once instead of retrying it.
+    async_senders optionally maps channels to coroutine functions with the
+    same contract, used when the executor is an AsyncDeliveryExecutor.
+    Each job is checkpointed (sent / retry scheduled) as soon as its send
+    returns, so a crash only ever re-dispatches jobs that were in flight.
+    """
+
+    def __init__(self, senders: Dict[str, Callable[[OutboxJob], object]],
+                 db_path: str = DEFAULT_DB_PATH, executor: Optional[DeliveryExecutor] = None,
+                 user_id: int = OWNER_USER_ID, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                 batch_size: int = DEFAULT_CLAIM_BATCH,
+                 async_senders: Optional[Dict[str, Callable[[OutboxJob], Awaitable]]] = None):
+        self.senders = senders
+        self.async_senders = async_senders or {}
+        self.db_path = db_path
+        self.executor = executor or DeliveryExecutor()
+        self.user_id = user_id
+        self.lease_seconds = lease_seconds
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.batch_size = batch_size
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _checkpoint(self, conn: sqlite3.Connection, job: OutboxJob, result,
+                    error: Optional[str], permanent: bool = False) -> Optional[str]:
+        """Record one send's outcome; returns the job's new status"""
+        if error is None:
+            message_id = result if isinstance(result, str) else None
+            if not complete_job(conn, job, self.owner, message_id):
+                logger.warning(f"Lease on outbox job {job.id} was lost before completion")
+            return SENT
+        return fail_job(conn, job, self.owner, error, self.base_delay, self.max_delay, permanent)
+
+    def _outcome(self, job: OutboxJob, status: Optional[str], error: Optional[str]) -> bool:
+        if error is None:
+            return True
+        if status == FAILED:
+            logger.error(f"Giving up on {job.channel} delivery to {job.recipient_name} "
+                         f"after {job.attempts} attempt(s): {error}")
+        raise RuntimeError(error)
+
+    def _attempt(self, job: OutboxJob) -> bool:
+        """Send one job and checkpoint the outcome"""
+        permanent = False
+        try:
+            result = self.senders[job.channel](job)
+            error = None if result else f"{job.channel} send returned failure"
+        except PermanentDeliveryError as e:
+            result, error, permanent = None, str(e), True
+        except Exception as e:
+            result, error = None, str(e)
+
+        with transaction(self.db_path) as conn:
+            status = self._checkpoint(conn, job, result, error, permanent)
+        return self._outcome(job, status, error)
+
+    async def _attempt_async(self, job: OutboxJob) -> bool:
+        """_attempt for async senders; the checkpoint runs on the async database executor"""
+        permanent = False
+        try:
+            result = await self.async_senders[job.channel](job)
+            error = None if result else f"{job.channel} send returned failure"
+        except PermanentDeliveryError as e:
+            result, error, permanent = None, str(e), True
+        except Exception as e:
+            result, error = None, str(e)
+
+        status = await get_async_database(self.db_path).run(
+            self._checkpoint, job, result, error, permanent, write=True
+        )
+        return self._outcome(job, status, error)
+
+    def dispatch_due(self) -> DeliveryReport:
+        """Send every job that is due now (including expired leases); one pass"""
+        report = DeliveryReport()
+        while True:
+            with transaction(self.db_path) as conn:
+                jobs = claim_due_jobs(conn, self.owner, self.user_id,
+                                      self.batch_size, self.lease_seconds)
+            if not jobs:
+                return report
+
+            batch = self.executor.run([
+                DeliveryTask(job.recipient_name, job.channel,
+                             lambda job=job: self._attempt(job), job.document_name or "",
+                             (lambda job=job: self._attempt_async(job))
+                             if job.channel in self.async_senders else None)
+                for job in jobs
+            ])
+            report.results.extend(batch.results)
+            report.elapsed += batch.elapsed
+
+    def counts(self, run_id: Optional[str] = None) -> Dict[str, int]:
+        return outbox_counts(get_connection(self.db_path), self.user_id, run_id)
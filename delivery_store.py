@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Delivery log storage for Digital Death Switch AI
+Records the outcome of every email/SMS/WhatsApp delivery attempt
+"""
+
+import sqlite3
+from typing import Optional
+
+from activity_store import OWNER_USER_ID
+
+
+def record_delivery(conn: sqlite3.Connection, recipient_name: str, delivery_method: str,
+                    status: str, message_id: Optional[str] = None,
+                    error_details: Optional[str] = None,
+                    user_id: int = OWNER_USER_ID) -> int:
+    """Insert one delivery_log row on the caller's connection; returns its id"""
+    cursor = conn.execute('''
+        INSERT INTO delivery_log
+            (user_id, recipient_name, delivery_method, status, message_id, error_details)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (user_id, recipient_name, delivery_method, status, message_id, error_details))
+    return cursor.lastrowid
@@ -8,19 +8,21 @@ import os
 import sys
 import time
 import psutil
-import sqlite3
 from datetime import datetime
 import platform
 import subprocess
 import json
 import requests
 from pathlib import Path
+from activity_store import OWNER_USER_ID
+from activity_writer import get_activity_writer
 
 class DeviceMonitor:
     """Multi-platform device activity monitor"""
     
-    def __init__(self, db_path="death_switch.db"):
+    def __init__(self, db_path="death_switch.db", user_id=OWNER_USER_ID):
         self.db_path = db_path
+        self.user_id = user_id  # users.db id of the switch this device belongs to
         self.platform = platform.system().lower()
         self.last_activity = None
         self.monitoring_interval = 60  # Check every minute
@@ -254,21 +256,12 @@ class DeviceMonitor:
         if not activities:
             return
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        for activity in activities:
-            cursor.execute('''
-                INSERT INTO activity_log (activity_type, device_id, notes)
-                VALUES (?, ?, ?)
-            ''', (
-                activity['type'],
-                platform.node(),  # Computer name as device ID
-                activity['details']
-            ))
-        
-        conn.commit()
-        conn.close()
+        # Queued for the background writer; flushed on shutdown
+        get_activity_writer(self.db_path).submit_many([(
+            activity['type'],
+            platform.node(),  # Computer name as device ID
+            activity['details']
+        ) for activity in activities], user_id=self.user_id)
         
         print(f"✅ Logged {len(activities)} activities")
     
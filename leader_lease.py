@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Leader election for Digital Death Switch AI
+A lease row in SQLite names the one process allowed to run the monitor.
+The leader renews it from a background thread; when it dies or stalls the
+lease expires and a follower takes over within a few seconds. Every
+takeover increments a fencing token, and the monitor's state transitions
+check it in the same transaction, so a paused former leader cannot act
+on stale leadership
+"""
+
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from typing import Callable, Optional
+
+from database import DEFAULT_DB_PATH, get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_TTL = 10.0          # Seconds a lease lasts without renewal
+MONITOR_LEASE = "monitor"
+
+
+class LeaseLost(Exception):
+    """The caller's fencing token is no longer the current lease holder's"""
+
+
+def monitor_lease_name(user_id: int) -> str:
+    return f"{MONITOR_LEASE}:{user_id}"
+
+
+def check_fencing(conn, name: str, token: int):
+    """Raise LeaseLost unless token still holds an unexpired lease (call in the write's transaction)"""
+    row = conn.execute(
+        "SELECT fencing_token, expires_at FROM leader_leases WHERE name = ?", (name,)
+    ).fetchone()
+    if row is None or row[0] != token or row[1] <= time.time():
+        raise LeaseLost(f"Lease {name}: fencing token {token} is stale")
+
+
+class LeaderLease:
+    """One process's claim on a named lease"""
+
+    def __init__(self, name: str, db_path: str = DEFAULT_DB_PATH, ttl: float = DEFAULT_LEASE_TTL,
+                 holder: str = None):
+        self.name = name
+        self.db_path = db_path
+        self.ttl = ttl
+        self.renew_interval = ttl / 3     # Renewals that can fail before the lease lapses
+        self.retry_interval = ttl / 5     # How often followers try to take over
+        self.holder = holder or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.token = None                 # Fencing token while (last) leader
+        self._on_lost = None
+        self._renewer = None
+        self._stop = threading.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._renewer is not None and not self._stop.is_set()
+
+    def try_acquire(self) -> Optional[int]:
+        """Take the lease if it is free, expired or already ours; returns the fencing token"""
+        with transaction(self.db_path) as conn:
+            now = time.time()
+            row = conn.execute(
+                "SELECT holder, fencing_token, expires_at FROM leader_leases WHERE name = ?",
+                (self.name,)
+            ).fetchone()
+            if row and row[0] != self.holder and row[2] > now:
+                return None
+            token = row[1] if row and row[0] == self.holder else (row[1] + 1 if row else 1)
+            conn.execute('''
+                INSERT INTO leader_leases (name, holder, fencing_token, expires_at, acquired_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    holder = excluded.holder,
+                    fencing_token = excluded.fencing_token,
+                    expires_at = excluded.expires_at,
+                    acquired_at = CASE WHEN holder = excluded.holder THEN acquired_at
+                                       ELSE excluded.acquired_at END
+            ''', (self.name, self.holder, token, now + self.ttl, now))
+        if row is None or row[0] != self.holder:
+            logger.info(f"Lease {self.name} acquired by {self.holder} (fencing token {token})")
+        self.token = token
+        return token
+
+    def renew(self) -> bool:
+        """Extend our lease; False if it was lost (expired and taken over)"""
+        with transaction(self.db_path) as conn:
+            cursor = conn.execute('''
+                UPDATE leader_leases SET expires_at = ?
+                WHERE name = ? AND holder = ? AND fencing_token = ?
+            ''', (time.time() + self.ttl, self.name, self.holder, self.token))
+            return cursor.rowcount == 1
+
+    def release(self):
+        """Stop renewing and expire the lease so a follower takes over at once"""
+        self._stop.set()
+        if self.token is None:
+            return
+        with transaction(self.db_path) as conn:
+            conn.execute('''
+                UPDATE leader_leases SET expires_at = 0
+                WHERE name = ? AND holder = ? AND fencing_token = ?
+            ''', (self.name, self.holder, self.token))
+        logger.info(f"Lease {self.name} released by {self.holder}")
+
+    def wait_until_leader(self, stop: Callable[[], bool] = lambda: False) -> Optional[int]:
+        """Block as a follower until elected (or stop() is true); returns the fencing token"""
+        while not stop():
+            try:
+                token = self.try_acquire()
+            except Exception as e:
+                logger.error(f"Lease {self.name}: acquire failed: {str(e)}")
+                token = None
+            if token is not None:
+                return token
+            time.sleep(self.retry_interval)
+        return None
+
+    def keep_alive(self, on_lost: Callable[[], None]):
+        """Renew the lease from a background thread; on_lost is called once if it is lost"""
+        self._stop.clear()
+        self._on_lost = on_lost
+        self._renewer = threading.Thread(target=self._renew_loop, name=f"lease-{self.name}", daemon=True)
+        self._renewer.start()
+
+    def _renew_loop(self):
+        deadline = time.time() + self.ttl
+        while not self._stop.wait(self.renew_interval):
+            try:
+                if self.renew():
+                    deadline = time.time() + self.ttl
+                    continue
+                logger.warning(f"Lease {self.name} lost by {self.holder}")
+            except Exception as e:
+                # A busy or unavailable database: keep trying until the lease would lapse
+                logger.error(f"Lease {self.name}: renewal failed: {str(e)}")
+                if time.time() < deadline:
+                    continue
+            self._stop.set()
+            self._on_lost()
+            return
+
+    def current(self) -> Optional[dict]:
+        """The lease row as seen by everyone"""
+        row = get_connection(self.db_path).execute(
+            "SELECT holder, fencing_token, expires_at, acquired_at FROM leader_leases WHERE name = ?",
+            (self.name,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"holder": row[0], "fencing_token": row[1], "expires_at": row[2],
+                "acquired_at": row[3], "expired": row[2] <= time.time()}
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Streaming MIME messages for Digital Death Switch AI
+Builds multipart/mixed emails as a stream of byte chunks: attachments are
+read and base64-encoded a chunk at a time and written straight to the SMTP
+socket, so memory use stays flat however large the files are. Files over
+a size threshold can be delivered as download links instead
+"""
+
+import os
+import base64
+import smtplib
+import logging
+import secrets
+import mimetypes
+from email.header import Header
+from email.utils import formataddr, formatdate, make_msgid, parseaddr, encode_rfc2231
+from typing import Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Raw bytes per read; a multiple of 57 so every chunk encodes to whole 76-char lines
+CHUNK_SIZE = 57 * 1024
+CRLF = b"\r\n"
+
+DEFAULT_LINK_THRESHOLD = 10 * 1024 * 1024
+UPLOAD_DIR = "secure_docs"        # Where /upload-document stores files for /documents/<filename>
+
+
+def _encode_base64_lines(data: bytes) -> bytes:
+    """base64 with 76-character CRLF-terminated lines"""
+    return base64.encodebytes(data).replace(b"\n", CRLF)
+
+
+def _header(value: str) -> str:
+    """RFC 2047-encode non-ASCII header values (subjects are localized)"""
+    try:
+        value.encode('ascii')
+        return value
+    except UnicodeEncodeError:
+        # Fold with CRLF like the rest of the stream; servers reject bare LFs
+        return Header(value, 'utf-8').encode(linesep='\r\n')
+
+
+def _address(value: str) -> str:
+    """Address header value with any non-ASCII display name RFC 2047-encoded"""
+    name, address = parseaddr(value)
+    return formataddr((name, address), charset='utf-8') if name else value
+
+
+def _filename_param(filename: str) -> str:
+    try:
+        filename.encode('ascii')
+        return f'filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"filename*={encode_rfc2231(filename, 'utf-8')}"
+
+
+class StreamingMessage:
+    """A multipart/mixed email whose attachments are streamed from disk.
+
+    links maps attachment paths to URLs; those files are listed in the body
+    as links instead of being attached. Call chunks() for a fresh stream
+    (a retry simply streams the message again).
+    """
+
+    def __init__(self, from_addr: str, to_addrs: List[str], subject: str, body: str,
+                 attachments: Optional[List[str]] = None, message_id: Optional[str] = None,
+                 links: Optional[Dict[str, str]] = None):
+        self.from_addr = from_addr
+        self.to_addrs = to_addrs
+        self.subject = subject
+        self.body = body
+        self.links = links or {}
+        self.attachments = [path for path in attachments or []
+                            if path not in self.links and os.path.exists(path)]
+        self.message_id = message_id or make_msgid(domain="death-switch.local")
+        self.boundary = f"=_death_switch_{secrets.token_hex(12)}"
+
+    def _body_text(self) -> str:
+        if not self.links:
+            return self.body
+        lines = "\n".join(f"🔗 {os.path.basename(path)}: {url}" for path, url in self.links.items())
+        return f"{self.body}\n\n{lines}\n"
+
+    def _headers(self) -> bytes:
+        headers = [
+            f"From: {_address(self.from_addr)}",
+            f"To: {', '.join(_address(address) for address in self.to_addrs)}",
+            f"Subject: {_header(self.subject)}",
+            f"Date: {formatdate(localtime=True)}",
+            f"Message-ID: {self.message_id}",
+            "MIME-Version: 1.0",
+            f'Content-Type: multipart/mixed; boundary="{self.boundary}"',
+        ]
+        return CRLF.join(h.encode('ascii') for h in headers) + CRLF + CRLF
+
+    def chunks(self) -> Iterator[bytes]:
+        """The message as CRLF-terminated byte chunks.
+
+        Every part is base64-encoded, so no line starts with '.' and the
+        stream needs no SMTP dot-stuffing.
+        """
+        delimiter = f"--{self.boundary}".encode('ascii') + CRLF
+        yield self._headers()
+
+        yield delimiter
+        yield (b"Content-Type: text/plain; charset=\"utf-8\"" + CRLF +
+               b"Content-Transfer-Encoding: base64" + CRLF + CRLF)
+        yield _encode_base64_lines(self._body_text().encode('utf-8'))
+
+        for path in self.attachments:
+            filename = os.path.basename(path)
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            yield delimiter
+            yield (f"Content-Type: {content_type}".encode('ascii') + CRLF +
+                   b"Content-Transfer-Encoding: base64" + CRLF +
+                   f"Content-Disposition: attachment; {_filename_param(filename)}".encode('ascii') +
+                   CRLF + CRLF)
+            with open(path, 'rb') as f:
+                while True:
+                    data = f.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    yield _encode_base64_lines(data)
+
+        yield f"--{self.boundary}--".encode('ascii') + CRLF
+
+
+def send_stream(smtp: smtplib.SMTP, from_addr: str, to_addrs: List[str],
+                chunks: Iterator[bytes]) -> Dict:
+    """Send a streamed message over an open session (smtplib.sendmail semantics).
+
+    Returns the dict of refused recipients; raises SMTPRecipientsRefused
+    if nobody was accepted and SMTPDataError if the message was rejected.
+    """
+    smtp.ehlo_or_helo_if_needed()
+    code, resp = smtp.mail(from_addr)
+    if code != 250:
+        if code == 421:
+            smtp.close()
+        else:
+            smtp._rset()
+        raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+
+    refused = {}
+    for address in to_addrs:
+        code, resp = smtp.rcpt(address)
+        if code not in (250, 251):
+            refused[address] = (code, resp)
+        if code == 421:
+            smtp.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(to_addrs):
+        smtp._rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    smtp.putcmd("data")
+    code, resp = smtp.getreply()
+    if code != 354:
+        smtp._rset()
+        raise smtplib.SMTPDataError(code, resp)
+    try:
+        for chunk in chunks:
+            smtp.send(chunk)
+    except Exception:
+        # The server is mid-DATA; the session cannot be reused
+        smtp.close()
+        raise
+    smtp.send(b"." + CRLF)
+    code, resp = smtp.getreply()
+    if code != 250:
+        if code == 421:
+            smtp.close()
+        else:
+            smtp._rset()
+        raise smtplib.SMTPDataError(code, resp)
+    return refused
+
+
+def link_attachments(attachments: List[str], threshold: Optional[int],
+                     url_for: Callable[[str], Optional[str]]) -> Dict[str, str]:
+    """URLs for attachments larger than threshold bytes that url_for can link"""
+    links = {}
+    if not threshold:
+        return links
+    for path in attachments:
+        if os.path.exists(path) and os.path.getsize(path) > threshold:
+            url = url_for(path)
+            if url:
+                links[path] = url
+            else:
+                logger.warning(f"{path} exceeds the link threshold but has no download URL, attaching it")
+    return links
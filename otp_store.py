@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+OTP storage for Digital Death Switch AI
+Indexed lookups, single-statement atomic consume, chunked purge of expired
+codes and optional HMAC-hashed storage of the codes themselves
+"""
+
+import hmac
+import hashlib
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from activity_store import OWNER_USER_ID, TIMESTAMP_FORMAT, utc_timestamp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PURGE_CHUNK = 5000
+
+
+def otp_digest(otp: str, purpose: str, hash_key: Optional[str]) -> str:
+    """Stored form of a code: HMAC-SHA256 when a key is configured, else plaintext"""
+    if not hash_key:
+        return otp
+    return hmac.new(hash_key.encode(), f"{purpose}:{otp}".encode(), hashlib.sha256).hexdigest()
+
+
+def store_otp(conn: sqlite3.Connection, otp: str, purpose: str,
+              expiry_minutes: int = 30, hash_key: Optional[str] = None,
+              user_id: int = OWNER_USER_ID):
+    """Insert an OTP that expires expiry_minutes from now (UTC, like datetime('now'))"""
+    expires_at = (datetime.utcnow() + timedelta(minutes=expiry_minutes)).strftime(TIMESTAMP_FORMAT)
+    conn.execute(
+        "INSERT INTO otp_log (user_id, otp_code, expires_at, purpose) VALUES (?, ?, ?, ?)",
+        (user_id, otp_digest(otp, purpose, hash_key), expires_at, purpose)
+    )
+
+
+def consume_otp(conn: sqlite3.Connection, otp: str, purpose: str,
+                hash_key: Optional[str] = None, user_id: int = OWNER_USER_ID) -> bool:
+    """Atomically mark one live matching OTP as used; True if one was found.
+
+    Consumed codes get expires_at = now so the purge removes them with the
+    expired ones.
+    """
+    now = utc_timestamp()
+    cursor = conn.execute('''
+        UPDATE otp_log SET used = 1, expires_at = ?
+        WHERE id = (
+            SELECT id FROM otp_log
+            WHERE user_id = ? AND otp_code = ? AND purpose = ? AND used = 0 AND expires_at > ?
+            LIMIT 1
+        )
+    ''', (now, user_id, otp_digest(otp, purpose, hash_key), purpose, now))
+    return cursor.rowcount == 1
+
+
+def purge_expired_otps(conn: sqlite3.Connection,
+                       chunk_size: int = DEFAULT_PURGE_CHUNK) -> int:
+    """Delete expired (and therefore also consumed) OTPs of all users in bounded chunks.
+
+    Runs in autocommit mode on the pooled connection: each chunk is its own
+    short write so OTP issue/verify never waits long.
+    """
+    now = utc_timestamp()
+    purged = 0
+    while True:
+        cursor = conn.execute('''
+            DELETE FROM otp_log WHERE id IN (
+                SELECT id FROM otp_log WHERE expires_at <= ? LIMIT ?
+            )
+        ''', (now, chunk_size))
+        purged += cursor.rowcount
+        if cursor.rowcount < chunk_size:
+            break
+
+    if purged:
+        logger.info(f"Purged {purged} expired OTPs")
+    return purged
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Send-rate limiting for Digital Death Switch AI
+Token buckets per provider and sender account, stored in SQLite so every
+worker process draws from the same budget. A send that finds the bucket
+empty reserves the next token and sleeps until it is due, so bursts are
+smoothed into a steady rate instead of being throttled by the provider
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from database import DEFAULT_DB_PATH, get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Sends per second and burst size; override with the rate_limits config key
+DEFAULT_RATE_LIMITS = {
+    'smtp': {'rate': 1.0, 'burst': 5},          # Gmail throttles bursts from one account
+    'twilio': {'rate': 1.0, 'burst': 5},        # 1 message/sec per long-code number
+    'whatsapp': {'rate': 20.0, 'burst': 20},    # WhatsApp Business API tier limits
+}
+DEFAULT_MAX_WAIT = 300            # Longest a send queues before RateLimitTimeout
+
+
+class RateLimitTimeout(Exception):
+    """The wait for a token would exceed max_wait"""
+
+
+@dataclass
+class BucketConfig:
+    rate: float                   # Tokens added per second
+    burst: float                  # Bucket capacity
+
+
+class RateLimiter:
+    """A token bucket shared across processes through the rate_limit_buckets table"""
+
+    def __init__(self, bucket: str, rate: float, burst: float,
+                 db_path: str = DEFAULT_DB_PATH, max_wait: float = DEFAULT_MAX_WAIT):
+        self.bucket = bucket
+        self.config = BucketConfig(rate, max(1.0, burst))
+        self.db_path = db_path
+        self.max_wait = max_wait
+
+    def reserve(self, tokens: float = 1.0, max_wait: Optional[float] = None) -> float:
+        """Take tokens now (the balance may go negative); returns seconds to wait.
+
+        Waiting callers line up behind each other because each one's debt is
+        paid off before the next can start. Nothing is reserved when the wait
+        would exceed max_wait.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        rate, burst = self.config.rate, self.config.burst
+        with transaction(self.db_path) as conn:
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket = ?",
+                (self.bucket,)
+            ).fetchone()
+            available = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+            wait = max(0.0, (tokens - available) / rate)
+            if wait > max_wait:
+                raise RateLimitTimeout(
+                    f"{self.bucket}: next send slot is {wait:.1f}s away (max_wait {max_wait}s)"
+                )
+            conn.execute('''
+                INSERT INTO rate_limit_buckets
+                    (bucket, tokens, updated_at, acquired, waited, total_wait, max_wait)
+                VALUES (?, ?, ?, 1, ?, ?, ?)
+                ON CONFLICT(bucket) DO UPDATE SET
+                    tokens = excluded.tokens,
+                    updated_at = excluded.updated_at,
+                    acquired = acquired + 1,
+                    waited = waited + excluded.waited,
+                    total_wait = total_wait + excluded.total_wait,
+                    max_wait = MAX(max_wait, excluded.max_wait)
+            ''', (self.bucket, available - tokens, now, int(wait > 0), wait, wait))
+        return wait
+
+    def acquire(self, tokens: float = 1.0, max_wait: Optional[float] = None) -> float:
+        """Block until tokens are available; returns the seconds waited"""
+        wait = self.reserve(tokens, max_wait)
+        if wait > 0:
+            logger.debug(f"Rate limit {self.bucket}: waiting {wait:.2f}s")
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: float = 1.0, max_wait: Optional[float] = None) -> float:
+        """acquire() for coroutines: the reservation runs off the loop, the wait is a sleep"""
+        wait = await asyncio.get_running_loop().run_in_executor(None, self.reserve, tokens, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict:
+        return bucket_stats(get_connection(self.db_path), self.bucket).get(self.bucket, {})
+
+
+def bucket_stats(conn, bucket: Optional[str] = None) -> Dict[str, Dict]:
+    """Wait-time metrics per bucket, summed over every process"""
+    query = '''
+        SELECT bucket, tokens, acquired, waited, total_wait, max_wait
+        FROM rate_limit_buckets
+    '''
+    rows = conn.execute(query + " WHERE bucket = ?", (bucket,)).fetchall() if bucket \
+        else conn.execute(query + " ORDER BY bucket").fetchall()
+    return {
+        name: {
+            "acquired": acquired,
+            "waited": waited,
+            "tokens": round(tokens, 2),
+            "avg_wait_seconds": round(total_wait / acquired, 3) if acquired else 0.0,
+            "max_wait_seconds": round(max_wait, 3),
+            "total_wait_seconds": round(total_wait, 3)
+        }
+        for name, tokens, acquired, waited, total_wait, max_wait in rows
+    }
+
+
+_limiters: Dict[tuple, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, account: str, limits: Optional[Dict] = None,
+                     db_path: str = DEFAULT_DB_PATH) -> RateLimiter:
+    """Get the limiter for one provider and sender account.
+
+    limits is the rate_limits config ({provider: {"rate": ..., "burst": ...}});
+    providers without an entry use DEFAULT_RATE_LIMITS.
+    """
+    settings = dict(DEFAULT_RATE_LIMITS.get(provider.split('_')[0], {'rate': 1.0, 'burst': 1}))
+    settings.update((limits or {}).get(provider, {}))
+    bucket = f"{provider}:{account}"
+    key = (bucket, db_path)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(key)
+            if limiter is None:
+                limiter = RateLimiter(bucket, settings['rate'], settings['burst'], db_path,
+                                      settings.get('max_wait', DEFAULT_MAX_WAIT))
+                _limiters[key] = limiter
+    limiter.config = BucketConfig(settings['rate'], max(1.0, settings['burst']))
+    return limiter
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Twilio SMS transport for Digital Death Switch AI
+One long-lived client per account: a pooled keep-alive HTTPS session to the
+Twilio REST API, bounded-concurrency batch sends and per-message status
+(SID, status, error code) for the delivery records
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RateLimiter, RateLimitTimeout
+
+logger = logging.getLogger(__name__)
+
+TWILIO_API_BASE = "https://api.twilio.com"
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_TIMEOUT = 15
+
+
+@dataclass
+class SMSResult:
+    """Outcome of one message as reported by Twilio"""
+    to: str
+    success: bool
+    sid: Optional[str] = None
+    status: Optional[str] = None
+    error_code: Optional[int] = None
+    error_message: Optional[str] = None
+    http_status: Optional[int] = None
+    permanent: bool = False     # Set when the message can never be sent (e.g. no credentials)
+
+    @property
+    def retryable(self) -> bool:
+        """Whether sending the same message again may succeed.
+
+        Network errors, rate limiting (429) and Twilio 5xx are transient;
+        other 4xx (bad credentials, invalid or blocked number) are not.
+        """
+        if self.success or self.permanent:
+            return False
+        status = self.http_status
+        return status is None or status == 429 or status >= 500
+
+    def error_details(self) -> Optional[str]:
+        if self.success:
+            return None
+        return f"Twilio error {self.error_code}: {self.error_message}"
+
+
+def sms_result_from_response(to: str, status_code: int, data: Dict,
+                             reason: Optional[str] = None) -> SMSResult:
+    """SMSResult from a Messages API response (201 body or error body)"""
+    if status_code in (200, 201):
+        return SMSResult(to, True, data.get('sid'), data.get('status'),
+                         data.get('error_code'), data.get('error_message'), status_code)
+    return SMSResult(to, False, None, data.get('status'), data.get('code'),
+                     data.get('message') or reason, status_code)
+
+
+class TwilioSMSTransport:
+    """Thread-safe Twilio Messages API client with a pooled requests.Session"""
+
+    def __init__(self, account_sid: str, auth_token: str, from_number: str,
+                 base_url: str = TWILIO_API_BASE,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 timeout: float = DEFAULT_TIMEOUT, limiter: Optional[RateLimiter] = None):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.base_url = base_url.rstrip('/')            # Points at a fake server in tests
+        self.max_connections = max_connections          # Keep-alive connections and batch workers
+        self.timeout = timeout
+        self.limiter = limiter                          # Shared send-rate budget of this sender
+        self.messages_url = f"{self.base_url}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._session = None
+        self._executor = None
+        self._pid = None
+
+    def _ensure_started(self):
+        """Create the session and batch executor (again, after a fork)"""
+        if self._session is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._session is not None and self._pid == os.getpid():
+                return
+            session = requests.Session()
+            session.auth = (self.account_sid, self.auth_token)
+            # Integer max_retries only retries failed connects, never a sent POST
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections,
+                                  max_retries=2)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_connections, thread_name_prefix="twilio-sms"
+            )
+            self._pid = os.getpid()
+
+    def send(self, to: str, body: str) -> SMSResult:
+        """Send one SMS; never raises, failures are described in the result"""
+        self._ensure_started()
+        try:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            response = self._session.post(
+                self.messages_url,
+                data={"From": self.from_number, "To": to, "Body": body},
+                timeout=self.timeout
+            )
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            result = sms_result_from_response(to, response.status_code, data, response.reason)
+        except (requests.RequestException, RateLimitTimeout) as e:
+            result = SMSResult(to, False, error_message=str(e))
+        self.record_result(result)
+        return result
+
+    def record_result(self, result: SMSResult):
+        """Count and log one send's outcome"""
+        with self._lock:
+            if result.success:
+                self.sent += 1
+            else:
+                self.failed += 1
+        if result.success:
+            logger.info(f"SMS sent successfully to {result.to}, SID: {result.sid}")
+        else:
+            logger.error(f"Failed to send SMS to {result.to}: {result.error_details()}")
+
+    def send_batch(self, messages: List[Tuple[str, str]]) -> List[SMSResult]:
+        """Send (to, body) pairs, max_connections at a time; results keep input order"""
+        self._ensure_started()
+        return list(self._executor.map(lambda message: self.send(*message), messages))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"sent": self.sent, "failed": self.failed,
+                    "max_connections": self.max_connections}
+
+    def close(self):
+        if self._session is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=True)
+            self._session.close()
+        self._session = None
+        self._executor = None
+
+
+_transports: Dict[Tuple, TwilioSMSTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_sms_transport(account_sid: str, auth_token: str, from_number: str,
+                      base_url: str = TWILIO_API_BASE, **options) -> TwilioSMSTransport:
+    """Get (or create) the process-wide transport for one Twilio account and sender"""
+    key = (account_sid, from_number, base_url)
+    transport = _transports.get(key)
+    if transport is None or transport.auth_token != auth_token:
+        with _transports_lock:
+            transport = _transports.get(key)
+            if transport is None or transport.auth_token != auth_token:
+                if transport is not None:
+                    transport.close()
+                transport = TwilioSMSTransport(account_sid, auth_token, from_number,
+                                               base_url, **options)
+                _transports[key] = transport
+    return transport
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Pooled SMTP transport for Digital Death Switch AI
+Keeps authenticated SMTP sessions open and reuses them across sends,
+reconnecting on 421 replies, dropped connections and timeouts
+"""
+
+import ssl
+import time
+import atexit
+import socket
+import smtplib
+import logging
+import threading
+from contextlib import contextmanager
+from email.message import Message
+from typing import Callable, Dict, List, Optional, Tuple
+
+from mime_stream import StreamingMessage, send_stream
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SESSIONS = 4
+DEFAULT_IDLE_TIMEOUT = 240        # Most servers drop idle clients after ~5 minutes
+DEFAULT_NOOP_AFTER = 30           # Probe sessions idle longer than this before reuse
+DEFAULT_MAX_MESSAGES = 100        # Recycle sessions before per-connection limits hit
+DEFAULT_TIMEOUT = 30
+
+# Errors after which the session is unusable and the send is retried on a new one
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, socket.timeout, ConnectionError)
+
+
+class _Session:
+    """One authenticated SMTP connection and its bookkeeping"""
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.messages = 0
+        self.last_used = time.monotonic()
+
+
+def _is_reconnect_error(error: Exception) -> bool:
+    if isinstance(error, RECONNECT_ERRORS):
+        return True
+    # 421: service not available, closing transmission channel
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421
+
+
+class SMTPPool:
+    """Thread-safe pool of at most max_sessions authenticated SMTP sessions"""
+
+    def __init__(self, host: str, port: int = 587, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = True,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 noop_after: float = DEFAULT_NOOP_AFTER,
+                 max_messages: int = DEFAULT_MAX_MESSAGES,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_sessions = max_sessions    # Senders block when all sessions are busy
+        self.idle_timeout = idle_timeout    # Idle sessions older than this are closed, not reused
+        self.noop_after = noop_after
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.connections_opened = 0
+        self.messages_sent = 0
+        self.reconnects = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_sessions)
+        self._idle: List[_Session] = []
+
+    def _connect(self) -> _Session:
+        """Open, secure and authenticate a new session"""
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if self.username:
+                smtp.login(self.username, self.password)
+        except Exception:
+            self._discard(_Session(smtp))
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return _Session(smtp)
+
+    def _discard(self, session: _Session):
+        """Close a session without caring whether the server is still there"""
+        try:
+            session.smtp.quit()
+        except Exception:
+            session.smtp.close()
+
+    def _usable(self, session: _Session) -> bool:
+        """Whether an idle session can be reused"""
+        idle = time.monotonic() - session.last_used
+        if idle > self.idle_timeout or session.messages >= self.max_messages:
+            return False
+        if idle > self.noop_after:
+            try:
+                return session.smtp.noop()[0] == 250
+            except Exception:
+                return False
+        return True
+
+    def _checkout(self) -> _Session:
+        """Reuse an idle session or open a new one (caller holds a slot)"""
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._connect()
+            if self._usable(session):
+                return session
+            self._discard(session)
+
+    def _checkin(self, session: _Session):
+        session.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(session)
+
+    @contextmanager
+    def session(self):
+        """Borrow an authenticated smtplib.SMTP; broken sessions are not returned"""
+        self._slots.acquire()
+        try:
+            session = self._checkout()
+            try:
+                yield session.smtp
+            except Exception as e:
+                if _is_reconnect_error(e) or session.smtp.sock is None:
+                    self._discard(session)
+                else:
+                    self._checkin(session)
+                raise
+            session.messages += 1
+            self._checkin(session)
+        finally:
+            self._slots.release()
+
+    def _send_with_retry(self, send: Callable[[smtplib.SMTP], Dict], retries: int) -> Dict:
+        """Run send on a session, retrying on a fresh one after 421s, drops and timeouts"""
+        attempt = 0
+        while True:
+            try:
+                with self.session() as smtp:
+                    refused = send(smtp)
+                with self._lock:
+                    self.messages_sent += 1
+                return refused
+            except Exception as e:
+                if not _is_reconnect_error(e) or attempt >= retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.reconnects += 1
+                logger.warning(f"SMTP session to {self.host} lost ({e}), reconnecting")
+
+    def send_message(self, msg: Message, from_addr: Optional[str] = None,
+                     to_addrs: Optional[List[str]] = None, retries: int = 1) -> Dict:
+        """Send a message, retrying on a fresh session after 421s, drops and timeouts.
+
+        Returns smtplib's dict of refused recipients (empty if all accepted).
+        """
+        return self._send_with_retry(lambda smtp: smtp.send_message(msg, from_addr, to_addrs), retries)
+
+    def send_streaming(self, msg: StreamingMessage, retries: int = 1) -> Dict:
+        """Send a StreamingMessage, encoding attachments straight onto the socket"""
+        return self._send_with_retry(
+            lambda smtp: send_stream(smtp, msg.from_addr, msg.to_addrs, msg.chunks()), retries
+        )
+
+    def stats(self) -> Dict:
+        """Session reuse counters for monitoring"""
+        with self._lock:
+            return {
+                "connections_opened": self.connections_opened,
+                "messages_sent": self.messages_sent,
+                "reconnects": self.reconnects,
+                "idle_sessions": len(self._idle),
+                "max_sessions": self.max_sessions
+            }
+
+    def close(self):
+        """Close every idle session"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            self._discard(session)
+
+
+_pools: Dict[Tuple, SMTPPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(host: str, port: int = 587, username: Optional[str] = None,
+                  password: Optional[str] = None, **options) -> SMTPPool:
+    """Get (or create) the process-wide pool for one server, account and set of options"""
+    # Callers asking for different TLS or session settings get their own pool
+    key = (host, port, username, tuple(sorted(options.items())))
+    pool = _pools.get(key)
+    if pool is None or pool.password != password:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None or pool.password != password:
+                if pool is not None:
+                    pool.close()
+                pool = SMTPPool(host, port, username, password, **options)
+                _pools[key] = pool
+    return pool
+
+
+@atexit.register
+def close_all():
+    """Close the idle sessions of every pool on interpreter shutdown"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Write-invalidated response cache for Digital Death Switch AI
+Keeps the /status payload in memory; write paths invalidate it locally and,
+in shared mode, bump a generation counter in SQLite so other workers notice
+"""
+
+import time
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+from database import DEFAULT_DB_PATH, get_connection, transaction
+from activity_store import OWNER_USER_ID
+
+GENERATION_KEY = 'status_cache_generation'
+
+
+def generation_key(user_id: int = OWNER_USER_ID) -> str:
+    """settings key of a user's generation counter"""
+    return GENERATION_KEY if user_id == OWNER_USER_ID else f"{GENERATION_KEY}:{user_id}"
+
+
+BUMP_GENERATION_SQL = '''
+    INSERT INTO settings (key, value) VALUES (?, '1')
+    ON CONFLICT(key) DO UPDATE SET
+        value = CAST(value AS INTEGER) + 1,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+
+def bump_generation(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID):
+    """Invalidate every worker's cached status for a user (call inside the write's transaction)"""
+    conn.execute(BUMP_GENERATION_SQL, (generation_key(user_id),))
+
+
+def bump_generations(conn: sqlite3.Connection, user_ids: Iterable[int]):
+    """bump_generation() for many users in one executemany"""
+    conn.executemany(BUMP_GENERATION_SQL, ((generation_key(user_id),) for user_id in user_ids))
+
+
+def read_generation(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID) -> int:
+    row = conn.execute(
+        "SELECT value FROM settings WHERE key = ?", (generation_key(user_id),)
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+class StatusCache:
+    """In-process cache for one computed payload, with optional cross-process invalidation"""
+
+    def __init__(self, ttl: float = 30.0, shared: bool = False,
+                 db_path: str = DEFAULT_DB_PATH, check_interval: float = 1.0,
+                 user_id: int = OWNER_USER_ID):
+        self.ttl = ttl                        # Upper bound on staleness (date math, other writers)
+        self.shared = shared                  # Watch the SQLite generation counter
+        self.db_path = db_path
+        self.user_id = user_id                # Whose generation counter to watch
+        self.check_interval = check_interval  # How often shared mode reads the counter
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = 0
+        self._expires_at = 0.0
+        self._generation = None
+        self._checked_at = 0.0
+
+    def _shared_generation_changed(self, now: float) -> bool:
+        """Read the shared counter at most once per check_interval"""
+        if not self.shared or now - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = now
+        generation = read_generation(get_connection(self.db_path), self.user_id)
+        changed = self._generation is not None and generation != self._generation
+        self._generation = generation
+        return changed
+
+    def get(self, compute: Callable[[], Dict]) -> Dict:
+        """Return the cached payload, recomputing it on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            if self._shared_generation_changed(now):
+                self._value = None
+                self._version += 1
+            if self._value is not None and now < self._expires_at:
+                self.hits += 1
+                return self._value
+            self.misses += 1
+            version = self._version
+
+        value = compute()
+        with self._lock:
+            # Don't cache a payload computed across a concurrent invalidation
+            if version == self._version:
+                self._value = value
+                self._expires_at = time.monotonic() + self.ttl
+        return value
+
+    def invalidate(self, propagate: bool = True, conn: Optional[sqlite3.Connection] = None):
+        """Drop the cached payload; propagate bumps the shared generation too"""
+        with self._lock:
+            self._value = None
+            self._version += 1
+            self.invalidations += 1
+
+        if self.shared and propagate:
+            if conn is not None:
+                bump_generation(conn, self.user_id)
+            else:
+                with transaction(self.db_path) as conn:
+                    bump_generation(conn, self.user_id)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "shared": self.shared,
+                "ttl_seconds": self.ttl
+            }
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Persistent switch state for Digital Death Switch AI
+One row per switch holding where it is in its lifecycle
+
+    armed -> verifying -> executing -> done
+      ^         |
+      +---------+  (life verified / new activity)
+    armed, verifying -> disabled (kill switch); disabled, done -> armed (re-enabled)
+
+with the verification deadline and the time of each transition. Every
+transition is a compare-and-set on the current state, so when several
+workers race only one of them sends the verification or runs the protocol.
+An executing switch stays executing until none of its deliveries is left
+to retry. due_at says when each switch next needs attention; with the
+(state, due_at) index, finding every due switch across all tenants is one
+range scan per state
+"""
+
+import sqlite3
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from activity_store import OWNER_USER_ID, ANY_DEVICE, TIMESTAMP_FORMAT, utc_timestamp
+from status_cache import bump_generation, bump_generations
+
+logger = logging.getLogger(__name__)
+
+ARMED = 'armed'
+VERIFYING = 'verifying'
+EXECUTING = 'executing'
+DONE = 'done'
+DISABLED = 'disabled'
+
+# States whose switches have a due_at
+SCHEDULED_STATES = (ARMED, VERIFYING, EXECUTING)
+
+# States a transition may start from
+TRANSITIONS = {
+    VERIFYING: (ARMED,),
+    EXECUTING: (VERIFYING,),
+    DONE: (EXECUTING,),
+    ARMED: (VERIFYING, DISABLED, DONE),
+    DISABLED: (ARMED, VERIFYING),
+}
+STOPPED_STATES = (DONE, DISABLED)
+
+DEFAULT_INACTIVITY_DAYS = 10
+DEFAULT_VERIFICATION_HOURS = 48
+# An executing switch whose protocol run has not finished within this long
+# (crashed worker) is due again and can be resumed by someone else
+EXECUTION_LEASE_SECONDS = 3600
+DEFAULT_SWEEP_BATCH = 500
+
+# due_at of an armed switch: its last activity plus its inactivity threshold
+# (NULL until the switch records a first activity)
+ARMED_DUE_AT_SQL = f'''(
+    SELECT datetime(last_seen.last_activity,
+                    '+' || CAST(ROUND(switch_state.inactivity_days * 86400) AS INTEGER) || ' seconds')
+    FROM last_seen
+    WHERE last_seen.user_id = switch_state.user_id AND last_seen.device_id = '{ANY_DEVICE}'
+)'''
+
+STATE_COLUMNS = '''
+    user_id, state, verification_deadline, due_at, inactivity_days, verification_hours,
+    armed_at, verifying_at, executing_at, done_at, disabled_at, updated_at
+'''
+
+# Column recording when the switch last entered each state
+_ENTERED_AT = {state: f"{state}_at" for state in TRANSITIONS}
+
+
+class InvalidTransition(Exception):
+    """The requested state cannot be reached from the switch's current state"""
+
+
+@dataclass
+class SwitchState:
+    user_id: int
+    state: str
+    verification_deadline: Optional[datetime]   # UTC, while verifying
+    due_at: Optional[datetime]                  # UTC, next time the switch needs attention
+    inactivity_days: float
+    verification_hours: float
+    armed_at: Optional[datetime]
+    verifying_at: Optional[datetime]
+    executing_at: Optional[datetime]
+    done_at: Optional[datetime]
+    disabled_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @property
+    def is_running(self) -> bool:
+        return self.state not in STOPPED_STATES
+
+    def to_dict(self) -> dict:
+        return {key: str(value) if isinstance(value, datetime) else value
+                for key, value in self.__dict__.items()}
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _from_row(row) -> SwitchState:
+    user_id, state, deadline, due_at, inactivity_days, verification_hours, *stamps = row
+    return SwitchState(user_id, state, _parse(deadline), _parse(due_at), inactivity_days,
+                       verification_hours, *(_parse(value) for value in stamps))
+
+
+def get_switch_state(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID) -> SwitchState:
+    """Current state of a switch; switches without a row are armed"""
+    row = conn.execute(f"SELECT {STATE_COLUMNS} FROM switch_state WHERE user_id = ?",
+                       (user_id,)).fetchone()
+    if row is None:
+        return SwitchState(user_id, ARMED, None, None, DEFAULT_INACTIVITY_DAYS,
+                           DEFAULT_VERIFICATION_HOURS, None, None, None, None, None, None)
+    return _from_row(row)
+
+
+def ensure_switch(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID):
+    """Create the state row of a switch that has none (armed)"""
+    conn.execute("INSERT OR IGNORE INTO switch_state (user_id, state, armed_at) VALUES (?, ?, ?)",
+                 (user_id, ARMED, utc_timestamp()))
+
+
+def _lease_expiry(now: datetime = None) -> str:
+    return ((now or datetime.utcnow()) + timedelta(seconds=EXECUTION_LEASE_SECONDS)).strftime(TIMESTAMP_FORMAT)
+
+
+def _due_at_sql(to_state: str) -> str:
+    """due_at expression for a switch entering to_state (parameter: the verification deadline)"""
+    if to_state == ARMED:
+        return ARMED_DUE_AT_SQL
+    if to_state in (VERIFYING, EXECUTING):
+        return '?'
+    return 'NULL'
+
+
+def transition(conn: sqlite3.Connection, to_state: str, user_id: int = OWNER_USER_ID,
+               verification_deadline: Optional[datetime] = None,
+               from_states: Optional[Iterable[str]] = None) -> bool:
+    """Move a switch to to_state if it is currently in one of from_states.
+
+    from_states defaults to every state that may lead to to_state. Returns
+    False when another worker got there first (or the switch is elsewhere).
+    Call inside a transaction.
+    """
+    allowed = tuple(from_states or TRANSITIONS[to_state])
+    if any(state not in TRANSITIONS[to_state] for state in allowed):
+        raise InvalidTransition(f"{to_state} cannot be reached from {allowed}")
+
+    now = utc_timestamp()
+    deadline = verification_deadline.strftime(TIMESTAMP_FORMAT) if verification_deadline else None
+    due_params = {VERIFYING: (deadline,), EXECUTING: (_lease_expiry(),)}.get(to_state, ())
+    ensure_switch(conn, user_id)
+    cursor = conn.execute(f'''
+        UPDATE switch_state
+        SET state = ?, verification_deadline = ?, due_at = {_due_at_sql(to_state)},
+            {_ENTERED_AT[to_state]} = ?, updated_at = ?
+        WHERE user_id = ? AND state IN ({', '.join('?' * len(allowed))})
+    ''', (to_state, deadline, *due_params, now, now, user_id, *allowed))
+    if cursor.rowcount != 1:
+        return False
+
+    bump_generation(conn, user_id)
+    logger.info(f"Switch {user_id} -> {to_state}"
+                + (f" (verification deadline {deadline} UTC)" if deadline else ""))
+    return True
+
+
+def start_verification(conn: sqlite3.Connection, verification_hours: float,
+                       user_id: int = OWNER_USER_ID) -> Optional[datetime]:
+    """armed -> verifying with a deadline verification_hours from now; the deadline, or None if lost"""
+    deadline = (datetime.utcnow() + timedelta(hours=verification_hours)).replace(microsecond=0)
+    return deadline if transition(conn, VERIFYING, user_id, deadline) else None
+
+
+def claim_execution(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID) -> bool:
+    """Take over an executing switch whose lease ran out (its worker died); renews the lease"""
+    cursor = conn.execute('''
+        UPDATE switch_state SET due_at = ?, updated_at = ?
+        WHERE user_id = ? AND state = ? AND due_at <= ?
+    ''', (_lease_expiry(), utc_timestamp(), user_id, EXECUTING, utc_timestamp()))
+    return cursor.rowcount == 1
+
+
+def postpone_execution(conn: sqlite3.Connection, due_at: datetime,
+                       user_id: int = OWNER_USER_ID) -> bool:
+    """Keep an executing switch executing until due_at (its next delivery retry); False if it is not executing"""
+    cursor = conn.execute('''
+        UPDATE switch_state SET due_at = ?, updated_at = ?
+        WHERE user_id = ? AND state = ?
+    ''', (due_at.strftime(TIMESTAMP_FORMAT), utc_timestamp(), user_id, EXECUTING))
+    return cursor.rowcount == 1
+
+
+def cancel_verifications(conn: sqlite3.Connection, user_ids: Iterable[int]) -> List[int]:
+    """New activity proves life: move verifying switches back to armed; returns their user_ids.
+
+    Call in the activity's transaction, before refresh_due_at().
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+    now = utc_timestamp()
+    cancelled = [row[0] for row in conn.execute(f'''
+        UPDATE switch_state
+        SET state = ?, verification_deadline = NULL, armed_at = ?, updated_at = ?
+        WHERE state = ? AND user_id IN ({', '.join('?' * len(user_ids))})
+        RETURNING user_id
+    ''', (ARMED, now, now, VERIFYING, *user_ids))]
+    for user_id in cancelled:
+        logger.info(f"Switch {user_id} -> {ARMED} (pending life verification cancelled by new activity)")
+    return cancelled
+
+
+def refresh_due_at(conn: sqlite3.Connection, user_ids: Iterable[int]):
+    """Recompute due_at of armed switches after new activity (call in the activity's transaction)"""
+    for user_id in user_ids:
+        ensure_switch(conn, user_id)
+        conn.execute(f"UPDATE switch_state SET due_at = {ARMED_DUE_AT_SQL} WHERE user_id = ? AND state = ?",
+                     (user_id, ARMED))
+
+
+def set_thresholds(conn: sqlite3.Connection, inactivity_days: float, verification_hours: float,
+                   user_id: int = OWNER_USER_ID):
+    """Store a switch's inactivity and verification periods and move its due_at accordingly"""
+    ensure_switch(conn, user_id)
+    conn.execute('''
+        UPDATE switch_state SET inactivity_days = ?, verification_hours = ?, thresholds_set_at = ?
+        WHERE user_id = ?
+    ''', (inactivity_days, verification_hours, utc_timestamp(), user_id))
+    # Separate statement: SET expressions would still see the old inactivity_days
+    refresh_due_at(conn, [user_id])
+
+
+def thresholds_stored(conn: sqlite3.Connection, user_id: int = OWNER_USER_ID) -> bool:
+    """Whether a switch's periods were ever stored with set_thresholds()"""
+    row = conn.execute("SELECT thresholds_set_at FROM switch_state WHERE user_id = ?",
+                       (user_id,)).fetchone()
+    return bool(row and row[0])
+
+
+def due_switches(conn: sqlite3.Connection, now: datetime = None,
+                 limit: Optional[int] = None) -> List[SwitchState]:
+    """Every switch whose due_at has passed, oldest first (index range scans per state)"""
+    now = (now or datetime.utcnow()).strftime(TIMESTAMP_FORMAT)
+    query = f'''
+        SELECT {STATE_COLUMNS} FROM switch_state
+        WHERE state IN (?, ?, ?) AND due_at <= ? ORDER BY due_at
+    '''
+    params = (*SCHEDULED_STATES, now)
+    if limit:
+        query += " LIMIT ?"
+        params += (limit,)
+    return [_from_row(row) for row in conn.execute(query, params)]
+
+
+def claim_due_switches(conn: sqlite3.Connection, now: datetime = None,
+                       limit: int = DEFAULT_SWEEP_BATCH) -> Dict[str, List[SwitchState]]:
+    """Advance up to limit due switches per stage in set-based statements; call inside a transaction.
+
+    Returns {'verify': [...], 'execute': [...]}: switches moved armed -> verifying
+    (inactivity expired; their deadlines are stored) and switches moved
+    verifying -> executing (deadline passed), plus executing switches whose
+    lease ran out, which are re-leased for resumption.
+    """
+    now = now or datetime.utcnow()
+    stamp = now.strftime(TIMESTAMP_FORMAT)
+    lease = _lease_expiry(now)
+    due = '''
+        SELECT user_id FROM switch_state
+        WHERE state IN (?, ?) AND due_at <= ?
+        ORDER BY due_at LIMIT ?
+    '''
+
+    verify = conn.execute(f'''
+        UPDATE switch_state
+        SET state = '{VERIFYING}',
+            verification_deadline = datetime(?, '+' || CAST(ROUND(verification_hours * 3600) AS INTEGER) || ' seconds'),
+            due_at = datetime(?, '+' || CAST(ROUND(verification_hours * 3600) AS INTEGER) || ' seconds'),
+            verifying_at = ?, updated_at = ?
+        WHERE user_id IN ({due})
+        RETURNING {STATE_COLUMNS}
+    ''', (stamp, stamp, stamp, stamp, ARMED, ARMED, stamp, limit)).fetchall()
+
+    execute = conn.execute(f'''
+        UPDATE switch_state
+        SET state = '{EXECUTING}', verification_deadline = NULL, due_at = ?,
+            executing_at = CASE WHEN state = '{EXECUTING}' THEN executing_at ELSE ? END,
+            updated_at = ?
+        WHERE user_id IN ({due})
+        RETURNING {STATE_COLUMNS}
+    ''', (lease, stamp, stamp, VERIFYING, EXECUTING, stamp, limit)).fetchall()
+
+    claimed = {'verify': [_from_row(row) for row in verify],
+               'execute': [_from_row(row) for row in execute]}
+    bump_generations(conn, (switch.user_id for switch in claimed['verify'] + claimed['execute']))
+    return claimed
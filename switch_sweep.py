@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Bulk inactivity sweep for Digital Death Switch AI
+Finds every due switch across all tenants with indexed set-based queries on
+switch_state.due_at (no per-user DeathSwitchAI, config load or MAX query),
+claims them in batches and hands each batch to the verification and
+delivery stages
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from database import DEFAULT_DB_PATH, transaction
+from switch_state import SwitchState, claim_due_switches, DEFAULT_SWEEP_BATCH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STAGE_WORKERS = 8
+
+
+@dataclass
+class SweepResult:
+    verifying: List[int] = field(default_factory=list)   # user_ids sent a life verification
+    executing: List[int] = field(default_factory=list)   # user_ids whose protocol was run
+    batches: int = 0
+    elapsed: float = 0.0
+
+
+class SwitchSweeper:
+    """Claims due switches batch by batch and runs the two downstream stages.
+
+    verify(batch) is called with switches just moved armed -> verifying (send
+    each one its life verification); execute(batch) with switches moved
+    verifying -> executing or whose execution lease or retry is due (run or
+    resume the protocol, moving them to done once every delivery finished).
+    A stage that raises leaves its batch in the claimed state; verifying
+    switches still reach their deadline and executing ones are retried once
+    their lease runs out.
+    """
+
+    def __init__(self, verify: Callable[[List[SwitchState]], None],
+                 execute: Callable[[List[SwitchState]], None],
+                 db_path: str = DEFAULT_DB_PATH, batch_size: int = DEFAULT_SWEEP_BATCH):
+        self.verify = verify
+        self.execute = execute
+        self.db_path = db_path
+        self.batch_size = batch_size
+
+    def claim_batch(self) -> Dict[str, List[SwitchState]]:
+        with transaction(self.db_path) as conn:
+            return claim_due_switches(conn, limit=self.batch_size)
+
+    def sweep(self, max_batches: Optional[int] = None) -> SweepResult:
+        """Process due switches until none are left (or max_batches were claimed)"""
+        result = SweepResult()
+        start = time.perf_counter()
+        while max_batches is None or result.batches < max_batches:
+            claimed = self.claim_batch()
+            if not claimed['verify'] and not claimed['execute']:
+                break
+            result.batches += 1
+            for stage, name, switches, done in ((self.verify, "verification", claimed['verify'], result.verifying),
+                                                (self.execute, "delivery", claimed['execute'], result.executing)):
+                if not switches:
+                    continue
+                try:
+                    stage(switches)
+                    done.extend(switch.user_id for switch in switches)
+                except Exception as e:
+                    logger.error(f"Sweep {name} stage failed for {len(switches)} switches: {str(e)}")
+        result.elapsed = time.perf_counter() - start
+        if result.batches:
+            logger.info(f"Sweep: {len(result.verifying)} verifications, {len(result.executing)} "
+                        f"protocol runs in {result.batches} batches ({result.elapsed:.2f}s)")
+        return result
+
+
+class DeathSwitchStages:
+    """verify/execute stages backed by one cached DeathSwitchAI per tenant.
+
+    Only due switches get an instance, and each batch is fanned out over a
+    small thread pool. config_file supplies the deployment's provider
+    accounts; each tenant's recipients, documents, thresholds and
+    verification email come from the database (config.json's own entries
+    only ever belong to the switch it names).
+    """
+
+    def __init__(self, config_file: str = "config.json", workers: int = DEFAULT_STAGE_WORKERS,
+                 db_path: str = DEFAULT_DB_PATH):
+        self.config_file = config_file
+        self.db_path = db_path
+        self.workers = workers
+        self._switches = {}
+        self._lock = threading.Lock()
+
+    def switch_for(self, user_id: int):
+        from death_switch_system import DeathSwitchAI
+
+        switch = self._switches.get(user_id)
+        if switch is None:
+            with self._lock:
+                switch = self._switches.get(user_id)
+                if switch is None:
+                    switch = DeathSwitchAI(self.config_file, user_id=user_id, db_path=self.db_path)
+                    self._switches[user_id] = switch
+        return switch
+
+    def _each(self, switches: List[SwitchState], action: Callable[[SwitchState], None]):
+        def run(switch: SwitchState):
+            try:
+                action(switch)
+            except Exception as e:
+                logger.error(f"Sweep failed for switch {switch.user_id} ({switch.state}): {str(e)}")
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(switches))) as pool:
+            list(pool.map(run, switches))
+
+    def verify(self, switches: List[SwitchState]):
+        self._each(switches, lambda switch: self.switch_for(switch.user_id).send_life_verification())
+
+    def execute(self, switches: List[SwitchState]):
+        # A switch with deliveries left to retry stays executing and is due
+        # again at its next retry
+        self._each(switches, lambda switch: self.switch_for(switch.user_id).run_protocol())
+
+
+def sweep_all(config_file: str = "config.json", db_path: str = DEFAULT_DB_PATH,
+              batch_size: int = DEFAULT_SWEEP_BATCH) -> SweepResult:
+    """One sweep over every tenant using DeathSwitchAI for both stages"""
+    stages = DeathSwitchStages(config_file, db_path=db_path)
+    return SwitchSweeper(stages.verify, stages.execute, db_path, batch_size).sweep()
@@ -0,0 +1,45 @@
+import os
+import json
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A fresh death switch database (schema created by the pool)"""
+    path = str(tmp_path / "death_switch.db")
+    get_connection(path)
+    return path
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in tmp_path: the system writes its log, viewer files and default databases to the cwd"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def write_config(workdir):
+    """Write a config.json for DeathSwitchAI (SMTP/Twilio point nowhere) and return its path"""
+    def write(**overrides):
+        config = {
+            "email": "owner@example.com",
+            "email_password": "secret",
+            "smtp_server": "127.0.0.1",
+            "smtp_port": 1,
+            "inactivity_days": 10,
+            "verification_hours": 48,
+            "recipients": [{"name": "Alice", "email": "alice@example.com", "phone": "+15550001"}],
+            "documents": [{"name": "Will", "file_path": "will.pdf", "description": "Last will"}],
+        }
+        config.update(overrides)
+        path = workdir / "config.json"
+        path.write_text(json.dumps(config))
+        return str(path)
+    return write
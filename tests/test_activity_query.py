@@ -0,0 +1,59 @@
+from activity_query import ActivityFilter, get_activity_page
+from activity_store import record_activities
+from database import get_connection, transaction
+
+
+def seed(db_path, raw, rollup_days):
+    with transaction(db_path) as conn:
+        record_activities(conn, [
+            ("app_usage", "laptop", None, f"2026-10-{10 + i:02d} 12:00:00") for i in range(raw)
+        ])
+        conn.executemany('''
+            INSERT INTO activity_rollup
+                (day, user_id, device_id, activity_type, activity_count, first_seen, last_seen)
+            VALUES (?, 0, 'laptop', 'app_usage', 3, ?, ?)
+        ''', [(f"2026-06-{10 + i:02d}", f"2026-06-{10 + i:02d} 08:00:00",
+               f"2026-06-{10 + i:02d} 20:00:00") for i in range(rollup_days)])
+
+
+def all_pages(conn, limit):
+    entries, cursor, pages = [], None, 0
+    while True:
+        page, cursor = get_activity_page(conn, ActivityFilter(), limit, cursor)
+        entries.extend(page)
+        pages += 1
+        if cursor is None:
+            return entries, pages
+
+
+def test_pages_are_newest_first_and_complete(db_path):
+    seed(db_path, raw=5, rollup_days=4)
+    entries, pages = all_pages(get_connection(db_path), limit=2)
+
+    assert len(entries) == 9
+    assert pages == 5
+    assert [e.get("summary", False) for e in entries] == [False] * 5 + [True] * 4
+    timestamps = [e["timestamp"] for e in entries]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+
+def test_raw_rows_filling_the_page_exactly_continue_at_first_rollup(db_path):
+    seed(db_path, raw=3, rollup_days=3)
+    conn = get_connection(db_path)
+
+    page, cursor = get_activity_page(conn, ActivityFilter(), 3)
+    assert [e.get("summary", False) for e in page] == [False] * 3
+    assert cursor is not None
+
+    page, cursor = get_activity_page(conn, ActivityFilter(), 3, cursor)
+    assert [e["timestamp"] for e in page] == [
+        "2026-06-12 20:00:00", "2026-06-11 20:00:00", "2026-06-10 20:00:00"
+    ]
+    assert cursor is None
+
+
+def test_last_page_without_rollups_has_no_cursor(db_path):
+    seed(db_path, raw=4, rollup_days=0)
+    page, cursor = get_activity_page(get_connection(db_path), ActivityFilter(), 4)
+    assert len(page) == 4
+    assert cursor is None
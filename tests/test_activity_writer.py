@@ -0,0 +1,46 @@
+import pytest
+
+from activity_store import get_last_seen
+from activity_writer import ActivityWriter
+from database import get_connection, transaction
+from switch_state import ARMED, VERIFYING, get_switch_state, start_verification
+
+
+def test_submit_many_keeps_caller_timestamps(db_path):
+    writer = ActivityWriter(db_path)
+    try:
+        writer.submit_many([
+            ("app_usage", "laptop", "replayed", "2026-01-02 03:04:05"),
+            ("app_usage", "phone", None),
+        ]).result(5)
+    finally:
+        writer.close()
+
+    rows = dict(get_connection(db_path).execute(
+        "SELECT device_id, timestamp FROM activity_log"
+    ).fetchall())
+    assert rows["laptop"] == "2026-01-02 03:04:05"
+    assert rows["phone"] > "2026-01-02 03:04:05"
+    assert str(get_last_seen(get_connection(db_path), "laptop")) == "2026-01-02 03:04:05"
+
+
+def test_backdated_rows_do_not_cancel_a_pending_verification(db_path):
+    writer = ActivityWriter(db_path)
+    try:
+        writer.submit_many([("login", "laptop", None, "2026-01-10 00:00:00")]).result(5)
+        with transaction(db_path) as conn:
+            start_verification(conn, 48)
+
+        writer.submit_many([("app_usage", "phone", "replayed", "2026-01-02 03:04:05")]).result(5)
+        assert get_switch_state(get_connection(db_path)).state == VERIFYING
+
+        writer.submit_many([("login", "laptop", None, "2026-01-10 00:00:01")]).result(5)
+        assert get_switch_state(get_connection(db_path)).state == ARMED
+    finally:
+        writer.close()
+
+
+@pytest.mark.parametrize("timestamp", ["2026-01-02T03:04:05", "2026-1-2 3:04:05", "yesterday"])
+def test_submit_many_rejects_malformed_timestamps(db_path, timestamp):
+    with pytest.raises(ValueError):
+        ActivityWriter(db_path).submit_many([("app_usage", "laptop", None, timestamp)])
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from activity_store import TIMESTAMP_FORMAT
+from database import transaction
+from switch_state import set_thresholds
+
+
+@pytest.fixture
+def client(workdir):
+    from app_backend import app
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+def login(client, username):
+    client.post("/register", data={"username": username, "password": "pw", "confirm": "pw"})
+    return client.post("/login", data={"username": username, "password": "pw"})
+
+
+def test_api_requires_login(client):
+    assert client.get("/status").status_code == 401
+    assert client.get("/").status_code == 302
+    assert client.get("/health").status_code == 200
+
+
+def test_requests_act_on_the_logged_in_users_switch(client):
+    assert login(client, "alice").status_code == 302
+    response = client.post("/add-recipient", json={"name": "Bob", "email": "bob@example.com",
+                                                   "phone": "+15550002"})
+    assert response.status_code == 200
+    assert client.get("/status").get_json()["recipients_count"] == 1
+
+    client.get("/logout")
+    login(client, "carol")
+    assert client.get("/status").get_json()["recipients_count"] == 0
+    assert client.get("/recipients").get_json()["recipients"] == []
+
+
+def test_days_remaining_counts_down_to_the_stored_due_at(client):
+    from app_backend import compute_status
+
+    login(client, "dave")
+    client.post("/record-activity")
+    with client.session_transaction() as session:
+        user_id = session["user_id"]
+    last = (datetime.utcnow() - timedelta(days=3, hours=1)).strftime(TIMESTAMP_FORMAT)
+    with transaction("death_switch.db") as conn:
+        conn.execute("UPDATE last_seen SET last_activity = ? WHERE user_id = ?", (last, user_id))
+        set_thresholds(conn, 10, 48, user_id)
+    assert compute_status(user_id)["days_remaining"] == 7
+
+
+def test_kill_switch_is_refused_once_the_protocol_runs(client):
+    from switch_state import EXECUTING, VERIFYING, transition
+
+    login(client, "erin")
+    with client.session_transaction() as session:
+        user_id = session["user_id"]
+    with transaction("death_switch.db") as conn:
+        transition(conn, VERIFYING, user_id, datetime.utcnow())
+        transition(conn, EXECUTING, user_id)
+
+    response = client.post("/kill-switch", json={"code": "1234"})
+    assert response.status_code == 409
+    assert response.get_json()["switch_state"] == EXECUTING
@@ -0,0 +1,136 @@
+import os
+import sys
+import asyncio
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from smtp_sink import SMTPSink
+from fake_twilio import FakeTwilio
+
+from activity_store import OWNER_USER_ID
+from async_delivery import AsyncNotifier, run_sync
+from database import get_connection, transaction
+from switch_state import DONE, EXECUTING, VERIFYING, transition
+
+UNLIMITED = {"rate": 1e6, "burst": 1e6}
+
+
+@pytest.fixture
+def sink():
+    sink = SMTPSink().start()
+    yield sink
+    sink.stop()
+
+
+@pytest.fixture
+def twilio():
+    twilio = FakeTwilio(invalid_suffix="9999").start()
+    yield twilio
+    twilio.stop()
+
+
+@pytest.fixture
+def switch(write_config, db_path, sink, twilio):
+    """DeathSwitchAI on the asyncio pipeline, talking to the local SMTP sink and fake Twilio"""
+    from death_switch_system import DeathSwitchAI
+
+    def build(**overrides):
+        config_file = write_config(
+            smtp_port=sink.port, smtp_use_tls=False, delivery_async=True, delivery_max_attempts=1,
+            twilio_sid=twilio.account_sid, twilio_token=twilio.auth_token,
+            twilio_phone="+15550000", twilio_api_base=twilio.base_url,
+            rate_limits={"smtp": UNLIMITED, "twilio": UNLIMITED}, **overrides
+        )
+        return DeathSwitchAI(config_file, db_path=db_path)
+    return build
+
+
+def run(notifier, *coros):
+    async def main():
+        try:
+            return await asyncio.gather(*coros)
+        finally:
+            await notifier.close()
+    return asyncio.run(main())
+
+
+def test_emails_share_one_authenticated_session(switch, sink):
+    notifier = AsyncNotifier(switch().notifications)
+    sends = [notifier.send_email(f"r{i}@example.com", "Hello", "Body") for i in range(3)]
+    notifier.smtp.max_sessions = 1
+
+    assert run(notifier, *sends) == [True, True, True]
+    assert sink.messages == 3
+    assert sink.connections == notifier.smtp.connections_opened == 1
+
+
+def test_email_reconnects_after_the_server_drops_the_session(switch, sink):
+    sink.max_per_connection = 1
+    notifier = AsyncNotifier(switch().notifications)
+    notifier.smtp.max_sessions = 1
+
+    async def one_after_another():
+        return [await notifier.send_email("a@example.com", "1", "x"),
+                await notifier.send_email("b@example.com", "2", "x")]
+
+    assert run(notifier, one_after_another()) == [[True, True]]
+    assert sink.messages == 2
+    assert notifier.smtp.reconnects == 1
+
+
+def test_rejected_email_is_reported_as_failed(switch, sink):
+    sink.error_rate = 1.0
+    notifier = AsyncNotifier(switch().notifications)
+    assert run(notifier, notifier.send_email("a@example.com", "Hello", "Body")) == [False]
+    assert sink.messages == 0 and sink.rejected == 1
+
+
+def test_sms_results_carry_twilio_sids_and_errors(switch, twilio):
+    notifier = AsyncNotifier(switch().notifications)
+    sent, invalid = run(notifier, notifier.send_sms_result("+15550001", "hi"),
+                        notifier.send_sms_result("+15559999", "hi"))
+
+    assert sent.success and sent.sid.startswith("SM")
+    assert twilio.messages == [{"From": "+15550000", "To": "+15550001", "Body": "hi"}]
+    assert not invalid.success and invalid.http_status == 400
+    assert invalid.error_code == 21211 and not invalid.retryable
+
+
+def test_twilio_server_errors_are_retryable(switch, twilio):
+    twilio.error_rate = 1.0
+    notifier = AsyncNotifier(switch().notifications)
+    [result] = run(notifier, notifier.send_sms_result("+15550001", "hi"))
+    assert not result.success and result.http_status == 500 and result.retryable
+
+
+def test_twilio_whatsapp_authenticates_over_aiohttp(switch, db_path, twilio):
+    from whatsapp_integration import WhatsAppManager
+
+    ai = switch()
+    config = dict(ai.config, twilio_whatsapp_number="+15550000",
+                  rate_limits={"whatsapp_twilio": UNLIMITED})
+    notifier = AsyncNotifier(ai.notifications, WhatsAppManager(config, db_path))
+
+    assert run(notifier, notifier.send_whatsapp("+15550001", "hi")) == [True]
+    assert twilio.messages == [{"From": "whatsapp:+15550000", "To": "whatsapp:+15550001", "Body": "hi"}]
+
+
+def test_protocol_runs_on_the_async_pipeline(switch, db_path, sink, twilio):
+    ai = switch()
+    with transaction(db_path) as conn:
+        transition(conn, VERIFYING, OWNER_USER_ID, datetime.utcnow())
+        transition(conn, EXECUTING, OWNER_USER_ID)
+
+    try:
+        assert ai.run_protocol()
+    finally:
+        run_sync(ai.async_notifier.close())
+    assert ai.db.get_switch_state().state == DONE
+    assert get_connection(db_path).execute(
+        "SELECT channel, status FROM delivery_outbox ORDER BY id"
+    ).fetchall() == [("email", "sent"), ("sms", "sent")]
+    assert sink.messages == 1
+    assert [message["To"] for message in twilio.messages] == ["+15550001"]
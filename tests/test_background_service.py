@@ -0,0 +1,27 @@
+import threading
+
+import background_service
+from background_service import DeathSwitchDaemon
+
+
+class FakeSwitch:
+    def __init__(self, unfinished):
+        self.unfinished = list(unfinished)
+        self.dispatches = 0
+
+    def dispatch_outbox(self):
+        self.dispatches += 1
+
+    def unfinished_run(self):
+        return self.unfinished.pop(0) if self.unfinished else None
+
+
+def test_drainer_keeps_dispatching_until_the_outbox_is_empty(monkeypatch):
+    monkeypatch.setattr(background_service, "OUTBOX_DISPATCH_INTERVAL", 0)
+    switch = FakeSwitch(["run-1", "run-1"])
+    stopped = threading.Event()
+    stopped.set()
+
+    DeathSwitchDaemon().drain_outbox(switch, stopped)
+
+    assert switch.dispatches == 3
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+
+from activity_store import OWNER_USER_ID, TIMESTAMP_FORMAT
+from config_store import list_recipients, upsert_recipient
+from database import get_connection, transaction
+from delivery_bundle import BundleItem
+from delivery_outbox import next_attempt_at
+from switch_state import DONE, EXECUTING, VERIFYING, transition
+
+
+def test_config_only_seeds_the_switch_on_first_run(write_config, db_path):
+    from death_switch_system import DeathSwitchAI
+
+    config_file = write_config(inactivity_days=5, verification_hours=24)
+    ai = DeathSwitchAI(config_file, db_path=db_path)
+    assert (ai.inactivity_days, ai.verification_hours) == (5, 24)
+    assert [r.name for r in ai.recipients] == ["Alice"]
+
+    # Stored later (another worker, the web UI): a restart must not overwrite it
+    ai.db.set_thresholds(20, 12)
+    with transaction(db_path) as conn:
+        upsert_recipient(conn, {"name": "Bob", "email": "bob@example.com", "phone": "+15550002"})
+    config_file = write_config(inactivity_days=7, recipients=[])
+
+    ai = DeathSwitchAI(config_file, db_path=db_path)
+    assert (ai.inactivity_days, ai.verification_hours) == (20, 12)
+    assert [r.name for r in ai.recipients] == ["Alice", "Bob"]
+
+    assert ai.seed_from_config(force=True)
+    assert ai.db.get_switch_state().inactivity_days == 7
+
+
+def test_recipients_are_read_from_the_instance_database(write_config, db_path, workdir):
+    from death_switch_system import DeathSwitchAI
+
+    other_db = str(workdir / "other.db")
+    DeathSwitchAI(write_config(), db_path=other_db)
+
+    assert list_recipients(get_connection(other_db))
+    assert not list_recipients(get_connection(db_path))
+
+
+def test_document_files_are_bundled_split_and_linked(write_config, db_path, workdir):
+    from death_switch_system import DeathSwitchAI
+
+    (workdir / "secure_docs").mkdir()
+    for name, size in (("a.pdf", 2000), ("b.pdf", 2000), ("big.zip", 50000)):
+        (workdir / "secure_docs" / name).write_bytes(b"x" * size)
+    config_file = write_config(
+        email_attach_documents=True, email_max_attachment_bytes=8000,
+        email_link_threshold_bytes=20000, public_base_url="https://switch.example",
+        documents=[{"name": name, "file_path": f"secure_docs/{name}", "description": name}
+                   for name in ("a.pdf", "b.pdf", "big.zip")]
+    )
+    ai = DeathSwitchAI(config_file, db_path=db_path)
+
+    emails = [job for job in ai.build_protocol_jobs() if job["channel"] == "email"]
+
+    # a.pdf and b.pdf (with their viewers) do not fit one message
+    assert len(emails) > 1
+    for job in emails:
+        item = BundleItem("part", "", job["payload"]["attachments"])
+        assert item.size(link_threshold=20000) <= 8000
+    attached = [path for job in emails for path in job["payload"]["attachments"]]
+    assert [path for path in attached if path.startswith("secure_docs/")] == [
+        "secure_docs/a.pdf", "secure_docs/b.pdf", "secure_docs/big.zip"
+    ]
+    # big.zip is over the link threshold: it takes no space and is sent as a link
+    assert ai.notifications.download_url("secure_docs/big.zip") == \
+        "https://switch.example/documents/big.zip"
+
+
+def executing_switch(write_config, db_path, senders):
+    from death_switch_system import DeathSwitchAI
+
+    ai = DeathSwitchAI(write_config(), db_path=db_path)
+    ai.outbox.senders = senders
+    with transaction(db_path) as conn:
+        transition(conn, VERIFYING, OWNER_USER_ID, datetime.utcnow())
+        transition(conn, EXECUTING, OWNER_USER_ID)
+    return ai
+
+
+def outbox_rows(db_path):
+    return get_connection(db_path).execute(
+        "SELECT channel, status, attempts FROM delivery_outbox ORDER BY id"
+    ).fetchall()
+
+
+def test_protocol_stays_executing_until_failed_deliveries_are_retried(write_config, db_path):
+    sms_results = [RuntimeError("Twilio 503"), "SM123"]
+
+    def send_sms(job):
+        result = sms_results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    ai = executing_switch(write_config, db_path, {"email": lambda job: "<id>", "sms": send_sms})
+
+    assert not ai.run_protocol()
+    switch = ai.db.get_switch_state()
+    assert switch.state == EXECUTING
+    assert outbox_rows(db_path) == [("email", "sent", 1), ("sms", "pending", 1)]
+    retry_at = next_attempt_at(get_connection(db_path))
+    assert switch.due_at == retry_at > datetime.utcnow()
+    assert ai.next_deadline() == retry_at
+
+    # The retry comes due: the monitor resumes the same run instead of starting a new one
+    past = (datetime.utcnow() - timedelta(seconds=1)).strftime(TIMESTAMP_FORMAT)
+    with transaction(db_path) as conn:
+        conn.execute("UPDATE delivery_outbox SET next_attempt_at = ?", (past,))
+        conn.execute("UPDATE switch_state SET due_at = ?", (past,))
+    ai.run_monitoring_cycle()
+
+    assert ai.db.get_switch_state().state == DONE
+    assert outbox_rows(db_path) == [("email", "sent", 1), ("sms", "sent", 2)]
+
+
+def test_finished_run_is_not_sent_again_when_resumed(write_config, db_path):
+    sent = []
+
+    def send(job):
+        sent.append(job)
+        return True
+
+    ai = executing_switch(write_config, db_path, {"email": send, "sms": send})
+    ai.execute_death_protocol()   # Crash before the switch was marked done
+    assert ai.db.get_switch_state().state == EXECUTING
+
+    assert ai.run_protocol()
+    assert ai.db.get_switch_state().state == DONE
+    assert len(sent) == 2
+
+
+def test_other_tenants_never_get_the_config_owners_settings(write_config, db_path):
+    from death_switch_system import DeathSwitchAI
+
+    config_file = write_config(inactivity_days=5, verification_hours=24)
+    DeathSwitchAI(config_file, db_path=db_path)
+    with transaction("users.db") as conn:
+        conn.execute("INSERT INTO users (id, username, password_hash, email) VALUES (7, 'bob', 'x', 'bob@example.com')")
+
+    tenant = DeathSwitchAI(config_file, user_id=7, db_path=db_path)
+    assert not tenant.seed_from_config(force=True)
+    assert tenant.recipients == [] and tenant.documents == []
+    assert (tenant.inactivity_days, tenant.verification_hours) == (10, 48)
+    assert tenant.notify_email == "bob@example.com"
+
+    sent = []
+    tenant.notifications.send_email = lambda to, subject, body: sent.append(to) or True
+    tenant.send_life_verification()
+    assert sent == ["bob@example.com"]
+
+    # A tenant without an account email gets no mail rather than the owner's
+    stranger = DeathSwitchAI(config_file, user_id=8, db_path=db_path)
+    stranger.notifications.send_email = lambda to, subject, body: sent.append(to) or True
+    stranger.send_life_verification()
+    assert stranger.notify_email is None
+    assert sent == ["bob@example.com"]
+
+
+def test_sweep_builds_tenant_switches_from_the_database(write_config, db_path):
+    from switch_sweep import DeathSwitchStages
+
+    stages = DeathSwitchStages(write_config(), db_path=db_path)
+    owner, tenant = stages.switch_for(OWNER_USER_ID), stages.switch_for(7)
+    assert [r.name for r in owner.recipients] == ["Alice"]
+    assert tenant.recipients == []
+    assert not list_recipients(get_connection(db_path), user_id=7)
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from activity_store import TIMESTAMP_FORMAT
+from database import get_connection, transaction
+from delivery_outbox import (OutboxDispatcher, PermanentDeliveryError, backoff_delay,
+                             claim_due_jobs, complete_job, enqueue_jobs, fail_job,
+                             new_run_id, next_attempt_at, outbox_counts, unfinished_run)
+
+
+def enqueue(db_path, channels=("sms",), max_attempts=5):
+    run_id = new_run_id()
+    with transaction(db_path) as conn:
+        enqueue_jobs(conn, run_id, [
+            {"recipient_name": "Alice", "channel": channel, "destination": "+15550001",
+             "payload": {"message": "hi"}}
+            for channel in channels
+        ], max_attempts=max_attempts)
+    return run_id
+
+
+def statuses(db_path):
+    return outbox_counts(get_connection(db_path))
+
+
+def test_permanent_error_fails_the_job_without_retrying(db_path):
+    def send(job):
+        raise PermanentDeliveryError("Twilio credentials not configured")
+
+    enqueue(db_path)
+    report = OutboxDispatcher({"sms": send}, db_path=db_path).dispatch_due()
+
+    assert report.succeeded == 0
+    assert statuses(db_path) == {"failed": 1}
+    assert get_connection(db_path).execute("SELECT attempts FROM delivery_outbox").fetchone()[0] == 1
+
+
+def make_due(db_path):
+    past = (datetime.utcnow() - timedelta(seconds=1)).strftime(TIMESTAMP_FORMAT)
+    with transaction(db_path) as conn:
+        conn.execute("UPDATE delivery_outbox SET next_attempt_at = ?", (past,))
+
+
+def test_enqueue_skips_jobs_already_in_the_run(db_path):
+    job = {"recipient_name": "Alice", "channel": "sms", "destination": "+15550001",
+           "payload": {"message": "hi"}}
+    with transaction(db_path) as conn:
+        assert enqueue_jobs(conn, "run-1", [job]) == 1
+        assert enqueue_jobs(conn, "run-1", [job]) == 0
+        assert enqueue_jobs(conn, "run-2", [job]) == 1
+
+
+def test_backoff_doubles_with_jitter_up_to_the_cap():
+    for attempts, full in ((1, 30), (2, 60), (3, 120), (20, 3600)):
+        assert full / 2 <= backoff_delay(attempts) <= full
+
+
+def test_leased_jobs_are_claimed_again_only_after_the_lease_expires(db_path):
+    enqueue(db_path)
+    with transaction(db_path) as conn:
+        [job] = claim_due_jobs(conn, "worker-a", lease_seconds=300)
+        assert claim_due_jobs(conn, "worker-b") == []
+    assert job.attempts == 1
+
+    # worker-a crashed: once its lease runs out worker-b takes the job over
+    make_due(db_path)
+    with transaction(db_path) as conn:
+        [retaken] = claim_due_jobs(conn, "worker-b")
+        assert retaken.id == job.id and retaken.attempts == 2
+        # ...and the old lease holder can no longer checkpoint it
+        assert not complete_job(conn, job, "worker-a")
+        assert fail_job(conn, job, "worker-a", "late") is None
+        assert complete_job(conn, retaken, "worker-b", "SM1")
+    assert statuses(db_path) == {"sent": 1}
+
+
+def test_failed_jobs_back_off_then_give_up_after_max_attempts(db_path):
+    enqueue(db_path, max_attempts=2)
+    with transaction(db_path) as conn:
+        [job] = claim_due_jobs(conn, "worker")
+        assert fail_job(conn, job, "worker", "503", base_delay=60) == "pending"
+        retry_at = next_attempt_at(conn)
+    assert datetime.utcnow() + timedelta(seconds=29) <= retry_at <= datetime.utcnow() + timedelta(seconds=61)
+    with transaction(db_path) as conn:
+        assert claim_due_jobs(conn, "worker") == []
+
+    make_due(db_path)
+    with transaction(db_path) as conn:
+        [job] = claim_due_jobs(conn, "worker")
+        assert fail_job(conn, job, "worker", "503") == "failed"
+        assert next_attempt_at(conn) is None
+    assert statuses(db_path) == {"failed": 1}
+
+
+def test_dispatcher_resumes_a_run_where_it_left_off(db_path):
+    results = {"email": [RuntimeError("SMTP down"), "<id>"], "sms": ["SM1"]}
+    calls = []
+
+    def sender(channel):
+        def send(job):
+            calls.append(channel)
+            result = results[channel].pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return send
+
+    run_id = enqueue(db_path, channels=("email", "sms"))
+    dispatcher = OutboxDispatcher({"email": sender("email"), "sms": sender("sms")}, db_path=db_path)
+
+    report = dispatcher.dispatch_due()
+    assert report.succeeded == 1
+    assert dispatcher.counts(run_id) == {"pending": 1, "sent": 1}
+    assert unfinished_run(get_connection(db_path)) == run_id
+
+    # Nothing is due until the backoff elapses; then only the failed job is resent
+    assert dispatcher.dispatch_due().results == []
+    make_due(db_path)
+    assert dispatcher.dispatch_due().succeeded == 1
+    assert sorted(calls) == ["email", "email", "sms"]
+    assert dispatcher.counts(run_id) == {"sent": 2}
+    assert unfinished_run(get_connection(db_path)) is None
+    assert get_connection(db_path).execute(
+        "SELECT message_id FROM delivery_outbox ORDER BY id"
+    ).fetchall() == [("<id>",), ("SM1",)]
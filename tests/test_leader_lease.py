@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from database import transaction
+from leader_lease import LeaderLease, LeaseLost, check_fencing, monitor_lease_name
+from switch_state import EXECUTING, VERIFYING, start_verification
+
+NAME = monitor_lease_name(0)
+
+
+def expire(db_path):
+    with transaction(db_path) as conn:
+        conn.execute("UPDATE leader_leases SET expires_at = 0 WHERE name = ?", (NAME,))
+
+
+def test_only_one_holder_until_the_lease_expires(db_path):
+    a = LeaderLease(NAME, db_path, holder="a")
+    b = LeaderLease(NAME, db_path, holder="b")
+
+    assert a.try_acquire() == 1
+    assert b.try_acquire() is None
+    # Re-acquiring our own lease keeps the token
+    assert a.try_acquire() == 1
+    assert a.current()["holder"] == "a"
+
+    expire(db_path)
+    assert b.try_acquire() == 2
+    assert not a.renew()
+    assert a.try_acquire() is None
+    assert b.current()["holder"] == "b" and not b.current()["expired"]
+
+
+def test_release_hands_over_at_once(db_path):
+    a = LeaderLease(NAME, db_path, holder="a")
+    b = LeaderLease(NAME, db_path, holder="b")
+    a.try_acquire()
+    a.release()
+    assert b.wait_until_leader() == 2
+
+
+def test_stale_fencing_token_is_rejected(db_path):
+    a = LeaderLease(NAME, db_path, holder="a")
+    b = LeaderLease(NAME, db_path, holder="b")
+    a.try_acquire()
+    expire(db_path)
+
+    with transaction(db_path) as conn:
+        # Expired and not yet taken over: still not safe to act on
+        with pytest.raises(LeaseLost):
+            check_fencing(conn, NAME, 1)
+    b.try_acquire()
+    with transaction(db_path) as conn:
+        with pytest.raises(LeaseLost):
+            check_fencing(conn, NAME, 1)
+        check_fencing(conn, NAME, 2)
+
+
+def test_keep_alive_reports_a_lost_lease(db_path):
+    a = LeaderLease(NAME, db_path, ttl=0.3, holder="a")
+    a.try_acquire()
+    lost = threading.Event()
+    a.keep_alive(lost.set)
+    assert a.is_leader
+
+    expire(db_path)
+    LeaderLease(NAME, db_path, holder="b").try_acquire()
+    assert lost.wait(2)
+    assert not a.is_leader
+
+
+def test_paused_leader_cannot_move_the_switch(write_config, db_path):
+    from death_switch_system import DeathSwitchAI
+
+    ai = DeathSwitchAI(write_config(), db_path=db_path)
+    with transaction(db_path) as conn:
+        start_verification(conn, 48)
+    a = LeaderLease(NAME, db_path, holder="a")
+    ai.db.fence = (NAME, a.try_acquire())
+
+    # a stalls past its lease; b is elected and fences it out
+    expire(db_path)
+    LeaderLease(NAME, db_path, holder="b").try_acquire()
+    with pytest.raises(LeaseLost):
+        ai.db.transition(EXECUTING)
+    assert ai.db.get_switch_state().state == VERIFYING
@@ -0,0 +1,34 @@
+import re
+from email import message_from_bytes
+from email.header import decode_header, make_header
+
+from mime_stream import StreamingMessage
+
+HINDI_SUBJECT = "💙 महत्वपूर्ण दस्तावेज़ - सुरक्षा का अंतिम उपहार"
+
+
+def stream(msg):
+    return b"".join(msg.chunks())
+
+
+def decoded(value):
+    return str(make_header(decode_header(value)))
+
+
+def test_localized_subject_is_folded_with_crlf_only(tmp_path):
+    (tmp_path / "will.pdf").write_bytes(b"x" * 5000)
+    msg = StreamingMessage("owner@example.com", ["alice@example.com"], HINDI_SUBJECT,
+                           "नमस्ते", [str(tmp_path / "will.pdf")])
+
+    data = stream(msg)
+    assert re.search(rb"(?<!\r)\n", data) is None
+    assert decoded(message_from_bytes(data)["Subject"]) == HINDI_SUBJECT
+
+
+def test_non_ascii_display_names_are_encoded():
+    msg = StreamingMessage("Zoë Owner <owner@example.com>",
+                           ["Ravi Kumar <ravi@example.com>", "अनु <anu@example.com>"], "Hello", "Body")
+
+    parsed = message_from_bytes(stream(msg))
+    assert decoded(parsed["From"]) == "Zoë Owner <owner@example.com>"
+    assert decoded(parsed["To"]) == "Ravi Kumar <ravi@example.com>, अनु <anu@example.com>"
@@ -0,0 +1,86 @@
+import types
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, RateLimitTimeout, get_rate_limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen time.time() for the limiter; sleeps advance it"""
+    clock = types.SimpleNamespace(now=1000.0)
+    clock.time = lambda: clock.now
+    clock.sleep = lambda seconds: setattr(clock, "now", clock.now + seconds)
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+def test_burst_is_free_then_waits_line_up(db_path, clock):
+    limiter = RateLimiter("smtp:a", rate=2, burst=3, db_path=db_path)
+    assert [limiter.reserve() for _ in range(5)] == [0, 0, 0, 0.5, 1.0]
+
+
+def test_tokens_refill_up_to_the_burst(db_path, clock):
+    limiter = RateLimiter("smtp:a", rate=2, burst=3, db_path=db_path)
+    for _ in range(3):
+        limiter.reserve()
+    clock.now += 1
+    assert [limiter.reserve() for _ in range(3)] == [0, 0, 0.5]
+
+    clock.now += 3600
+    assert [limiter.reserve() for _ in range(4)] == [0, 0, 0, 0.5]
+
+
+def test_acquire_sleeps_off_the_wait(db_path, clock):
+    limiter = RateLimiter("twilio:+1555", rate=1, burst=1, db_path=db_path)
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == 1.0
+    assert clock.now == 1001.0
+    assert limiter.acquire() == 1.0
+
+
+def test_bucket_is_shared_between_processes(db_path, clock):
+    # Two limiters on one bucket stand in for two worker processes
+    first = RateLimiter("smtp:a", rate=1, burst=2, db_path=db_path)
+    second = RateLimiter("smtp:a", rate=1, burst=2, db_path=db_path)
+    assert (first.reserve(), second.reserve(), first.reserve()) == (0, 0, 1.0)
+    assert RateLimiter("smtp:b", rate=1, burst=2, db_path=db_path).reserve() == 0
+
+
+def test_too_long_a_wait_times_out_without_reserving(db_path, clock):
+    limiter = RateLimiter("smtp:a", rate=1, burst=1, db_path=db_path, max_wait=2)
+    limiter.reserve()
+    limiter.reserve()
+    with pytest.raises(RateLimitTimeout):
+        limiter.reserve(tokens=2)
+    assert limiter.reserve() == 2.0
+
+
+def test_stats_count_waits(db_path, clock):
+    limiter = RateLimiter("smtp:a", rate=2, burst=1, db_path=db_path)
+    for _ in range(3):
+        limiter.reserve()
+    stats = limiter.stats()
+    assert (stats["acquired"], stats["waited"]) == (3, 2)
+    assert stats["max_wait_seconds"] == 1.0
+    assert stats["total_wait_seconds"] == 1.5
+
+
+def test_get_rate_limiter_applies_configured_limits(db_path):
+    limiter = get_rate_limiter("smtp", "me@example.com", db_path=db_path)
+    assert (limiter.config.rate, limiter.config.burst) == (1.0, 5)
+    assert limiter.bucket == "smtp:me@example.com"
+
+    same = get_rate_limiter("smtp", "me@example.com", {"smtp": {"rate": 0.5, "burst": 2}}, db_path)
+    assert same is limiter
+    assert (limiter.config.rate, limiter.config.burst) == (0.5, 2)
+
+
+def test_switch_rate_limits_against_its_own_database(write_config, db_path):
+    from death_switch_system import DeathSwitchAI
+
+    notifications = DeathSwitchAI(write_config(twilio_sid="ACx", twilio_token="t", twilio_phone="+1555"),
+                                  db_path=db_path).notifications
+    assert notifications.email_limiter.db_path == db_path
+    assert notifications.sms_transport.limiter.db_path == db_path
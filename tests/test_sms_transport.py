@@ -0,0 +1,20 @@
+import pytest
+
+from sms_transport import SMSResult
+
+
+@pytest.mark.parametrize("http_status, retryable", [
+    (None, True),    # Network error
+    (429, True),
+    (503, True),
+    (400, False),    # Invalid number
+    (401, False),    # Bad credentials
+])
+def test_only_transient_twilio_errors_are_retryable(http_status, retryable):
+    assert SMSResult("+15550001", False, http_status=http_status).retryable is retryable
+
+
+def test_missing_credentials_are_not_retryable():
+    result = SMSResult("+15550001", False, error_message="Twilio credentials not configured",
+                       permanent=True)
+    assert not result.retryable
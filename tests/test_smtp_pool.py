@@ -0,0 +1,18 @@
+from smtp_pool import get_smtp_pool
+
+
+def test_pools_are_shared_only_with_identical_settings():
+    pool = get_smtp_pool("smtp.test", 2525, "me@example.com", "secret", use_tls=True, max_sessions=4)
+    assert get_smtp_pool("smtp.test", 2525, "me@example.com", "secret",
+                         use_tls=True, max_sessions=4) is pool
+
+    plain = get_smtp_pool("smtp.test", 2525, "me@example.com", "secret", use_tls=False, max_sessions=4)
+    wider = get_smtp_pool("smtp.test", 2525, "me@example.com", "secret", use_tls=True, max_sessions=8)
+    assert (plain.use_tls, wider.max_sessions) == (False, 8)
+    assert len({id(pool), id(plain), id(wider)}) == 3
+
+
+def test_new_password_replaces_the_pool():
+    pool = get_smtp_pool("smtp.test", 2526, "me@example.com", "old")
+    renewed = get_smtp_pool("smtp.test", 2526, "me@example.com", "new")
+    assert renewed is not pool and renewed.password == "new"
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from activity_store import TIMESTAMP_FORMAT, record_activities
+from database import get_connection, transaction
+from switch_state import (ARMED, DISABLED, DONE, EXECUTING, VERIFYING, InvalidTransition,
+                          cancel_verifications, claim_due_switches, claim_execution,
+                          get_switch_state, postpone_execution, refresh_due_at,
+                          set_thresholds, start_verification, transition)
+
+
+def stamp(moment):
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def record_activity(db_path, user_id, when):
+    with transaction(db_path) as conn:
+        record_activities(conn, [("login", "laptop", None, stamp(when))], user_id=user_id)
+        cancel_verifications(conn, [user_id])
+        refresh_due_at(conn, [user_id])
+
+
+def state(db_path, user_id=0):
+    return get_switch_state(get_connection(db_path), user_id)
+
+
+def test_switch_without_a_row_is_armed_with_default_thresholds(db_path):
+    switch = state(db_path, 5)
+    assert (switch.state, switch.due_at) == (ARMED, None)
+    assert (switch.inactivity_days, switch.verification_hours) == (10, 48)
+
+
+def test_armed_due_at_follows_activity_and_thresholds(db_path):
+    seen = datetime(2026, 1, 1, 12, 0, 0)
+    record_activity(db_path, 0, seen)
+    assert state(db_path).due_at == seen + timedelta(days=10)
+
+    with transaction(db_path) as conn:
+        set_thresholds(conn, 2.5, 24)
+    assert state(db_path).due_at == seen + timedelta(days=2.5)
+
+
+def test_lifecycle_transitions_are_compare_and_set(db_path):
+    with transaction(db_path) as conn:
+        deadline = start_verification(conn, 48)
+        # A second worker racing on the same switch loses
+        assert start_verification(conn, 48) is None
+    switch = state(db_path)
+    assert switch.state == VERIFYING
+    assert switch.verification_deadline == switch.due_at == deadline
+
+    with transaction(db_path) as conn:
+        assert not transition(conn, DONE)
+        assert transition(conn, EXECUTING)
+        assert not transition(conn, EXECUTING)
+        # The kill switch cannot stop a protocol that is already running
+        assert not transition(conn, DISABLED)
+        assert transition(conn, DONE)
+    switch = state(db_path)
+    assert (switch.state, switch.due_at) == (DONE, None)
+    assert switch.executing_at and switch.done_at
+
+
+def test_transition_rejects_unreachable_source_states(db_path):
+    with transaction(db_path) as conn:
+        with pytest.raises(InvalidTransition):
+            transition(conn, EXECUTING, from_states=(ARMED,))
+
+
+def test_new_activity_cancels_a_pending_verification(db_path):
+    with transaction(db_path) as conn:
+        start_verification(conn, 48)
+    now = datetime.utcnow().replace(microsecond=0)
+    record_activity(db_path, 0, now)
+
+    switch = state(db_path)
+    assert switch.state == ARMED
+    assert switch.verification_deadline is None
+    assert switch.due_at == now + timedelta(days=10)
+
+
+def test_expired_execution_lease_is_claimed_once(db_path):
+    with transaction(db_path) as conn:
+        start_verification(conn, 48)
+        transition(conn, EXECUTING)
+        # Its worker is alive (lease running): nobody else may take it over
+        assert not claim_execution(conn)
+
+        conn.execute("UPDATE switch_state SET due_at = ?",
+                     (stamp(datetime.utcnow() - timedelta(seconds=1)),))
+        assert claim_execution(conn)
+        assert not claim_execution(conn)
+    assert state(db_path).due_at > datetime.utcnow()
+
+
+def test_postpone_only_applies_to_executing_switches(db_path):
+    retry_at = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=5)
+    with transaction(db_path) as conn:
+        start_verification(conn, 48)
+        assert not postpone_execution(conn, retry_at)
+        transition(conn, EXECUTING)
+        assert postpone_execution(conn, retry_at)
+    assert (state(db_path).state, state(db_path).due_at) == (EXECUTING, retry_at)
+
+
+def put_switch(db_path, user_id, switch_state, due_at, executing_at=None):
+    with transaction(db_path) as conn:
+        conn.execute('''
+            INSERT INTO switch_state (user_id, state, due_at, verification_hours, executing_at)
+            VALUES (?, ?, ?, 24, ?)
+        ''', (user_id, switch_state, stamp(due_at), executing_at and stamp(executing_at)))
+
+
+def test_claim_due_switches_advances_each_due_switch_once(db_path):
+    now = datetime(2026, 3, 1, 9, 0, 0)
+    started = now - timedelta(hours=2)
+    put_switch(db_path, 1, ARMED, now - timedelta(minutes=1))
+    put_switch(db_path, 2, ARMED, now + timedelta(minutes=1))
+    put_switch(db_path, 3, VERIFYING, now)
+    put_switch(db_path, 4, EXECUTING, now - timedelta(minutes=1), executing_at=started)
+    put_switch(db_path, 5, EXECUTING, now + timedelta(minutes=30), executing_at=started)
+    put_switch(db_path, 6, DONE, now - timedelta(days=1))
+
+    with transaction(db_path) as conn:
+        claimed = claim_due_switches(conn, now)
+    assert [switch.user_id for switch in claimed['verify']] == [1]
+    assert sorted(switch.user_id for switch in claimed['execute']) == [3, 4]
+
+    [verifying] = claimed['verify']
+    assert verifying.state == VERIFYING
+    assert verifying.verification_deadline == verifying.due_at == now + timedelta(hours=24)
+    executing = {switch.user_id: switch for switch in claimed['execute']}
+    assert executing[3].executing_at == now and executing[3].verification_deadline is None
+    # A resumed run keeps the time its execution started
+    assert executing[4].executing_at == started
+    assert all(switch.due_at > now for switch in executing.values())
+
+    with transaction(db_path) as conn:
+        assert claim_due_switches(conn, now) == {'verify': [], 'execute': []}
+    assert [state(db_path, user_id).state for user_id in (2, 5, 6)] == [ARMED, EXECUTING, DONE]
+
+
+def test_claim_due_switches_takes_the_oldest_first_up_to_the_limit(db_path):
+    now = datetime(2026, 3, 1, 9, 0, 0)
+    for user_id in range(1, 6):
+        put_switch(db_path, user_id, ARMED, now - timedelta(minutes=user_id))
+
+    with transaction(db_path) as conn:
+        claimed = claim_due_switches(conn, now, limit=2)
+    assert sorted(switch.user_id for switch in claimed['verify']) == [4, 5]
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from activity_store import TIMESTAMP_FORMAT
+from database import get_connection, transaction
+from switch_state import EXECUTING, VERIFYING, get_switch_state
+from switch_sweep import SwitchSweeper
+
+
+def due_switches(db_path, count):
+    past = (datetime.utcnow() - timedelta(minutes=1)).strftime(TIMESTAMP_FORMAT)
+    with transaction(db_path) as conn:
+        conn.executemany("INSERT INTO switch_state (user_id, state, due_at) VALUES (?, 'armed', ?)",
+                         [(user_id, past) for user_id in range(1, count + 1)])
+
+
+def test_sweep_drains_every_due_switch_in_batches(db_path):
+    due_switches(db_path, 5)
+    verified = []
+    sweeper = SwitchSweeper(lambda batch: verified.extend(s.user_id for s in batch),
+                            lambda batch: None, db_path, batch_size=2)
+
+    result = sweeper.sweep()
+    assert sorted(verified) == sorted(result.verifying) == [1, 2, 3, 4, 5]
+    assert result.batches == 3
+    assert sweeper.sweep().batches == 0
+
+
+def test_failed_stage_leaves_its_batch_claimed(db_path):
+    due_switches(db_path, 2)
+
+    def verify(batch):
+        raise RuntimeError("SMTP down")
+
+    result = SwitchSweeper(verify, lambda batch: None, db_path).sweep()
+    assert result.verifying == []
+    # Not re-sent on the next sweep; the verification deadline still runs
+    conn = get_connection(db_path)
+    assert [get_switch_state(conn, user_id).state for user_id in (1, 2)] == [VERIFYING, VERIFYING]
+
+
+def test_passed_deadlines_are_handed_to_the_execute_stage(db_path):
+    past = (datetime.utcnow() - timedelta(minutes=1)).strftime(TIMESTAMP_FORMAT)
+    with transaction(db_path) as conn:
+        conn.execute("INSERT INTO switch_state (user_id, state, due_at) VALUES (3, 'verifying', ?)", (past,))
+    executed = []
+
+    result = SwitchSweeper(lambda batch: None, executed.extend, db_path).sweep()
+    assert [switch.user_id for switch in executed] == result.executing == [3]
+    assert executed[0].state == EXECUTING
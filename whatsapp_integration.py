@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+WhatsApp Integration for Digital Death Switch AI
+Supports multiple WhatsApp APIs and fallback methods, routing each message
+to the healthiest provider and skipping providers whose circuit is open
+"""
+
+import json
+import requests
+import time
+import os
+import sys
+import logging
+import threading
+from collections import deque
+from typing import List, Dict, Optional
+import base64
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from rate_limiter import get_rate_limiter, RateLimitTimeout
+from database import DEFAULT_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# Static preference, used to break ties and before any latency is known
+DEFAULT_PROVIDER_ORDER = ['business_api', 'twilio', 'web_api', 'baileys']
+
+DEFAULT_TIMEOUT = 10               # Seconds per provider request
+DEFAULT_POOL_SIZE = 8              # Keep-alive connections per provider
+FAILURE_THRESHOLD = 3              # Consecutive failures that open the circuit
+ERROR_RATE_THRESHOLD = 0.5         # ...or this error rate over the window
+HEALTH_WINDOW = 20                 # Outcomes kept per provider
+MIN_WINDOW_SAMPLES = 5
+OPEN_SECONDS = 30                  # First cool-down; doubles while the provider keeps failing
+MAX_OPEN_SECONDS = 300
+UNKNOWN_LATENCY = 1.0              # Assumed latency of a provider with no samples
+LATENCY_ALPHA = 0.2                # EWMA smoothing
+
+
+class ProviderHealth:
+    """Latency/error tracking and circuit breaker for one provider.
+
+    closed    - requests flow, outcomes are recorded
+    open      - requests are skipped until the cool-down ends
+    half_open - one trial request decides whether to close or re-open
+    """
+
+    def __init__(self, name: str, priority: int):
+        self.name = name
+        self.priority = priority
+        self.state = 'closed'
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ewma_latency = None
+        self.last_error = None
+        self.opened_count = 0
+        self.open_until = 0.0
+        self._open_seconds = OPEN_SECONDS
+        self._window = deque(maxlen=HEALTH_WINDOW)
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def error_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        return self._window.count(False) / len(self._window)
+
+    def expected_cost(self) -> float:
+        """Expected seconds to a successful send; lower routes first"""
+        latency = self.ewma_latency if self.ewma_latency is not None else UNKNOWN_LATENCY
+        return latency / max(0.05, 1.0 - self.error_rate)
+
+    def allow_request(self) -> bool:
+        """Whether a message may be sent now (claims the half-open trial slot)"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() >= self.open_until:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def cancel_request(self):
+        """Give back a claimed half-open trial that was never sent"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _observe(self, success: bool, latency: float):
+        self.requests += 1
+        self._window.append(success)
+        self.ewma_latency = latency if self.ewma_latency is None else (
+            LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.ewma_latency
+        )
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._observe(True, latency)
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+            if self.state != 'closed':
+                logger.info(f"WhatsApp provider {self.name} recovered, closing circuit")
+            self.state = 'closed'
+            self._open_seconds = OPEN_SECONDS
+
+    def record_failure(self, latency: float, error: str):
+        with self._lock:
+            self._observe(False, latency)
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = error
+            trial_failed = self.state == 'half_open'
+            self._trial_in_flight = False
+
+            tripped = self.consecutive_failures >= FAILURE_THRESHOLD or (
+                len(self._window) >= MIN_WINDOW_SAMPLES and self.error_rate >= ERROR_RATE_THRESHOLD
+            )
+            if trial_failed or (self.state == 'closed' and tripped):
+                if trial_failed:
+                    self._open_seconds = min(MAX_OPEN_SECONDS, self._open_seconds * 2)
+                self.state = 'open'
+                self.open_until = time.monotonic() + self._open_seconds
+                self.opened_count += 1
+                logger.warning(f"WhatsApp provider {self.name} circuit open for "
+                               f"{self._open_seconds}s: {error}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "requests": self.requests,
+                "successes": self.successes,
+                "failures": self.failures,
+                "error_rate": round(self.error_rate, 3),
+                "ewma_latency_ms": round(self.ewma_latency * 1000, 1)
+                if self.ewma_latency is not None else None,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.opened_count,
+                "open_for_seconds": round(max(0.0, self.open_until - time.monotonic()), 1)
+                if self.state == 'open' else 0.0,
+                "last_error": self.last_error
+            }
+
+
+class WhatsAppManager:
+    """Handles WhatsApp message sending via multiple providers"""
+
+    def __init__(self, config: Dict, db_path: str = DEFAULT_DB_PATH):
+        self.config = config
+        self.db_path = db_path
+        self.setup_providers()
+
+    def setup_providers(self):
+        """Setup available WhatsApp providers"""
+        self.providers = {}
+
+        # Twilio WhatsApp Business API
+        if all(key in self.config for key in ['twilio_sid', 'twilio_token', 'twilio_whatsapp_number']):
+            self.providers['twilio'] = TwilioWhatsApp(self.config)
+
+        # WhatsApp Business API (Official)
+        if 'whatsapp_business_token' in self.config:
+            self.providers['business_api'] = WhatsAppBusinessAPI(self.config)
+
+        # WhatsApp Web API (Third-party)
+        if 'whatsapp_web_api_url' in self.config:
+            self.providers['web_api'] = WhatsAppWebAPI(self.config)
+
+        # Baileys (JavaScript WhatsApp Web)
+        if 'baileys_api_url' in self.config:
+            self.providers['baileys'] = BaileysAPI(self.config)
+
+        provider_order = self.config.get('whatsapp_provider_order', DEFAULT_PROVIDER_ORDER)
+        self.health = {
+            name: ProviderHealth(name, provider_order.index(name) if name in provider_order else len(provider_order))
+            for name in self.providers
+        }
+        # Each provider account has its own send-rate budget, shared by every worker
+        self.limiters = {
+            name: get_rate_limiter(f"whatsapp_{name}", provider.account, self.config.get('rate_limits'),
+                                   self.db_path)
+            for name, provider in self.providers.items()
+        }
+
+        logger.info(f"Initialized {len(self.providers)} WhatsApp providers: {list(self.providers.keys())}")
+
+    def ranked_providers(self) -> List[str]:
+        """Providers by expected cost (latency / success rate), then static order"""
+        return [h.name for h in sorted(self.health.values(),
+                                       key=lambda h: (h.expected_cost(), h.priority))]
+
+    def route(self):
+        """Yield providers to try, healthiest first, skipping open circuits.
+
+        The breaker is asked only when a provider is reached, so a half-open
+        trial is never claimed by a provider that does not get the message.
+        """
+        tried = False
+        for name in self.ranked_providers():
+            if self.health[name].allow_request():
+                tried = True
+                yield name
+        if not tried and self.health:
+            # Every circuit is open: probe the one whose cool-down ends first
+            # rather than dropping the message
+            yield min(self.health.values(), key=lambda h: h.open_until).name
+
+    def send_message(self, phone_number: str, message: str, attachments: List[str] = None) -> bool:
+        """Send WhatsApp message using available providers (with fallback)"""
+
+        # Clean phone number
+        phone_number = self.clean_phone_number(phone_number)
+
+        # Try providers from healthiest to least healthy
+        for provider_name in self.route():
+            provider = self.providers[provider_name]
+            health = self.health[provider_name]
+            try:
+                self.limiters[provider_name].acquire()
+            except RateLimitTimeout as e:
+                # Saturated, not unhealthy: leave its breaker alone and fall back
+                health.cancel_request()
+                logger.warning(f"Skipping {provider_name}: {str(e)}")
+                continue
+            start = time.perf_counter()
+            try:
+                logger.info(f"Attempting WhatsApp send via {provider_name}")
+
+                if attachments:
+                    success = provider.send_message_with_attachments(phone_number, message, attachments)
+                else:
+                    success = provider.send_message(phone_number, message)
+
+                if success:
+                    health.record_success(time.perf_counter() - start)
+                    logger.info(f"✅ WhatsApp message sent successfully via {provider_name}")
+                    return True
+                else:
+                    health.record_failure(time.perf_counter() - start, provider.last_error or "send failed")
+                    logger.warning(f"❌ Failed to send via {provider_name}")
+
+            except Exception as e:
+                health.record_failure(time.perf_counter() - start, str(e))
+                logger.error(f"❌ Error with {provider_name}: {str(e)}")
+
+        logger.error(f"All WhatsApp providers failed for {phone_number}")
+        return False
+
+    async def send_message_async(self, phone_number: str, message: str, post) -> bool:
+        """Text-only send_message for coroutines, with the same routing, breakers
+        and rate limits; post(provider, request) awaits the HTTP call and
+        returns (success, error)"""
+        phone_number = self.clean_phone_number(phone_number)
+
+        for provider_name in self.route():
+            provider = self.providers[provider_name]
+            health = self.health[provider_name]
+            try:
+                await self.limiters[provider_name].acquire_async()
+            except RateLimitTimeout as e:
+                health.cancel_request()
+                logger.warning(f"Skipping {provider_name}: {str(e)}")
+                continue
+            start = time.perf_counter()
+            try:
+                success, error = await post(provider, provider.text_request(phone_number, message))
+                if success:
+                    health.record_success(time.perf_counter() - start)
+                    logger.info(f"✅ WhatsApp message sent successfully via {provider_name}")
+                    return True
+                health.record_failure(time.perf_counter() - start, error or "send failed")
+                logger.warning(f"❌ Failed to send via {provider_name}: {error}")
+            except Exception as e:
+                health.record_failure(time.perf_counter() - start, str(e))
+                logger.error(f"❌ Error with {provider_name}: {str(e)}")
+
+        logger.error(f"All WhatsApp providers failed for {phone_number}")
+        return False
+
+    def clean_phone_number(self, phone_number: str) -> str:
+        """Normalize to E.164 (+<country code><number>)"""
+        digits = ''.join(c for c in phone_number if c.isdigit())
+        if phone_number.strip().startswith('00'):
+            digits = digits[2:]
+        return f"+{digits}"
+
+    def get_stats(self) -> Dict:
+        """Per-provider health, latency and circuit state for monitoring"""
+        return {
+            "route": self.ranked_providers(),
+            "providers": {name: health.stats() for name, health in self.health.items()},
+            "rate_limits": {name: limiter.stats() for name, limiter in self.limiters.items()}
+        }
+
+    def close(self):
+        for provider in self.providers.values():
+            provider.close()
+
+
+class WhatsAppProvider:
+    """Base class: a pooled keep-alive requests.Session per provider"""
+
+    name = 'provider'
+
+    def __init__(self, config: Dict):
+        self.account = ''                       # Sender identity the rate limit applies to
+        self.config = config
+        self.timeout = config.get('whatsapp_timeout', DEFAULT_TIMEOUT)
+        self.last_error = None
+        self.session = requests.Session()
+        # Integer max_retries only retries failed connects, never a sent request
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=config.get('whatsapp_pool_size', DEFAULT_POOL_SIZE),
+                              max_retries=1)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _check(self, response: requests.Response) -> bool:
+        """True on 2xx; otherwise remember the provider's error"""
+        if response.ok:
+            self.last_error = None
+            return True
+        self.last_error = f"HTTP {response.status_code}: {response.text[:200]}"
+        logger.warning(f"{self.name} rejected message: {self.last_error}")
+        return False
+
+    def text_request(self, phone_number: str, message: str) -> Dict:
+        """url plus json or data of a text message (shared by sync and async sends)"""
+        raise NotImplementedError
+
+    def send_message(self, phone_number: str, message: str) -> bool:
+        return self._check(self.session.post(timeout=self.timeout,
+                                              **self.text_request(phone_number, message)))
+
+    def send_message_with_attachments(self, phone_number: str, message: str,
+                                      attachments: List[str]) -> bool:
+        """Default: the text, followed by each attachment's file name"""
+        names = [os.path.basename(a) for a in attachments]
+        return self.send_message(phone_number, f"{message}\n\n📎 {', '.join(names)}")
+
+    def close(self):
+        self.session.close()
+
+
+class TwilioWhatsApp(WhatsAppProvider):
+    """Twilio Messages API with whatsapp: addresses"""
+
+    name = 'twilio'
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        base_url = config.get('twilio_api_base', 'https://api.twilio.com').rstrip('/')
+        self.url = f"{base_url}/2010-04-01/Accounts/{config['twilio_sid']}/Messages.json"
+        self.session.auth = (config['twilio_sid'], config['twilio_token'])
+        self.from_number = config['twilio_whatsapp_number']
+        self.account = f"{config['twilio_sid']}:{self.from_number}"
+
+    def text_request(self, phone_number: str, message: str) -> Dict:
+        return {'url': self.url, 'data': {
+            'From': f"whatsapp:{self.from_number}",
+            'To': f"whatsapp:{phone_number}",
+            'Body': message
+        }}
+
+    def _post(self, phone_number: str, message: str, media_url: str = None) -> bool:
+        request = self.text_request(phone_number, message)
+        if media_url:
+            request['data']['MediaUrl'] = media_url
+        return self._check(self.session.post(timeout=self.timeout, **request))
+
+    def send_message_with_attachments(self, phone_number: str, message: str,
+                                      attachments: List[str]) -> bool:
+        # Twilio fetches media itself, so only public URLs can be attached
+        urls = [a for a in attachments if a.startswith(('http://', 'https://'))]
+        local = [a for a in attachments if a not in urls]
+        if local:
+            message = f"{message}\n\n📎 {', '.join(os.path.basename(a) for a in local)}"
+        if not self._post(phone_number, message, urls[0] if urls else None):
+            return False
+        return all(self._post(phone_number, '', url) for url in urls[1:])
+
+
+class WhatsAppBusinessAPI(WhatsAppProvider):
+    """Official WhatsApp Cloud API (graph.facebook.com)"""
+
+    name = 'business_api'
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        base_url = config.get('whatsapp_business_api_base', 'https://graph.facebook.com/v18.0').rstrip('/')
+        self.url = f"{base_url}/{config.get('whatsapp_phone_number_id', '')}"
+        self.account = config.get('whatsapp_phone_number_id', '')
+        self.session.headers['Authorization'] = f"Bearer {config['whatsapp_business_token']}"
+
+    def text_request(self, phone_number: str, message: str) -> Dict:
+        return {'url': f"{self.url}/messages", 'json': {
+            'messaging_product': 'whatsapp',
+            'to': phone_number.lstrip('+'),
+            'type': 'text',
+            'text': {'body': message}
+        }}
+
+    def _upload(self, file_path: str) -> Optional[str]:
+        """Upload a local file as WhatsApp media; returns the media id"""
+        with open(file_path, 'rb') as f:
+            response = self.session.post(
+                f"{self.url}/media",
+                data={'messaging_product': 'whatsapp'},
+                files={'file': (os.path.basename(file_path), f, 'application/octet-stream')},
+                timeout=self.timeout
+            )
+        if not self._check(response):
+            return None
+        return response.json().get('id')
+
+    def send_message_with_attachments(self, phone_number: str, message: str,
+                                      attachments: List[str]) -> bool:
+        if not self.send_message(phone_number, message):
+            return False
+        for file_path in attachments:
+            if not os.path.exists(file_path):
+                continue
+            media_id = self._upload(file_path)
+            if not media_id:
+                return False
+            payload = {
+                'messaging_product': 'whatsapp',
+                'to': phone_number.lstrip('+'),
+                'type': 'document',
+                'document': {'id': media_id, 'filename': os.path.basename(file_path)}
+            }
+            if not self._check(self.session.post(f"{self.url}/messages", json=payload,
+                                                 timeout=self.timeout)):
+                return False
+        return True
+
+
+class WhatsAppWebAPI(WhatsAppProvider):
+    """Self-hosted WhatsApp Web gateway exposing /send-message and /send-file"""
+
+    name = 'web_api'
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        self.url = config['whatsapp_web_api_url'].rstrip('/')
+        self.account = self.url
+        if config.get('whatsapp_web_api_key'):
+            self.session.headers['Authorization'] = f"Bearer {config['whatsapp_web_api_key']}"
+
+    def text_request(self, phone_number: str, message: str) -> Dict:
+        return {'url': f"{self.url}/send-message",
+                'json': {'phone': phone_number, 'message': message}}
+
+    def send_message_with_attachments(self, phone_number: str, message: str,
+                                      attachments: List[str]) -> bool:
+        if not self.send_message(phone_number, message):
+            return False
+        for file_path in attachments:
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, 'rb') as f:
+                if not self._check(self.session.post(
+                    f"{self.url}/send-file",
+                    data={'phone': phone_number},
+                    files={'file': (os.path.basename(file_path), f)},
+                    timeout=self.timeout
+                )):
+                    return False
+        return True
+
+
+class BaileysAPI(WhatsAppProvider):
+    """Baileys (WhatsApp Web in Node.js) REST bridge"""
+
+    name = 'baileys'
+
+    def __init__(self, config: Dict):
+        super().__init__(config)
+        self.url = config['baileys_api_url'].rstrip('/')
+        self.account = self.url
+
+    def _jid(self, phone_number: str) -> str:
+        return f"{phone_number.lstrip('+')}@s.whatsapp.net"
+
+    def text_request(self, phone_number: str, message: str) -> Dict:
+        return {'url': f"{self.url}/send",
+                'json': {'jid': self._jid(phone_number), 'message': message}}
+
+    def send_message_with_attachments(self, phone_number: str, message: str,
+                                      attachments: List[str]) -> bool:
+        if not self.send_message(phone_number, message):
+            return False
+        for file_path in attachments:
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, 'rb') as f:
+                content = base64.b64encode(f.read()).decode()
+            if not self._check(self.session.post(
+                f"{self.url}/send-media",
+                json={
+                    'jid': self._jid(phone_number),
+                    'filename': os.path.basename(file_path),
+                    'data': content
+                },
+                timeout=self.timeout
+            )):
+                return False
+        return True
+
+
+def main():
+    """Command line interface"""
+    config_file = os.getenv('DEATH_SWITCH_CONFIG', 'config.json')
+    try:
+        with open(config_file, 'r') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        print(f"❌ {config_file} not found")
+        sys.exit(1)
+
+    manager = WhatsAppManager(config)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'setup'
+
+    if command == 'setup':
+        print("📱 WHATSAPP PROVIDERS")
+        print("=" * 50)
+        required = {
+            'business_api': ['whatsapp_business_token', 'whatsapp_phone_number_id'],
+            'twilio': ['twilio_sid', 'twilio_token', 'twilio_whatsapp_number'],
+            'web_api': ['whatsapp_web_api_url'],
+            'baileys': ['baileys_api_url']
+        }
+        for name, keys in required.items():
+            missing = [k for k in keys if k not in config]
+            status = "✅ configured" if name in manager.providers else f"⚪ missing {', '.join(missing)}"
+            print(f"{name:>14}: {status}")
+
+    elif command == 'test' and len(sys.argv) > 2:
+        sent = manager.send_message(sys.argv[2], f"💙 Digital Death Switch test message ({datetime.now():%Y-%m-%d %H:%M})")
+        print("✅ Test message sent" if sent else "❌ Test message failed")
+        print(json.dumps(manager.get_stats(), indent=2))
+
+    else:
+        print("Usage: python whatsapp_integration.py [setup|test <phone_number>]")
+
+    manager.close()
+
+
+if __name__ == "__main__":
+    main()